@@ -0,0 +1,21 @@
+import asyncio
+import concurrent.futures
+from typing import Any, Coroutine, TypeVar
+
+T = TypeVar("T")
+
+
+def run_blocking(coroutine: Coroutine[Any, Any, T]) -> T:
+    """
+    Run a coroutine to completion from synchronous code and return its result.
+
+    Inside a running event loop, e.g. in a Jupyter notebook, asyncio.run
+    cannot be called, so the coroutine runs on its own loop in a worker
+    thread instead; async callers should await the coroutine directly.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coroutine).result()
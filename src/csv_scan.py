@@ -0,0 +1,179 @@
+import contextlib
+import logging
+import re
+from io import BytesIO
+from typing import BinaryIO, Iterator, Optional, Union
+
+import fsspec
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 4 * 1024 * 1024
+QUOTE = 0x22
+CR = 0x0D
+_UNQUOTED_END = re.compile(rb"[,\n]")
+
+
+class CsvColumnScanner:
+    """
+    Byte-level csv scanner that only copies out the columns it keeps.
+
+    Fields are located with bytes.find / regex searches, which jump over
+    the body of a quoted field in C. Skipped fields, such as the caption
+    text, are never sliced, decoded or turned into Python objects, so the
+    Python-level cost scales with the size of the kept columns.
+    """
+
+    def __init__(self, stream: BinaryIO, chunk_size: int = CHUNK_SIZE):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.buf = b""
+        self.pos = 0
+        self.eof = False
+        self.bytes_read = 0
+        self.bytes_kept = 0
+
+    def _fill(self) -> bool:
+        """
+        Drop consumed bytes and read the next chunk. False at end of stream.
+        """
+        if self.eof:
+            return False
+        chunk = self.stream.read(self.chunk_size)
+        self.bytes_read += len(chunk)
+        self.buf = self.buf[self.pos :] + chunk
+        self.pos = 0
+        if not chunk:
+            self.eof = True
+        return bool(chunk)
+
+    def _field_end(self, start: int) -> Optional[tuple[int, int]]:
+        """
+        Locate the field starting at start.
+
+        Returns:
+            tuple: (end of the raw field bytes, position of its delimiter),
+            or None if the buffer ends before the field does.
+        """
+        buf = self.buf
+        if start < len(buf) and buf[start] == QUOTE:
+            search = start + 1
+            while True:
+                q = buf.find(b'"', search)
+                if q == -1:
+                    return (len(buf), len(buf)) if self.eof else None
+                if q + 1 < len(buf) and buf[q + 1] == QUOTE:
+                    search = q + 2  # escaped quote
+                    continue
+                end = q + 1
+                if end < len(buf) and buf[end] == CR:
+                    end += 1
+                if end >= len(buf) and not self.eof:
+                    return None
+                return q + 1, end
+        match = _UNQUOTED_END.search(buf, start)
+        if match is None:
+            return (len(buf), len(buf)) if self.eof else None
+        end = match.start()
+        value_end = end - 1 if end > start and buf[end - 1] == CR else end
+        return value_end, end
+
+    def rows(self, keep: Optional[set[int]] = None) -> Iterator[list[bytes]]:
+        """
+        Yields each row as a list of the raw bytes of its kept fields.
+
+        Blank lines are skipped, as pd.read_csv does.
+
+        Args:
+            keep (set): Column indices to copy out. None keeps every column.
+        """
+        row = []
+        col = 0
+        while True:
+            if self.pos >= len(self.buf) and not self._fill():
+                if row or col:
+                    yield row
+                return
+            end = self._field_end(self.pos)
+            if end is None:
+                self._fill()
+                continue
+            value_end, delimiter = end
+            if keep is None or col in keep:
+                row.append(self.buf[self.pos : value_end])
+                self.bytes_kept += value_end - self.pos
+            if delimiter >= len(self.buf):
+                self.pos = delimiter
+                yield row
+                row, col = [], 0
+                continue
+            blank = col == 0 and value_end == self.pos
+            self.pos = delimiter + 1
+            if self.buf[delimiter] == ord(","):
+                col += 1
+            elif blank:
+                row = []
+            else:
+                yield row
+                row, col = [], 0
+
+
+def _field_name(raw: bytes) -> str:
+    name = raw.decode("utf-8")
+    if name.startswith('"') and name.endswith('"'):
+        name = name[1:-1].replace('""', '"')
+    return name
+
+
+def read_csv_columns(
+    path: Union[str, BinaryIO],
+    usecols: Optional[list[str]] = None,
+    exclude_list: Optional[list[str]] = None,
+    skiprows: int = 0,
+    chunk_size: int = CHUNK_SIZE,
+) -> pd.DataFrame:
+    """
+    Read only some columns of a csv without parsing the others.
+
+    The kept fields are copied byte for byte into a small in-memory csv that
+    pandas then parses, so rows and dtypes match pd.read_csv(usecols=...).
+
+    Args:
+        path (str): A local path or fsspec uri, or an open binary stream.
+        usecols (list): Columns to keep. Defaults to all columns.
+        exclude_list (list): Columns to skip, e.g. the caption text.
+        skiprows (int): Data records to skip after the header. A quoted
+            field spanning several lines is part of one record.
+    """
+    opened = (
+        fsspec.open(path, "rb")
+        if isinstance(path, str)
+        else contextlib.nullcontext(path)
+    )
+    with opened as stream:
+        scanner = CsvColumnScanner(stream, chunk_size=chunk_size)
+        rows = scanner.rows()
+        header = [_field_name(f) for f in next(rows, [])]
+        names = usecols or [c for c in header if c not in (exclude_list or [])]
+        keep = {i for i, c in enumerate(header) if c in names}
+        out = BytesIO()
+        out.write(b",".join(h for i, h in enumerate(_quoted(header)) if i in keep))
+        out.write(b"\n")
+        for i, row in enumerate(scanner.rows(keep)):
+            if i < skiprows:
+                continue
+            out.write(b",".join(row))
+            out.write(b"\n")
+    logger.debug(
+        "Scanned %s bytes, kept %s bytes", scanner.bytes_read, scanner.bytes_kept
+    )
+    out.seek(0)
+    # A row whose kept fields are all empty is written as a blank line, which
+    # must be read as missing values rather than skipped.
+    return pd.read_csv(out, header=0, sep=",", skip_blank_lines=False)
+
+
+def _quoted(header: list[str]) -> Iterator[bytes]:
+    for name in header:
+        yield ('"' + name.replace('"', '""') + '"').encode("utf-8")
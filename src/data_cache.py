@@ -0,0 +1,337 @@
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+from typing import Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+import fsspec
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+from google.cloud import storage
+
+from store_gcs import get_store
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.environ.get(
+    "PBLC_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "pblc_localnet")
+)
+MANIFEST_NAME = "manifest.json"
+# Small row groups keep a single streamed batch of caption text bounded.
+ROW_GROUP_SIZE = 1_000
+# Decoded pandas object columns take more room than the Arrow buffers.
+PANDAS_OVERHEAD = 2.0
+# Bytes of csv parsed per block while converting; column types are inferred
+# from the first block.
+CONVERT_BLOCK_SIZE = 16 * 1024 * 1024
+_CSV_COLUMN_ERROR = re.compile(r"CSV column #(\d+)")
+# Serializes manifest updates of all caches in this process; a lock file
+# serializes them across processes.
+_manifest_lock = threading.Lock()
+
+
+def split_gcs_uri(uri: str) -> tuple[str, str]:
+    """
+    Split a gs://bucket/name uri into (bucket, name).
+    """
+    if not uri.startswith("gs://"):
+        raise ValueError(f"Not a gcs uri: {uri}")
+    bucket_name, _, object_name = uri[len("gs://") :].partition("/")
+    return bucket_name, object_name
+
+
+class ParquetCache:
+    """
+    Local, content-addressed Parquet cache of the csv files stored in gcs.
+
+    Each csv is converted to Parquet once and stored under a key derived from
+    the blob's uri and generation, so a re-uploaded object gets a new cache
+    entry. Later reads are memory-mapped and only decode the requested
+    columns; a metadata-only read never touches the caption columns.
+    """
+
+    def __init__(self, cache_dir: str = CACHE_DIR, client: storage.Client = None):
+        self.cache_dir = cache_dir
+        self._client = client
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.manifest_path = os.path.join(self.cache_dir, MANIFEST_NAME)
+        self.manifest = self._load_manifest()
+
+    @property
+    def client(self) -> storage.Client:
+        if self._client is None:
+            self._client = get_store().client
+        return self._client
+
+    def _load_manifest(self) -> dict:
+        if not os.path.exists(self.manifest_path):
+            return {}
+        with open(self.manifest_path, "r") as f:
+            return json.load(f)
+
+    def _write_atomic(self, path: str, write):
+        """
+        Write a file through a uniquely named temp file in the same directory,
+        so concurrent writers never share a temp file and readers only ever
+        see a complete file.
+        """
+        fd, tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(path), prefix=f"{os.path.basename(path)}."
+        )
+        try:
+            os.close(fd)
+            write(tmp_path)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _update_manifest(self, uri: str, entry: dict):
+        """
+        Record the cache entry of uri in the manifest.
+
+        The manifest on disk is re-read and merged under a lock, so entries
+        written meanwhile by other threads or processes are kept.
+        """
+
+        def write(tmp_path):
+            with open(tmp_path, "w") as f:
+                json.dump(self.manifest, f, indent=2, sort_keys=True)
+
+        with self._locked_manifest():
+            self.manifest = {**self.manifest, **self._load_manifest(), uri: entry}
+            self._write_atomic(self.manifest_path, write)
+
+    @contextlib.contextmanager
+    def _locked_manifest(self):
+        with _manifest_lock, open(f"{self.manifest_path}.lock", "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @staticmethod
+    def cache_key(uri: str, generation) -> str:
+        return hashlib.sha256(f"{uri}#{generation}".encode()).hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.parquet")
+
+    def _remote_version(self, uri: str) -> dict:
+        bucket_name, object_name = split_gcs_uri(uri)
+        blob = self.client.bucket(bucket_name).get_blob(object_name)
+        if blob is None:
+            raise FileNotFoundError(uri)
+        return {"generation": blob.generation, "etag": blob.etag, "size": blob.size}
+
+    def is_fresh(self, uri: str, version: dict = None) -> bool:
+        """
+        True if the cached copy of uri matches the blob generation and etag.
+        """
+        entry = self.manifest.get(uri)
+        if entry is None or not os.path.exists(self._entry_path(entry["key"])):
+            return False
+        version = version or self._remote_version(uri)
+        return (
+            entry["generation"] == version["generation"]
+            and entry["etag"] == version["etag"]
+        )
+
+    def _convert(self, uri: str, path: str):
+        """
+        Parse the csv at uri once and write it to path as Parquet.
+
+        The csv is read and written one block at a time, so memory stays
+        bounded by the block size rather than the size of the file. Column
+        types are inferred from the first block; if a later block does not
+        fit a column's type, the conversion is restarted with that column
+        widened (int64 to float64, anything else to string).
+        """
+        column_types = {}
+        while True:
+            try:
+                self._write_parquet(uri, path, column_types)
+                return
+            except pa.ArrowInvalid as error:
+                match = _CSV_COLUMN_ERROR.search(str(error))
+                if match is None:
+                    raise
+                field = self._csv_schema(uri).field(int(match.group(1)))
+                current = column_types.get(field.name, field.type)
+                if pa.types.is_string(current):
+                    raise
+                widened = pa.float64() if pa.types.is_int64(current) else pa.string()
+                logger.info(
+                    "Column %s of %s does not fit %s, retrying as %s",
+                    field.name,
+                    uri,
+                    current,
+                    widened,
+                )
+                column_types[field.name] = widened
+
+    @staticmethod
+    def _open_csv(f, column_types: Optional[dict] = None) -> pa_csv.CSVStreamingReader:
+        return pa_csv.open_csv(
+            f,
+            read_options=pa_csv.ReadOptions(block_size=CONVERT_BLOCK_SIZE),
+            parse_options=pa_csv.ParseOptions(newlines_in_values=True),
+            convert_options=pa_csv.ConvertOptions(column_types=column_types or {}),
+        )
+
+    def _csv_schema(self, uri: str) -> pa.Schema:
+        """
+        Schema inferred from the first block of the csv at uri.
+        """
+        with fsspec.open(uri, "rb") as f:
+            return self._open_csv(f).schema
+
+    def _write_parquet(self, uri: str, path: str, column_types: dict):
+        logger.info("Converting %s to parquet", uri)
+
+        def write(tmp_path):
+            with fsspec.open(uri, "rb") as f:
+                reader = self._open_csv(f, column_types)
+                with pq.ParquetWriter(tmp_path, reader.schema) as writer:
+                    for batch in reader:
+                        writer.write_table(
+                            pa.Table.from_batches([batch]),
+                            row_group_size=ROW_GROUP_SIZE,
+                        )
+
+        self._write_atomic(path, write)
+
+    def ensure(self, uri: str) -> str:
+        """
+        Make sure a fresh Parquet copy of uri exists and return its local path.
+        """
+        version = self._remote_version(uri)
+        if self.is_fresh(uri, version):
+            return self._entry_path(self.manifest[uri]["key"])
+
+        key = self.cache_key(uri, version["generation"])
+        path = self._entry_path(key)
+        if not os.path.exists(path):
+            self._convert(uri, path)
+
+        stale = self.manifest.get(uri)
+        if stale and stale["key"] != key:
+            stale_path = self._entry_path(stale["key"])
+            if os.path.exists(stale_path):
+                os.remove(stale_path)
+                logger.info("Removed stale cache entry: %s", stale_path)
+
+        self._update_manifest(uri, {"key": key, **version})
+        return path
+
+    def columns(self, uri: str) -> list[str]:
+        """
+        Column names of the cached table, read from the Parquet footer only.
+        """
+        return pq.read_schema(self.ensure(uri)).names
+
+    @staticmethod
+    def _project(
+        path: str,
+        columns: Optional[list[str]] = None,
+        exclude_list: Optional[list[str]] = None,
+    ) -> Optional[list[str]]:
+        if exclude_list:
+            columns = [
+                c
+                for c in (columns or pq.read_schema(path).names)
+                if c not in exclude_list
+            ]
+        return columns
+
+    def read_table(self, uri: str, columns: Optional[list[str]] = None) -> pa.Table:
+        return pq.read_table(self.ensure(uri), columns=columns, memory_map=True)
+
+    @staticmethod
+    def _estimate_row_bytes(path: str, columns: Optional[list[str]] = None) -> float:
+        """
+        Estimated in-memory size of one decoded row of the projected columns,
+        taken from the uncompressed sizes in the Parquet footer.
+        """
+        metadata = pq.ParquetFile(path).metadata
+        wanted = set(columns) if columns else None
+        total = 0
+        for i in range(metadata.num_row_groups):
+            row_group = metadata.row_group(i)
+            for j in range(row_group.num_columns):
+                column = row_group.column(j)
+                if wanted is None or column.path_in_schema in wanted:
+                    total += column.total_uncompressed_size
+        return PANDAS_OVERHEAD * total / max(metadata.num_rows, 1)
+
+    def iter_batches(
+        self,
+        uri: str,
+        batch_size: int,
+        columns: Optional[list[str]] = None,
+        exclude_list: Optional[list[str]] = None,
+        max_memory_bytes: Optional[int] = None,
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Stream uri as DataFrames of at most batch_size rows.
+
+        If max_memory_bytes is given the batch size is lowered so that one
+        decoded batch stays under that many bytes.
+        """
+        path = self.ensure(uri)
+        columns = self._project(path, columns, exclude_list)
+        if max_memory_bytes:
+            row_bytes = max(self._estimate_row_bytes(path, columns), 1.0)
+            batch_size = max(1, min(batch_size, int(max_memory_bytes // row_bytes)))
+        parquet_file = pq.ParquetFile(path, memory_map=True)
+        for batch in parquet_file.iter_batches(batch_size=batch_size, columns=columns):
+            yield batch.to_pandas()
+
+    def read(
+        self,
+        uri: str,
+        columns: Optional[list[str]] = None,
+        exclude_list: Optional[list[str]] = None,
+    ) -> pd.DataFrame:
+        """
+        Load uri as a DataFrame, decoding only the projected columns.
+
+        Args:
+            uri (str): The gs:// uri of the csv file.
+            columns (list): Columns to keep. Defaults to all columns.
+            exclude_list (list): Columns to drop, e.g. the caption text.
+        """
+        path = self.ensure(uri)
+        columns = self._project(path, columns, exclude_list)
+        return pq.read_table(path, columns=columns, memory_map=True).to_pandas()
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_cache() -> ParquetCache:
+    """
+    Returns the process-wide cache rooted at CACHE_DIR.
+    """
+    global _default_cache
+    if _default_cache is None:
+        with _default_cache_lock:
+            if _default_cache is None:
+                _default_cache = ParquetCache()
+    return _default_cache
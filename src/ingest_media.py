@@ -0,0 +1,234 @@
+import asyncio
+import glob
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from typing import Iterable, Optional, Protocol
+
+import pandas as pd
+
+from async_utils import run_blocking
+from video_extract import GCS_BUCKET, VID_PREFIX, VidExtract
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+
+QUEUE_PATH = "ingest_queue.sqlite"
+WORKERS = 8
+MAX_ATTEMPTS = 3
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class Fetcher(Protocol):
+    def fetch(self, vid_id: str) -> str:
+        """
+        Fetch the media of one video and store it; returns where it was
+        stored, e.g. its GCS path.
+        """
+
+
+class VidExtractFetcher:
+    """
+    Streams audio from YouTube with VidExtract and uploads it to GCS,
+    named by vid_id: titles are not unique, so concurrent workers would
+    overwrite each other's audio.
+    """
+
+    def __init__(self, temp_dir: Optional[str] = None):
+        self.temp_dir = temp_dir
+
+    def fetch(self, vid_id: str) -> str:
+        downloader = VidExtract(
+            video_url=f"{VID_PREFIX}{vid_id}",
+            gcs_bucket_name=GCS_BUCKET,
+            temp_dir=self.temp_dir,
+        )
+        return downloader.extract_audio_only(name=vid_id)
+
+
+class LocalFileFetcher:
+    """
+    Local stand-in for the remote fetcher: copies media already on local
+    disk, named {vid_id}.*, from source_dir into dest_dir. Needs neither
+    network access nor GCS, e.g. for tests and dry runs.
+    """
+
+    def __init__(self, source_dir: str, dest_dir: str):
+        self.source_dir = source_dir
+        self.dest_dir = dest_dir
+        os.makedirs(self.dest_dir, exist_ok=True)
+
+    def fetch(self, vid_id: str) -> str:
+        matches = glob.glob(os.path.join(glob.escape(self.source_dir), f"{vid_id}.*"))
+        if not matches:
+            raise FileNotFoundError(f"No local media for {vid_id}")
+        local_path = matches[0]
+        dest_path = os.path.join(self.dest_dir, os.path.basename(local_path))
+        shutil.copyfile(local_path, dest_path)
+        return dest_path
+
+
+class WorkQueue:
+    """
+    Durable SQLite queue of vid_ids and their ingestion status.
+
+    Ids move from pending to running to done, or back to pending on failure
+    until max_attempts is reached, when they are marked failed. Ids left
+    running by a crashed process are put back to pending on open, so a
+    restart resumes where the last run stopped.
+    """
+
+    def __init__(self, path: str = QUEUE_PATH, max_attempts: int = MAX_ATTEMPTS):
+        self.path = path
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " vid_id TEXT PRIMARY KEY,"
+            " status TEXT NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " gcs_path TEXT,"
+            " error TEXT,"
+            " updated REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status)")
+        self._conn.execute(
+            "UPDATE jobs SET status = ? WHERE status = ?", (PENDING, RUNNING)
+        )
+        self._conn.commit()
+
+    def add(self, vid_ids: Iterable[str]) -> int:
+        """
+        Queue new ids; ids already in the queue keep their status.
+        Returns the number of ids added.
+        """
+        now = time.time()
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO jobs (vid_id, status, updated) VALUES (?, ?, ?)",
+                [(vid_id, PENDING, now) for vid_id in vid_ids],
+            )
+            self._conn.commit()
+            return self._conn.total_changes - before
+
+    def claim(self) -> Optional[str]:
+        """
+        Atomically take the next pending id and mark it running.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT vid_id FROM jobs WHERE status = ? ORDER BY updated LIMIT 1",
+                (PENDING,),
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, updated = ?"
+                " WHERE vid_id = ?",
+                (RUNNING, time.time(), row[0]),
+            )
+            self._conn.commit()
+            return row[0]
+
+    def mark_done(self, vid_id: str, gcs_path: str):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, gcs_path = ?, error = NULL, updated = ?"
+                " WHERE vid_id = ?",
+                (DONE, gcs_path, time.time(), vid_id),
+            )
+            self._conn.commit()
+
+    def mark_failed(self, vid_id: str, error: str):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET error = ?, updated = ?,"
+                " status = CASE WHEN attempts >= ? THEN ? ELSE ? END"
+                " WHERE vid_id = ?",
+                (error, time.time(), self.max_attempts, FAILED, PENDING, vid_id),
+            )
+            self._conn.commit()
+
+    def counts(self) -> dict:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) FROM jobs GROUP BY status"
+            ).fetchall()
+        return dict(rows)
+
+
+def read_vid_ids(frames) -> list[str]:
+    """
+    Unique vid_ids from metadata frames: a DataFrame, a dict of DataFrames
+    (as returned by load_data.load_metadata) or an iterable of DataFrames.
+    """
+    if isinstance(frames, pd.DataFrame):
+        frames = [frames]
+    elif isinstance(frames, dict):
+        frames = frames.values()
+    vid_ids = []
+    for frame in frames:
+        if "vid_id" in frame:
+            vid_ids.extend(frame["vid_id"].dropna().astype(str))
+    return list(dict.fromkeys(vid_ids))
+
+
+class IngestPool:
+    """
+    Runs queued downloads and uploads concurrently, `workers` at a time.
+    """
+
+    def __init__(self, queue: WorkQueue, fetcher: Fetcher, workers: int = WORKERS):
+        self.queue = queue
+        self.fetcher = fetcher
+        self.workers = workers
+
+    async def _worker(self):
+        while True:
+            vid_id = await asyncio.to_thread(self.queue.claim)
+            if vid_id is None:
+                return
+            try:
+                gcs_path = await asyncio.to_thread(self.fetcher.fetch, vid_id)
+            except Exception as error:
+                logging.error(f"Failed to ingest {vid_id}: {error}")
+                await asyncio.to_thread(self.queue.mark_failed, vid_id, str(error))
+                continue
+            await asyncio.to_thread(self.queue.mark_done, vid_id, gcs_path)
+            logging.info(f"Ingested {vid_id}: {gcs_path}")
+
+    async def run(self) -> dict:
+        """
+        Work until no pending ids are left. Returns the status counts.
+        """
+        await asyncio.gather(*[self._worker() for _ in range(self.workers)])
+        counts = self.queue.counts()
+        logging.info(f"Ingestion finished: {counts}")
+        return counts
+
+
+def ingest(
+    frames,
+    fetcher: Optional[Fetcher] = None,
+    queue_path: str = QUEUE_PATH,
+    workers: int = WORKERS,
+) -> dict:
+    """
+    Queue every vid_id in the metadata frames and ingest the pending ones.
+    Also works inside a running event loop; see async_utils.run_blocking.
+    """
+    queue = WorkQueue(queue_path)
+    added = queue.add(read_vid_ids(frames))
+    logging.info(f"Queued {added} new videos")
+    pool = IngestPool(queue, fetcher or VidExtractFetcher(), workers=workers)
+    return run_blocking(pool.run())
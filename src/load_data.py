@@ -1,44 +1,61 @@
+import asyncio
+import csv
 import logging
+import time
+from typing import Iterator, Optional
 
 import aiomultiprocess
+import fsspec
 import pandas as pd
-from aiomultiprocess import pool
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+
+from csv_scan import read_csv_columns
+from data_cache import get_cache
 
 logging.basicConfig(level="INFO")
 logger = logging.getLogger("__name__")
 
 YEARS = range(2006, 2023)
+BATCH_SIZE = 1_000
+MAX_MEMORY_BYTES = 512 * 1024**2
+PLACE_KEYS = ["year", "st_fips"]
+PROCESSES = 4
+RETRIES = 2
+RETRY_BACKOFF = 2.0  # seconds, doubled after each failed attempt
+TIMEOUT = 30 * 60  # seconds per attempt
 
 
-def load_cloud_data(year: int, n=0):
+def load_cloud_data(year: int, n=0, use_cache=True):
     base_path = f"gs://pblc_data/localnet/meetings.{year}.csv"
     logger.debug("Loading file: %s", base_path)
-    data = pd.read_csv(base_path, header=0, sep=",", skiprows=n)
+    if use_cache and not n:
+        data = get_cache().read(base_path)
+    else:
+        data = pd.read_csv(base_path, header=0, sep=",", skiprows=n)
     logger.debug("Successfully loaded data: %s", year)
     return data
 
 
-def load_cloud_metadata(year: int, n=0, exclude_list: list[str] = []):
+def load_cloud_metadata(year: int, n=0, exclude_list: list[str] = [], use_cache=True):
     base_path = f"gs://pblc_data/localnet/meetings.{year}.csv"
     logger.debug("Loading file: %s", base_path)
-    headers = [*pd.read_csv("sample.csv", nrows=1)]
-    data = pd.read_csv(
-        base_path,
-        header=0,
-        sep=",",
-        skiprows=n,
-        usecols=[c for c in headers if c not in exclude_list],
-    )
+    if use_cache and not n:
+        # Parquet projection: the excluded caption columns are never read.
+        data = get_cache().read(base_path, exclude_list=exclude_list)
+    else:
+        # Byte-level scan: the excluded caption fields are skipped unparsed.
+        data = read_csv_columns(base_path, exclude_list=exclude_list, skiprows=n)
     logger.debug("Successfully loaded data: %s", year)
     return data
 
 
 def load_all(years=YEARS):
-    """TODO: Run this async"""
+    """
+    Returns a dictionary of dataframes; one for each year.
+    See load_all_pool for a parallel version.
+    """
     df_dict = {}
-    # async with Pool() as pool:
-    #     async for result in pool.map(get, urls):
-    #         ...  # process result
     for year in years:
         data = load_cloud_data(year)
         df_dict[year] = data
@@ -46,15 +63,73 @@ def load_all(years=YEARS):
     return df_dict
 
 
+def iter_batches(
+    years=YEARS,
+    batch_size: int = BATCH_SIZE,
+    max_memory_bytes: int = MAX_MEMORY_BYTES,
+    exclude_list: Optional[list[str]] = None,
+) -> Iterator[pd.DataFrame]:
+    """
+    Yields DataFrames of at most batch_size rows, year after year.
+
+    Only one batch is decoded at a time and the batch size is lowered as
+    needed to stay under max_memory_bytes, so the whole corpus can be
+    processed in constant memory. Each batch has a `year` column.
+    """
+    cache = get_cache()
+    for year in years:
+        base_path = f"gs://pblc_data/localnet/meetings.{year}.csv"
+        logger.debug("Streaming file: %s", base_path)
+        for batch in cache.iter_batches(
+            base_path,
+            batch_size=batch_size,
+            exclude_list=exclude_list,
+            max_memory_bytes=max_memory_bytes,
+        ):
+            batch["year"] = year
+            yield batch
+        logger.info("Successfully streamed data: %s", year)
+
+
+def iter_place_groups(years=YEARS, keys=PLACE_KEYS, **kwargs):
+    """
+    Yields (key, DataFrame) with all meetings of one place in one year.
+
+    Rows are expected to be grouped by place within each yearly file, as
+    they are in the source data. The trailing group of a batch is held back
+    until the next batch shows whether it continues.
+
+    Raises:
+        ValueError: If a key is not a column of the data.
+    """
+    pending = None
+    for i, batch in enumerate(iter_batches(years=years, **kwargs)):
+        if i == 0:
+            missing = [key for key in keys if key not in batch.columns]
+            if missing:
+                raise ValueError(
+                    f"Place keys {missing} are not columns of the data: "
+                    f"{list(batch.columns)}"
+                )
+        if pending is not None:
+            batch = pd.concat([pending[1], batch], ignore_index=True)
+        groups = list(batch.groupby(keys, sort=False, dropna=False))
+        for key, group in groups[:-1]:
+            yield key, group
+        pending = groups[-1] if groups else None
+    if pending is not None:
+        yield pending
+
+
 EXCLUDE_LIST = []
 
 
 def load_metadata(years=YEARS, exclude_list=EXCLUDE_LIST):
-    """TODO: Run this async"""
+    """
+    Returns a dictionary of metadata dataframes; one for each year.
+    See load_all_pool for a parallel version.
+    """
     df_dict = {}
-    #  async with Pool() as pool:
-    #     async for result in pool.map(get, urls):
-    #         ...  # process result
     for year in years:
         data = load_cloud_metadata(year, exclude_list=exclude_list)
         df_dict[year] = data
@@ -62,6 +137,120 @@ def load_metadata(years=YEARS, exclude_list=EXCLUDE_LIST):
     return df_dict
 
 
+async def fetch_year(
+    year: int,
+    exclude_list: Optional[list[str]] = None,
+    timeout: Optional[float] = None,
+):
+    """
+    Download and parse one year inside a pool worker.
+
+    The csv is read and written out batch by batch as an Arrow IPC stream,
+    so it crosses the process boundary as one flat buffer instead of a
+    pickled DataFrame. The timeout is also checked between batches, so a
+    year that runs past it stops instead of keeping the worker busy after
+    load_all_pool has given up on it.
+
+    Raises:
+        TimeoutError: If reading takes longer than `timeout` seconds.
+
+    Returns:
+        tuple: (ipc bytes, stats dict with seconds, bytes and bytes_per_sec)
+    """
+    base_path = f"gs://pblc_data/localnet/meetings.{year}.csv"
+    start = time.perf_counter()
+    convert_options = pa_csv.ConvertOptions()
+    rows = 0
+    sink = pa.BufferOutputStream()
+    with fsspec.open(base_path, "rb") as f:
+        if exclude_list:
+            header = next(csv.reader([f.readline().decode()]))
+            f.seek(0)
+            convert_options.include_columns = [
+                c for c in header if c not in exclude_list
+            ]
+        reader = pa_csv.open_csv(
+            f,
+            parse_options=pa_csv.ParseOptions(newlines_in_values=True),
+            convert_options=convert_options,
+        )
+        with pa.ipc.new_stream(sink, reader.schema) as writer:
+            for batch in reader:
+                if timeout is not None and time.perf_counter() - start > timeout:
+                    raise TimeoutError(f"Reading {base_path} took over {timeout}s")
+                writer.write_batch(batch)
+                rows += batch.num_rows
+        nbytes = f.tell()
+    seconds = time.perf_counter() - start
+    stats = {
+        "seconds": seconds,
+        "bytes": nbytes,
+        "rows": rows,
+        "bytes_per_sec": nbytes / seconds if seconds else 0.0,
+    }
+    return sink.getvalue().to_pybytes(), stats
+
+
+async def load_all_pool(
+    years=YEARS,
+    processes: int = PROCESSES,
+    retries: int = RETRIES,
+    timeout: float = TIMEOUT,
+    exclude_list: Optional[list[str]] = None,
+    backoff: float = RETRY_BACKOFF,
+):
+    """
+    Download and parse years across a process pool.
+
+    At most `processes` years are parsed at once, each in its own process,
+    so csv parsing is not serialized on the GIL. A year that fails or takes
+    more than `timeout` seconds is retried up to `retries` times, waiting
+    `backoff` seconds before the first retry and twice as long before each
+    next one, and then returned as an empty dataframe. A year only starts
+    once a worker is free, so queueing does not count towards the timeout.
+
+    Returns:
+        tuple: (dict of dataframes keyed by year, dict of stats keyed by year)
+    """
+    df_dict = {}
+    stats = {}
+    workers = asyncio.Semaphore(processes)
+    async with aiomultiprocess.Pool(processes=processes, childconcurrency=1) as pool:
+
+        async def fetch(year):
+            for attempt in range(retries + 1):
+                if attempt:
+                    await asyncio.sleep(backoff * 2 ** (attempt - 1))
+                try:
+                    async with workers:
+                        return await asyncio.wait_for(
+                            pool.apply(fetch_year, (year, exclude_list, timeout)),
+                            timeout,
+                        )
+                except Exception as error:
+                    logger.warning(
+                        "Attempt %s failed for %s: %r", attempt + 1, year, error
+                    )
+            logger.error("Failed to load file: %s", year)
+            return None
+
+        results = await asyncio.gather(*[fetch(year) for year in years])
+
+    for year, result in zip(years, results):
+        if result is None:
+            df_dict[year] = pd.DataFrame()
+            continue
+        buffer, stats[year] = result
+        df_dict[year] = pa.ipc.open_stream(buffer).read_all().to_pandas()
+        logger.info(
+            "Successfully loaded data: %s (%.1fs, %.1f MB/s)",
+            year,
+            stats[year]["seconds"],
+            stats[year]["bytes_per_sec"] / 1024**2,
+        )
+    return df_dict, stats
+
+
 if __name__ == "__main__":
     # test csv issue
     YEARS = range(2006, 2023)
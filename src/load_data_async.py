@@ -1,11 +1,14 @@
 import asyncio
+import json
 import logging
-from io import StringIO
+from io import BytesIO, StringIO
+from typing import AsyncIterator, Optional
 
 import pandas as pd
-from google.cloud import storage
 
-from store_gcs import GCS_BUCKET, GCS_PREFIX, StoreGCS
+from csv_scan import read_csv_columns
+from data_cache import get_cache
+from store_gcs import GCS_BUCKET, GCS_PREFIX, get_store
 
 logging.basicConfig(level="INFO")
 logger = logging.getLogger(__name__)
@@ -13,6 +16,12 @@ logger = logging.getLogger(__name__)
 
 YEARS = range(2006, 2023)
 EXCLUDE_LIST = ["caption_text", "caption_text_clean"]
+BATCH_SIZE = 1_000
+MAX_MEMORY_BYTES = 512 * 1024**2
+PREFETCH = 2
+METADATA_PREFIX = f"{GCS_PREFIX}/metadata"
+METADATA_MANIFEST = f"{METADATA_PREFIX}/manifest.json"
+METADATA_PARTITIONS = f"{METADATA_PREFIX}/parquet"
 
 
 async def store_gcs(
@@ -20,31 +29,40 @@ async def store_gcs(
     gcs_object_name: str,
     bucket_name: str = GCS_BUCKET,
     content_type="application/csv",
-):
+) -> bool:
     """
     Upload file to gcs.
+
+    Returns:
+        bool: True if the upload succeeded. Errors are logged, not raised.
     """
     try:
         logger.info(f"Uploading file {gcs_object_name} to gcs... ")
-        # Initialize a GCS client
-        storage_client = storage.Client()
-        # Upload the data to GCS
-        bucket = storage_client.get_bucket(bucket_name)
-        blob = bucket.blob(gcs_object_name)
-        logging.info(f"Uploading data: {gcs_object_name}")
-        blob.upload_from_string(data, content_type=content_type)
+        # Upload the data to GCS through the shared, pooled client
+        await asyncio.to_thread(
+            get_store().upload_data,
+            data,
+            gcs_object_name,
+            content_type=content_type,
+            bucket_name=bucket_name,
+        )
         logging.info(f"Data uploaded to GCS: gs://{bucket_name}/{gcs_object_name}")
+        return True
     except Exception as error:
         logger.error(f"Failed to upload file {gcs_object_name} to gcs: {error}")
+        return False
 
 
-async def download_cloud_data(year: int, n=0) -> pd.DataFrame:
+async def download_cloud_data(year: int, n=0, use_cache=True) -> pd.DataFrame:
     try:
         base_path = f"gs://pblc_data/localnet/meetings.{year}.csv"
         logger.debug("Downloading file: %s", base_path)
-        data: pd.DataFrame = await asyncio.to_thread(
-            pd.read_csv, base_path, header=0, sep=",", skiprows=n
-        )
+        if use_cache and not n:
+            data: pd.DataFrame = await asyncio.to_thread(get_cache().read, base_path)
+        else:
+            data: pd.DataFrame = await asyncio.to_thread(
+                pd.read_csv, base_path, header=0, sep=",", skiprows=n
+            )
         logger.info("Successfully downloaded data: %s", year)
         return data
     except Exception as error:
@@ -74,14 +92,8 @@ async def upload_cloud_metadata(
     try:
         base_path = f"gs://pblc_data/localnet/meetings.{year}.csv"
         logger.info("Downloading file: %s", base_path)
-        headers = [*pd.read_csv(base_path, nrows=1)]
         data: pd.DataFrame = await asyncio.to_thread(
-            pd.read_csv,
-            base_path,
-            header=0,
-            sep=",",
-            skiprows=n,
-            usecols=[c for c in headers if c not in exclude_list],
+            read_csv_columns, base_path, exclude_list=exclude_list, skiprows=n
         )
         # Convert to .csv
         csv_string = data.to_csv(index=False)
@@ -100,11 +112,16 @@ async def upload_cloud_metadata(
         return pd.DataFrame()
 
 
-async def upload_and_combine_metadata(years, exclude_list, bucket_name=GCS_BUCKET):
+async def upload_and_combine_metadata(
+    years, exclude_list, bucket_name=GCS_BUCKET, incremental=False
+):
     """
     Downloads and combines metadata for all years. Returns a combined
-    dataframe of all years.
+    dataframe of all years. With incremental=True only the years whose
+    source changed are reprocessed, see update_metadata.
     """
+    if incremental:
+        return await update_metadata(years, exclude_list, bucket_name=bucket_name)
     try:
         logger.info("Loading metadata for all years... ")
         df_list = await asyncio.gather(
@@ -127,6 +144,165 @@ async def upload_and_combine_metadata(years, exclude_list, bucket_name=GCS_BUCKE
         return pd.DataFrame()
 
 
+def _read_metadata(base_path: str, exclude_list: list[str]) -> pd.DataFrame:
+    """
+    Metadata columns of a source csv, read from the Parquet cache when it is
+    already fresh and otherwise scanned without parsing the caption fields.
+    """
+    cache = get_cache()
+    if cache.is_fresh(base_path):
+        return cache.read(base_path, exclude_list=exclude_list)
+    return read_csv_columns(base_path, exclude_list=exclude_list)
+
+
+def _source_version(year: int, exclude_list: list[str]) -> Optional[dict]:
+    """
+    Generation and checksum of a year's source csv, plus the exclude list
+    the metadata was cut with. None if the source object does not exist.
+    """
+    blob = get_store().bucket(GCS_BUCKET).get_blob(f"{GCS_PREFIX}/meetings.{year}.csv")
+    if blob is None:
+        return None
+    return {
+        "generation": blob.generation,
+        "crc32c": blob.crc32c,
+        "exclude_list": sorted(exclude_list),
+    }
+
+
+def _load_manifest(bucket_name: str) -> dict:
+    blob = get_store().bucket(bucket_name).get_blob(METADATA_MANIFEST)
+    if blob is None:
+        return {}
+    return json.loads(blob.download_as_text())
+
+
+async def upload_metadata_partition(
+    year: int, exclude_list: list[str], bucket_name=GCS_BUCKET
+) -> tuple[pd.DataFrame, bool]:
+    """
+    Cut the metadata of one year and upload it as a csv and as the year's
+    Parquet partition.
+
+    Returns:
+        tuple: (metadata, whether both uploads succeeded). The metadata is
+            empty if it could not be read.
+    """
+    try:
+        base_path = f"gs://pblc_data/localnet/meetings.{year}.csv"
+        logger.info("Downloading file: %s", base_path)
+        data: pd.DataFrame = await asyncio.to_thread(
+            _read_metadata, base_path, exclude_list
+        )
+        csv_uploaded = await store_gcs(
+            data=data.to_csv(index=False),
+            gcs_object_name=f"{METADATA_PREFIX}/metadata_{year}.csv",
+            bucket_name=bucket_name,
+            content_type="application/csv",
+        )
+        buffer = BytesIO()
+        data.to_parquet(buffer, index=False)
+        partition_uploaded = await store_gcs(
+            data=buffer.getvalue(),
+            gcs_object_name=f"{METADATA_PARTITIONS}/year={year}/data.parquet",
+            bucket_name=bucket_name,
+            content_type="application/octet-stream",
+        )
+        uploaded = csv_uploaded and partition_uploaded
+        if uploaded:
+            logger.info("Successfully updated metadata: %s", year)
+        return data, uploaded
+    except Exception as error:
+        logging.error(f"Failed to load file: {year}: {error}")
+        # Return an empty dataframe
+        return pd.DataFrame(), False
+
+
+async def download_metadata_partition(year: int, bucket_name=GCS_BUCKET):
+    try:
+        path = f"gs://{bucket_name}/{METADATA_PARTITIONS}/year={year}/data.parquet"
+        logger.debug("Downloading file: %s", path)
+        data: pd.DataFrame = await asyncio.to_thread(pd.read_parquet, path)
+        return data
+    except Exception as error:
+        logging.error(f"Failed to load file: {year}: {error}")
+        return pd.DataFrame()
+
+
+async def update_metadata(years, exclude_list, bucket_name=GCS_BUCKET):
+    """
+    Incremental version of upload_and_combine_metadata.
+
+    A manifest in gcs records the generation and crc32c of the source csv
+    each year's metadata was cut from. Only years whose source changed are
+    reprocessed; the other years are read back from their small Parquet
+    partitions and merged into metadata_all_years.csv. If any year has no
+    source or its metadata could not be read, the previous combined csv is
+    left in place rather than overwritten without that year. A year is
+    recorded in the manifest only once its partition and the combined csv
+    were both uploaded, so a failed upload is retried on the next run.
+    Returns a combined dataframe of the years that could be read.
+    """
+    try:
+        manifest = await asyncio.to_thread(_load_manifest, bucket_name)
+        versions = await asyncio.gather(
+            *[asyncio.to_thread(_source_version, y, exclude_list) for y in years]
+        )
+        versions = dict(zip(years, versions))
+        changed = [
+            y for y in years if versions[y] and manifest.get(str(y)) != versions[y]
+        ]
+        unchanged = [
+            y for y in years if versions[y] and manifest.get(str(y)) == versions[y]
+        ]
+        logger.info("Metadata changed for years: %s", changed)
+
+        uploads = await asyncio.gather(
+            *[upload_metadata_partition(y, exclude_list, bucket_name) for y in changed]
+        )
+        fresh = [data for data, _ in uploads]
+        cached = await asyncio.gather(
+            *[download_metadata_partition(y, bucket_name) for y in unchanged]
+        )
+        frames = {**dict(zip(changed, fresh)), **dict(zip(unchanged, cached))}
+        results = pd.concat(
+            [frames[y] for y in years if y in frames], ignore_index=True
+        )
+        missing = [y for y in years if y not in frames or frames[y].empty]
+        if missing:
+            logger.error(
+                "Not updating the combined metadata, missing years: %s", missing
+            )
+            combined_uploaded = False
+        else:
+            combined_uploaded = await store_gcs(
+                data=results.to_csv(index=False),
+                gcs_object_name=f"{METADATA_PREFIX}/metadata_all_years.csv",
+                bucket_name=bucket_name,
+                content_type="application/csv",
+            )
+
+        updated = [
+            year
+            for year, (data, uploaded) in zip(changed, uploads)
+            if combined_uploaded and uploaded and not data.empty
+        ]
+        for year in updated:
+            manifest[str(year)] = versions[year]
+        if updated:
+            await store_gcs(
+                data=json.dumps(manifest, indent=2, sort_keys=True),
+                gcs_object_name=METADATA_MANIFEST,
+                bucket_name=bucket_name,
+                content_type="application/json",
+            )
+        logger.info("Successfully updated metadata for %s years", len(updated))
+        return results
+    except Exception as error:
+        logger.error(f"Failed to update metadata: {error}")
+        return pd.DataFrame()
+
+
 async def download_all(years):
     """
     Returns a dictionary of dataframes; one for each year.
@@ -144,6 +320,58 @@ async def download_all(years):
     return df_dict
 
 
+async def stream_all(
+    years=YEARS,
+    batch_size: int = BATCH_SIZE,
+    max_memory_bytes: int = MAX_MEMORY_BYTES,
+    prefetch: int = PREFETCH,
+    exclude_list: Optional[list[str]] = None,
+) -> AsyncIterator[pd.DataFrame]:
+    """
+    Async iterator over row batches of all years, in constant memory.
+
+    Batches are decoded in a worker thread and handed over through a queue of
+    `prefetch` slots. When the consumer falls behind the producer blocks, so
+    at most prefetch + 2 batches (queued, being decoded, being consumed) are
+    alive at once and max_memory_bytes is split between them.
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=prefetch)
+    batch_budget = max_memory_bytes // (prefetch + 2)
+    done = object()
+
+    async def produce():
+        cache = get_cache()
+        for year in years:
+            base_path = f"gs://pblc_data/localnet/meetings.{year}.csv"
+            try:
+                batches = cache.iter_batches(
+                    base_path,
+                    batch_size=batch_size,
+                    exclude_list=exclude_list,
+                    max_memory_bytes=batch_budget,
+                )
+                while True:
+                    batch = await asyncio.to_thread(next, batches, None)
+                    if batch is None:
+                        break
+                    batch["year"] = year
+                    await queue.put(batch)
+                logger.info("Successfully streamed data: %s", year)
+            except Exception as error:
+                logging.error(f"Failed to stream file: {year}: {error}")
+        await queue.put(done)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            batch = await queue.get()
+            if batch is done:
+                break
+            yield batch
+    finally:
+        producer.cancel()
+
+
 if __name__ == "__main__":
     # asyncio.run(upload_and_combine_metadata(years=YEARS,
     # exclude_list=EXCLUDE_LIST))
@@ -0,0 +1,173 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Batched CPU inference with a trained DeepSpeech2 checkpoint."""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+# pylint: disable=g-bad-import-order
+import numpy as np
+import tensorflow as tf
+# pylint: enable=g-bad-import-order
+
+import data.dataset as dataset
+import data.featurizer as featurizer
+import decoder
+import deep_speech_model
+
+# Default vocabulary file
+_VOCABULARY_FILE = os.path.join(
+    os.path.dirname(__file__), "data/vocabulary.txt")
+# The spectrogram of 16 kHz audio with 20 ms windows has 161 feature bins.
+_NUM_FEATURE_BINS = 161
+
+
+def pad_waveform(waveform, sample_rate, window_ms, stride_ms):
+  """Zero-pad a waveform too short for compute_spectrogram_feature.
+
+  The featurizer needs at least two frames, i.e. one window plus one stride
+  of samples, so a short tail, e.g. the last window of a recording, is
+  padded with silence instead of failing.
+
+  Args:
+    waveform: a 1-D numpy array.
+    sample_rate: an integer, the sample rate of the waveform.
+    window_ms: an integer for the length of a spectrogram frame, in ms.
+    stride_ms: an integer for the frame stride, in ms.
+
+  Returns:
+    The waveform, zero-padded at the end to the minimum length if needed.
+  """
+  min_samples = (int(0.001 * sample_rate * window_ms) +
+                 int(0.001 * sample_rate * stride_ms))
+  if len(waveform) >= min_samples:
+    return waveform
+  return np.pad(waveform, (0, min_samples - len(waveform)))
+
+
+class DeepSpeechInference(object):
+  """Restores a DeepSpeech2 checkpoint and transcribes waveforms in batches.
+
+  The model is built in its own graph and session, so several instances can
+  live in one process, and the session's thread pools can be sized to share
+  the CPU between worker processes.
+  """
+
+  def __init__(self,
+               model_dir,
+               vocabulary_file=_VOCABULARY_FILE,
+               sample_rate=16000,
+               window_ms=20,
+               stride_ms=10,
+               rnn_hidden_layers=5,
+               rnn_type="gru",
+               is_bidirectional=True,
+               rnn_hidden_size=800,
+               use_bias=True,
+               num_threads=0):
+    """Build the inference graph and restore the latest checkpoint.
+
+    Args:
+      model_dir: a string, the directory with the training checkpoints.
+      vocabulary_file: a string, the vocabulary the model was trained with.
+      sample_rate: an integer, the sample rate of the input waveforms.
+      window_ms: an integer for the length of a spectrogram frame, in ms.
+      stride_ms: an integer for the frame stride, in ms.
+      rnn_hidden_layers: an integer, the number of RNN layers.
+      rnn_type: a string, one of deep_speech_model.SUPPORTED_RNNS.
+      is_bidirectional: a boolean, if the RNN layers are bidirectional.
+      rnn_hidden_size: an integer for the hidden size of the RNNs.
+      use_bias: a boolean, if the last fully-connected layer has a bias.
+      num_threads: an integer for the intra- and inter-op thread pools; 0
+        lets TensorFlow pick.
+
+    Raises:
+      ValueError: if model_dir holds no checkpoint.
+    """
+    checkpoint = tf.train.latest_checkpoint(model_dir)
+    if checkpoint is None:
+      raise ValueError("No checkpoint found in {}".format(model_dir))
+
+    self.audio_featurizer = featurizer.AudioFeaturizer(
+        sample_rate=sample_rate, window_ms=window_ms, stride_ms=stride_ms)
+    self.speech_labels = featurizer.TextFeaturizer(
+        vocab_file=vocabulary_file).speech_labels
+    self.greedy_decoder = decoder.DeepSpeechDecoder(self.speech_labels)
+
+    self.graph = tf.Graph()
+    with self.graph.as_default():
+      self.features = tf.compat.v1.placeholder(
+          tf.float32, [None, None, _NUM_FEATURE_BINS, 1])
+      model = deep_speech_model.DeepSpeech2(
+          rnn_hidden_layers, rnn_type, is_bidirectional, rnn_hidden_size,
+          len(self.speech_labels), use_bias)
+      self.probabilities = model(self.features, training=False)
+      saver = tf.compat.v1.train.Saver()
+
+    config = tf.compat.v1.ConfigProto(
+        intra_op_parallelism_threads=num_threads,
+        inter_op_parallelism_threads=num_threads)
+    self.session = tf.compat.v1.Session(graph=self.graph, config=config)
+    saver.restore(self.session, checkpoint)
+
+  def featurize(self, waveform):
+    """Normalized spectrogram of a float waveform, shaped [T, F, 1]."""
+    audio_featurizer = self.audio_featurizer
+    waveform = pad_waveform(waveform, audio_featurizer.sample_rate,
+                            audio_featurizer.window_ms,
+                            audio_featurizer.stride_ms)
+    feature = featurizer.compute_spectrogram_feature(
+        waveform, audio_featurizer.sample_rate, audio_featurizer.stride_ms,
+        audio_featurizer.window_ms)
+    feature = dataset._normalize_audio_feature(feature)  # pylint: disable=protected-access
+    return np.expand_dims(feature, axis=2)
+
+  def predict(self, waveforms, batch_size=16):
+    """Transcribe float waveforms in [-1, 1].
+
+    Waveforms are sorted by length before batching, so each batch is padded
+    only to the longest of similar-length inputs.
+
+    Args:
+      waveforms: a list of 1-D numpy arrays.
+      batch_size: an integer, the number of waveforms per session run.
+
+    Returns:
+      A list of decoded strings, in the order of waveforms.
+    """
+    features = [self.featurize(waveform) for waveform in waveforms]
+    order = sorted(range(len(features)), key=lambda i: features[i].shape[0])
+    transcripts = [""] * len(features)
+    for start in range(0, len(order), batch_size):
+      batch = order[start:start + batch_size]
+      lengths = [features[i].shape[0] for i in batch]
+      max_length = max(lengths)
+      padded = np.zeros(
+          (len(batch), max_length, _NUM_FEATURE_BINS, 1), dtype=np.float32)
+      for row, i in enumerate(batch):
+        padded[row, :lengths[row]] = features[i]
+      probabilities = self.session.run(
+          self.probabilities, feed_dict={self.features: padded})
+      # Same scaling as deep_speech.compute_length_after_conv.
+      ctc_steps = probabilities.shape[1]
+      for row, i in enumerate(batch):
+        ctc_length = lengths[row] * ctc_steps // max_length
+        transcripts[i] = self.greedy_decoder.decode(
+            probabilities[row, :ctc_length])
+    return transcripts
+
+  def close(self):
+    self.session.close()
@@ -0,0 +1,60 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for the featurization of inference.DeepSpeechInference."""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from unittest import mock  # pylint: disable=g-importing-member
+
+# pylint: disable=g-bad-import-order
+import numpy as np
+import tensorflow as tf
+# pylint: enable=g-bad-import-order
+
+import data.featurizer as featurizer
+import inference
+
+
+class FeaturizeTest(tf.test.TestCase):
+
+  def setUp(self):
+    # featurize only needs the audio featurizer, not the restored model.
+    self.engine = mock.Mock(audio_featurizer=featurizer.AudioFeaturizer())
+
+  def test_short_waveforms_fail_without_padding(self):
+    # Shorter than one window, and one window but not two frames.
+    for num_samples in [100, 320]:
+      with self.assertRaises((IndexError, ValueError)):
+        featurizer.compute_spectrogram_feature(np.zeros(num_samples), 16000)
+
+  def test_pad_waveform(self):
+    # One 20 ms window plus one 10 ms stride at 16 kHz.
+    self.assertEqual(
+        inference.pad_waveform(np.ones(100), 16000, 20, 10).shape, (480,))
+    waveform = np.ones(1000)
+    self.assertIs(inference.pad_waveform(waveform, 16000, 20, 10), waveform)
+
+  def test_featurize_short_tails(self):
+    np.random.seed(0)
+    for num_samples in [1, 100, 319, 320, 479, 480, 16000]:
+      feature = inference.DeepSpeechInference.featurize(
+          self.engine, np.random.uniform(-1, 1, num_samples))
+      self.assertEqual(feature.shape[1:], (161, 1))
+      self.assertTrue(np.all(np.isfinite(feature)))
+
+
+if __name__ == "__main__":
+  tf.test.main()
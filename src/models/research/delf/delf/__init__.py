@@ -29,6 +29,7 @@ from delf.python import feature_aggregation_extractor
 from delf.python import feature_aggregation_similarity
 from delf.python import feature_extractor
 from delf.python import feature_io
+from delf.python import retrieval_index
 from delf.python import utils
 from delf.python import whiten
 from delf.python.examples import detector
@@ -28,6 +28,7 @@ import numpy as np
 import tensorflow as tf
 
 from delf import datum_io
+from delf import retrieval_index
 from delf.python.datasets.revisited_op import dataset
 from delf.python.detect_to_retrieve import image_reranking
 
@@ -58,6 +59,38 @@ flags.DEFINE_boolean(
     'use_ratio_test', False,
     'Optional, only used if `use_geometric_verification` is True. '
     'Whether to use ratio test for local feature matching.')
+flags.DEFINE_boolean(
+    'use_ann_index', False,
+    'If True, retrieves index images with an approximate nearest neighbour '
+    'index (IVF-PQ) instead of scoring every index image.')
+flags.DEFINE_string(
+    'ann_index_path', '',
+    'Optional, only used if `use_ann_index` is True. If the file exists, the '
+    'approximate nearest neighbour index is loaded from it; otherwise, the '
+    'index is built and, if the path is not empty, saved to it.')
+flags.DEFINE_integer(
+    'ann_num_lists', 64,
+    'Optional, only used if `use_ann_index` is True and the index is built. '
+    'Number of inverted lists of the index.')
+flags.DEFINE_integer(
+    'ann_num_subquantizers', 16,
+    'Optional, only used if `use_ann_index` is True and the index is built. '
+    'Number of product quantization sub-spaces, which must divide the global '
+    'descriptor dimensionality.')
+flags.DEFINE_integer(
+    'ann_num_probes', 8,
+    'Optional, only used if `use_ann_index` is True. Number of inverted lists '
+    'scored per query.')
+flags.DEFINE_integer(
+    'ann_num_results', 100,
+    'Optional, only used if `use_ann_index` is True. Number of index images '
+    'retrieved per query; the remaining index images are ranked after them, '
+    'by increasing index.')
+flags.DEFINE_integer(
+    'ann_recall_num_queries', 100,
+    'Optional, only used if `use_ann_index` is True. Number of randomly '
+    'sampled queries for which exact search is also run, to report the recall '
+    'of the approximate search. If 0, recall is not reported.')
 flags.DEFINE_string(
     'output_dir', '/tmp/retrieval',
     'Directory where retrieval output will be written to. A file containing '
@@ -107,6 +140,98 @@ def _ReadDelgGlobalDescriptors(input_dir, image_list):
   return np.array(global_descriptors)
 
 
+def _BuildOrLoadAnnIndex(index_global_features):
+  """Builds the approximate nearest neighbour index, or loads it from file.
+
+  Args:
+    index_global_features: NumPy array of shape (#index_images, D).
+
+  Returns:
+    ann_index: retrieval_index.IvfPqIndex.
+  """
+  if FLAGS.ann_index_path and tf.io.gfile.exists(FLAGS.ann_index_path):
+    print('Loading approximate nearest neighbour index from %s...' %
+          FLAGS.ann_index_path)
+    ann_index = retrieval_index.IvfPqIndex.Load(FLAGS.ann_index_path)
+    if ann_index.size != len(index_global_features):
+      raise ValueError('Index in %s has %d images, expected %d' %
+                       (FLAGS.ann_index_path, ann_index.size,
+                        len(index_global_features)))
+    return ann_index
+
+  print('Building approximate nearest neighbour index...')
+  start = time.time()
+  ann_index = retrieval_index.IvfPqIndex(
+      num_lists=FLAGS.ann_num_lists,
+      num_subquantizers=FLAGS.ann_num_subquantizers,
+      num_probes=FLAGS.ann_num_probes)
+  ann_index.Build(index_global_features)
+  print('done! Building took %f seconds' % (time.time() - start))
+  if FLAGS.ann_index_path:
+    ann_index.Save(FLAGS.ann_index_path)
+  return ann_index
+
+
+def _RanksFromApproximateSearch(indices, similarities, num_index_images):
+  """Converts approximate search results to full rankings and scores.
+
+  Args:
+    indices: Integer NumPy array of shape (#queries, K), with the retrieved
+      index images of each query, padded with -1.
+    similarities: NumPy array of the same shape, with their similarities.
+    num_index_images: Integer, number of index images.
+
+  Returns:
+    ranks: Integer NumPy array of shape (#queries, num_index_images), with the
+      retrieved index images first, followed by the other index images in
+      increasing order.
+    scores: NumPy array of shape (#queries, num_index_images), with the
+      similarities of the retrieved index images and -inf for the others.
+  """
+  ranks = np.zeros([len(indices), num_index_images], dtype='int32')
+  scores = np.full([len(indices), num_index_images], -np.inf)
+  for i, (query_indices, query_similarities) in enumerate(
+      zip(indices, similarities)):
+    retrieved = query_indices >= 0
+    query_indices = query_indices[retrieved]
+    not_retrieved = np.ones([num_index_images], dtype=bool)
+    not_retrieved[query_indices] = False
+    ranks[i] = np.concatenate(
+        [query_indices, np.flatnonzero(not_retrieved)])
+    scores[i, query_indices] = query_similarities[retrieved]
+  return ranks, scores
+
+
+def _ReportAnnRecall(query_global_features, index_global_features,
+                     ann_indices):
+  """Prints the recall of approximate search on a sample of the queries.
+
+  Exact search is only run for the sampled queries, so that its cost does not
+  grow with the number of queries.
+
+  Args:
+    query_global_features: NumPy array of shape (#queries, D).
+    index_global_features: NumPy array of shape (#index_images, D).
+    ann_indices: Integer NumPy array of shape (#queries, K), with the index
+      images retrieved by approximate search for each query.
+  """
+  num_queries = min(FLAGS.ann_recall_num_queries, len(query_global_features))
+  sample = np.sort(
+      np.random.RandomState(0).choice(
+          len(query_global_features), num_queries, replace=False))
+  max_k = min(FLAGS.ann_num_results, len(index_global_features))
+  start = time.time()
+  exact_indices, _ = retrieval_index.ExactSearch(
+      query_global_features[sample], index_global_features, max_k)
+  print('done! Exact search for %d sampled queries took %f seconds' %
+        (num_queries, time.time() - start))
+  for k in sorted(set(_PR_RANKS + (max_k,))):
+    if k <= max_k:
+      print('Approximate search recall@%d: %f' %
+            (k, retrieval_index.RecallAtK(ann_indices[sample], exact_indices,
+                                          k)))
+
+
 def main(argv):
   if len(argv) > 1:
     raise RuntimeError('Too many command-line arguments.')
@@ -128,28 +253,42 @@ def main(argv):
   index_global_features = _ReadDelgGlobalDescriptors(FLAGS.index_features_dir,
                                                      index_list)
 
-  # Compute similarity between query and index images, potentially re-ranking
-  # with geometric verification.
-  ranks_before_gv = np.zeros([num_query_images, num_index_images],
-                             dtype='int32')
+  # Compute similarity between query and index images, exactly or with an
+  # approximate nearest neighbour index.
+  if FLAGS.use_ann_index:
+    ann_index = _BuildOrLoadAnnIndex(index_global_features)
+    print('Computing global descriptor similarities...')
+    start = time.time()
+    ann_indices, ann_similarities = ann_index.Search(
+        query_global_features,
+        FLAGS.ann_num_results,
+        num_probes=FLAGS.ann_num_probes)
+    print('done! Approximate search took %f seconds' % (time.time() - start))
+    if FLAGS.ann_recall_num_queries > 0:
+      _ReportAnnRecall(query_global_features, index_global_features,
+                       ann_indices)
+    ranks_before_gv, all_similarities = _RanksFromApproximateSearch(
+        ann_indices, ann_similarities, num_index_images)
+  else:
+    print('Computing global descriptor similarities...')
+    start = time.time()
+    all_similarities = np.dot(query_global_features, index_global_features.T)
+    ranks_before_gv = np.argsort(-all_similarities, axis=1).astype('int32')
+    print('done! Exact search took %f seconds' % (time.time() - start))
+
+  # Potentially re-rank with geometric verification.
   if FLAGS.use_geometric_verification:
     medium_ranks_after_gv = np.zeros([num_query_images, num_index_images],
                                      dtype='int32')
     hard_ranks_after_gv = np.zeros([num_query_images, num_index_images],
                                    dtype='int32')
-  for i in range(num_query_images):
-    print('Performing retrieval with query %d (%s)...' % (i, query_list[i]))
-    start = time.time()
-
-    # Compute similarity between global descriptors.
-    similarities = np.dot(index_global_features, query_global_features[i])
-    ranks_before_gv[i] = np.argsort(-similarities)
+    for i in range(num_query_images):
+      print('Performing re-ranking with query %d (%s)...' % (i, query_list[i]))
+      start = time.time()
 
-    # Re-rank using geometric verification.
-    if FLAGS.use_geometric_verification:
       medium_ranks_after_gv[i] = image_reranking.RerankByGeometricVerification(
           input_ranks=ranks_before_gv[i],
-          initial_scores=similarities,
+          initial_scores=all_similarities[i],
           query_name=query_list[i],
           index_names=index_list,
           query_features_dir=FLAGS.query_features_dir,
@@ -163,7 +302,7 @@ def main(argv):
           use_ratio_test=FLAGS.use_ratio_test)
       hard_ranks_after_gv[i] = image_reranking.RerankByGeometricVerification(
           input_ranks=ranks_before_gv[i],
-          initial_scores=similarities,
+          initial_scores=all_similarities[i],
           query_name=query_list[i],
           index_names=index_list,
           query_features_dir=FLAGS.query_features_dir,
@@ -176,8 +315,8 @@ def main(argv):
           ransac_residual_threshold=FLAGS.ransac_residual_threshold,
           use_ratio_test=FLAGS.use_ratio_test)
 
-    elapsed = (time.time() - start)
-    print('done! Retrieval for query %d took %f seconds' % (i, elapsed))
+      elapsed = (time.time() - start)
+      print('done! Re-ranking for query %d took %f seconds' % (i, elapsed))
 
   # Create output directory if necessary.
   if not tf.io.gfile.exists(FLAGS.output_dir):
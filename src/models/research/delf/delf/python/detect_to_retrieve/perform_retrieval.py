@@ -53,6 +53,9 @@ _PR_RANKS = (1, 5, 10)
 # Pace to log.
 _STATUS_CHECK_LOAD_ITERATIONS = 50
 
+# Number of index images whose VLAD descriptors are scored at once.
+_VLAD_INDEX_BATCH_SIZE = 256
+
 # Output file names.
 _METRICS_FILENAME = 'metrics.txt'
 
@@ -112,6 +115,28 @@ def _ReadAggregatedDescriptors(input_dir, image_list, config):
   return aggregated_descriptors, visual_words
 
 
+def _ComputeVladSimilarities(query_descriptors, index_descriptors):
+  """Computes VLAD similarities between all query and index images.
+
+  Args:
+    query_descriptors: List of query VLAD descriptors, each a 1D NumPy array of
+      the same dimensionality.
+    index_descriptors: List of index VLAD descriptors.
+
+  Returns:
+    similarities: NumPy array of shape (len(query_descriptors),
+      len(index_descriptors)).
+  """
+  query_matrix = np.stack(query_descriptors)
+  similarities = np.zeros([len(query_descriptors), len(index_descriptors)])
+  for start in range(0, len(index_descriptors), _VLAD_INDEX_BATCH_SIZE):
+    index_matrix = np.stack(
+        index_descriptors[start:start + _VLAD_INDEX_BATCH_SIZE])
+    similarities[:, start:start + len(index_matrix)] = np.dot(
+        query_matrix, index_matrix.T)
+  return similarities
+
+
 def main(argv):
   if len(argv) > 1:
     raise RuntimeError('Too many command-line arguments.')
@@ -141,10 +166,16 @@ def main(argv):
   index_aggregated_descriptors, index_visual_words = _ReadAggregatedDescriptors(
       cmd_args.index_aggregation_dir, index_list, index_config)
 
-  # Create similarity computer.
-  similarity_computer = (
-      feature_aggregation_similarity.SimilarityAggregatedRepresentation(
-          index_config))
+  # VLAD similarities are inner products, which are computed for all queries
+  # at once with matrix products over batches of index images. ASMK/ASMK*
+  # similarities are computed with an inverted file of the index images.
+  if index_config.aggregation_type == _VLAD:
+    vlad_similarities = _ComputeVladSimilarities(query_aggregated_descriptors,
+                                                 index_aggregated_descriptors)
+  else:
+    inverted_file = feature_aggregation_similarity.AsmkInvertedFile(
+        index_config)
+    inverted_file.Build(index_aggregated_descriptors, index_visual_words)
 
   # Compute similarity between query and index images, potentially re-ranking
   # with geometric verification.
@@ -160,11 +191,11 @@ def main(argv):
     start = time.clock()
 
     # Compute similarity between aggregated descriptors.
-    similarities = np.zeros([num_index_images])
-    for j in range(num_index_images):
-      similarities[j] = similarity_computer.ComputeSimilarity(
-          query_aggregated_descriptors[i], index_aggregated_descriptors[j],
-          query_visual_words[i], index_visual_words[j])
+    if index_config.aggregation_type == _VLAD:
+      similarities = vlad_similarities[i]
+    else:
+      similarities = inverted_file.ComputeSimilarities(
+          query_aggregated_descriptors[i], query_visual_words[i])
 
     ranks_before_gv[i] = np.argsort(-similarities)
 
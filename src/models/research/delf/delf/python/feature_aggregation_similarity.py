@@ -31,6 +31,54 @@ _VLAD = aggregation_config_pb2.AggregationConfig.VLAD
 _ASMK = aggregation_config_pb2.AggregationConfig.ASMK
 _ASMK_STAR = aggregation_config_pb2.AggregationConfig.ASMK_STAR
 
+# Number of bits set in each byte value. Only relevant if using ASMK*.
+_NUMBER_BITS = np.array([bin(n).count('1') for n in range(256)])
+
+
+def _CheckAsmkDimensionality(aggregated_descriptors, num_visual_words,
+                             feature_dimensionality, descriptor_name):
+  """Checks that ASMK dimensionality is as expected.
+
+  Args:
+    aggregated_descriptors: 1-D NumPy array.
+    num_visual_words: Integer.
+    feature_dimensionality: Integer, expected dimensionality per visual word.
+    descriptor_name: String.
+
+  Raises:
+    ValueError: If descriptor dimensionality is incorrect.
+  """
+  if len(aggregated_descriptors) / num_visual_words != feature_dimensionality:
+    raise ValueError(
+        'Feature dimensionality for aggregated descriptor %s is invalid: %d;'
+        ' expected %d.' % (descriptor_name, len(aggregated_descriptors) /
+                           num_visual_words, feature_dimensionality))
+
+
+def _SigmaFn(x, alpha, tau):
+  """Selectivity ASMK/ASMK* similarity function.
+
+  Args:
+    x: Scalar or 1-D NumPy array.
+    alpha: Float, exponent of the selectivity function.
+    tau: Float, threshold below which the output is zero.
+
+  Returns:
+    result: Same type as input, with output of selectivity function.
+  """
+  if np.isscalar(x):
+    if x > tau:
+      result = np.sign(x) * np.power(np.absolute(x), alpha)
+    else:
+      result = 0.0
+  else:
+    result = np.zeros_like(x)
+    above_tau = np.nonzero(x > tau)
+    result[above_tau] = np.sign(x[above_tau]) * np.power(
+        np.absolute(x[above_tau]), alpha)
+
+  return result
+
 
 class SimilarityAggregatedRepresentation(object):
   """Class for computing similarity of aggregated local feature representations.
@@ -52,9 +100,6 @@ class SimilarityAggregatedRepresentation(object):
     self._alpha = aggregation_config.alpha
     self._tau = aggregation_config.tau
 
-    # Only relevant if using ASMK*. Otherwise, ignored.
-    self._number_bits = np.array([bin(n).count('1') for n in range(256)])
-
   def ComputeSimilarity(self,
                         aggregated_descriptors_1,
                         aggregated_descriptors_2,
@@ -99,47 +144,6 @@ class SimilarityAggregatedRepresentation(object):
 
     return similarity
 
-  def _CheckAsmkDimensionality(self, aggregated_descriptors, num_visual_words,
-                               descriptor_name):
-    """Checks that ASMK dimensionality is as expected.
-
-    Args:
-      aggregated_descriptors: 1-D NumPy array.
-      num_visual_words: Integer.
-      descriptor_name: String.
-
-    Raises:
-      ValueError: If descriptor dimensionality is incorrect.
-    """
-    if len(aggregated_descriptors
-          ) / num_visual_words != self._feature_dimensionality:
-      raise ValueError(
-          'Feature dimensionality for aggregated descriptor %s is invalid: %d;'
-          ' expected %d.' % (descriptor_name, len(aggregated_descriptors) /
-                             num_visual_words, self._feature_dimensionality))
-
-  def _SigmaFn(self, x):
-    """Selectivity ASMK/ASMK* similarity function.
-
-    Args:
-      x: Scalar or 1-D NumPy array.
-
-    Returns:
-      result: Same type as input, with output of selectivity function.
-    """
-    if np.isscalar(x):
-      if x > self._tau:
-        result = np.sign(x) * np.power(np.absolute(x), self._alpha)
-      else:
-        result = 0.0
-    else:
-      result = np.zeros_like(x)
-      above_tau = np.nonzero(x > self._tau)
-      result[above_tau] = np.sign(x[above_tau]) * np.power(
-          np.absolute(x[above_tau]), self._alpha)
-
-    return result
-
   def _BinaryNormalizedInnerProduct(self, descriptors_1, descriptors_2):
     """Computes normalized binary inner product.
 
@@ -161,7 +165,7 @@ class SimilarityAggregatedRepresentation(object):
 
     h = 0
     for i in range(num_descriptors):
-      h += self._number_bits[np.bitwise_xor(descriptors_1[i], descriptors_2[i])]
+      h += _NUMBER_BITS[np.bitwise_xor(descriptors_1[i], descriptors_2[i])]
 
     # If local feature dimensionality is lower than 8, then use that to compute
     # proper binarized inner product.
@@ -225,10 +229,10 @@ class SimilarityAggregatedRepresentation(object):
         raise ValueError('ASMK* dimensionality is inconsistent.')
     else:
       per_visual_word_dimensionality = self._feature_dimensionality
-      self._CheckAsmkDimensionality(aggregated_descriptors_1,
-                                    num_visual_words_1, '1')
-      self._CheckAsmkDimensionality(aggregated_descriptors_2,
-                                    num_visual_words_2, '2')
+      _CheckAsmkDimensionality(aggregated_descriptors_1, num_visual_words_1,
+                               self._feature_dimensionality, '1')
+      _CheckAsmkDimensionality(aggregated_descriptors_2, num_visual_words_2,
+                               self._feature_dimensionality, '2')
 
     aggregated_descriptors_1_reshape = np.reshape(
         aggregated_descriptors_1,
@@ -250,7 +254,8 @@ class SimilarityAggregatedRepresentation(object):
         else:
           inner_product = np.dot(aggregated_descriptors_1_reshape[ind_1],
                                  aggregated_descriptors_2_reshape[ind_2])
-        unnormalized_similarity += self._SigmaFn(inner_product)
+        unnormalized_similarity += _SigmaFn(inner_product, self._alpha,
+                                            self._tau)
         ind_1 += 1
         ind_2 += 1
       elif visual_words_1[ind_1] > visual_words_2[ind_2]:
@@ -263,3 +268,207 @@ class SimilarityAggregatedRepresentation(object):
       final_similarity /= np.sqrt(num_visual_words_1 * num_visual_words_2)
 
     return final_similarity
+
+
+class AsmkInvertedFile(object):
+  """Inverted file of ASMK/ASMK* aggregated representations.
+
+  Aggregated descriptors of the index images are stored in posting lists keyed
+  by visual word. The descriptors of each list are contiguous, so that a query
+  is scored against all index images by walking only the posting lists of its
+  own visual words. For ASMK*, the stored descriptors are the packed binarized
+  residuals (uint8), and inner products are computed with popcounts of their
+  XOR.
+
+  Similarities are identical to those of
+  `SimilarityAggregatedRepresentation.ComputeSimilarity` for each pair: matches
+  are accumulated in increasing visual word order, and for ASMK each inner
+  product is computed on its own and accumulated in the precision of the
+  descriptors, as `ComputeSimilarity` does, since a matrix-vector product may
+  round differently.
+
+  Args:
+    aggregation_config: AggregationConfig object defining type of aggregation to
+      use. It must be ASMK or ASMK*.
+
+  Raises:
+    ValueError: If aggregation type is invalid.
+  """
+
+  def __init__(self, aggregation_config):
+    self._aggregation_type = aggregation_config.aggregation_type
+    if self._aggregation_type not in (_ASMK, _ASMK_STAR):
+      raise ValueError('Invalid aggregation type for inverted file: %d' %
+                       self._aggregation_type)
+    self._feature_dimensionality = aggregation_config.feature_dimensionality
+    self._use_l2_normalization = aggregation_config.use_l2_normalization
+    self._alpha = aggregation_config.alpha
+    self._tau = aggregation_config.tau
+
+    # Sorted visual words with non-empty posting lists. The posting list of
+    # `_visual_words[k]` is at positions [_list_offsets[k], _list_offsets[k+1])
+    # of `_image_ids` and `_descriptors`, by increasing image id.
+    self._visual_words = None
+    self._list_offsets = None
+    self._image_ids = None
+    self._descriptors = None
+    # Number of visual words of each index image.
+    self._num_visual_words = None
+    self._per_visual_word_dimensionality = None
+
+  @property
+  def size(self):
+    """Number of index images."""
+    return 0 if self._num_visual_words is None else len(self._num_visual_words)
+
+  def Build(self, aggregated_descriptors, feature_visual_words):
+    """Builds the inverted file.
+
+    Args:
+      aggregated_descriptors: List of 1-D NumPy arrays, the aggregated
+        descriptors of each index image. For ASMK*, they must be of type uint8.
+      feature_visual_words: List of 1-D sorted NumPy integer arrays, the visual
+        words corresponding to each of `aggregated_descriptors`.
+
+    Raises:
+      ValueError: If the lists have different lengths, or if descriptor
+        dimensionality is inconsistent, or if descriptor type is unsupported.
+    """
+    num_images = len(aggregated_descriptors)
+    if len(feature_visual_words) != num_images:
+      raise ValueError('Got %d aggregated descriptors and %d visual words' %
+                       (num_images, len(feature_visual_words)))
+
+    self._num_visual_words = np.array(
+        [len(visual_words) for visual_words in feature_visual_words],
+        dtype=np.int64)
+    self._per_visual_word_dimensionality = None
+    descriptors = []
+    for i in range(num_images):
+      if self._num_visual_words[i]:
+        descriptors.append(
+            self._ReshapeDescriptors(aggregated_descriptors[i],
+                                     self._num_visual_words[i], str(i)))
+
+    if descriptors:
+      all_descriptors = np.concatenate(descriptors)
+      all_visual_words = np.concatenate(feature_visual_words).astype(np.int64)
+    else:
+      all_descriptors = np.zeros([0, 0])
+      all_visual_words = np.zeros([0], dtype=np.int64)
+    all_image_ids = np.repeat(np.arange(num_images), self._num_visual_words)
+
+    order = np.argsort(all_visual_words, kind='stable')
+    self._visual_words, list_starts = np.unique(
+        all_visual_words[order], return_index=True)
+    self._list_offsets = np.append(list_starts, len(order))
+    self._image_ids = all_image_ids[order]
+    self._descriptors = all_descriptors[order]
+
+  def ComputeSimilarities(self, aggregated_descriptors, feature_visual_words):
+    """Computes similarities between a query and all index images.
+
+    Args:
+      aggregated_descriptors: 1-D NumPy array, the aggregated descriptors of
+        the query. For ASMK*, it must be of type uint8.
+      feature_visual_words: 1-D sorted NumPy integer array denoting visual words
+        corresponding to `aggregated_descriptors`.
+
+    Returns:
+      similarities: 1-D NumPy array with the similarity of the query to each
+        index image. The larger, the more similar. If the query or an index
+        image has no visual words, their similarity is -1.0.
+
+    Raises:
+      ValueError: If the inverted file was not built, or if descriptor
+        dimensionality is inconsistent, or if descriptor type is unsupported.
+    """
+    if self._num_visual_words is None:
+      raise ValueError('The inverted file must be built before searching')
+    num_query_visual_words = len(feature_visual_words)
+    if not num_query_visual_words or not len(self._image_ids):
+      return np.full([self.size], -1.0)
+
+    query_descriptors = self._ReshapeDescriptors(aggregated_descriptors,
+                                                 num_query_visual_words,
+                                                 'query')
+    if self._aggregation_type == _ASMK_STAR:
+      # If local feature dimensionality is lower than 8, then use that to
+      # compute proper binarized inner product.
+      total_num_bits = min(self._feature_dimensionality,
+                           8) * self._per_visual_word_dimensionality
+      similarities = np.zeros([self.size])
+    else:
+      # Accumulate in the precision of the inner products, as
+      # `ComputeSimilarity` does.
+      similarities = np.zeros([self.size],
+                              dtype=np.result_type(self._descriptors,
+                                                   query_descriptors))
+
+    # Walk the posting lists of the query visual words, in increasing order.
+    list_indices = np.searchsorted(self._visual_words, feature_visual_words)
+    for i in range(num_query_visual_words):
+      k = list_indices[i]
+      if (k == len(self._visual_words) or
+          self._visual_words[k] != feature_visual_words[i]):
+        continue
+      start = self._list_offsets[k]
+      end = self._list_offsets[k + 1]
+      if self._aggregation_type == _ASMK_STAR:
+        h = np.sum(
+            _NUMBER_BITS[np.bitwise_xor(self._descriptors[start:end],
+                                        query_descriptors[i])],
+            axis=1)
+        inner_products = 1.0 - 2.0 * h / total_num_bits
+        similarities[self._image_ids[start:end]] += _SigmaFn(
+            inner_products, self._alpha, self._tau)
+      else:
+        for j in range(start, end):
+          inner_product = np.dot(self._descriptors[j], query_descriptors[i])
+          similarities[self._image_ids[j]] += _SigmaFn(inner_product,
+                                                       self._alpha, self._tau)
+
+    similarities = similarities.astype(np.float64)
+    has_visual_words = self._num_visual_words > 0
+    if self._use_l2_normalization:
+      similarities[has_visual_words] /= np.sqrt(
+          num_query_visual_words * self._num_visual_words[has_visual_words])
+    similarities[~has_visual_words] = -1.0
+    return similarities
+
+  def _ReshapeDescriptors(self, aggregated_descriptors, num_visual_words,
+                          descriptor_name):
+    """Checks aggregated descriptors and reshapes them per visual word.
+
+    Args:
+      aggregated_descriptors: 1-D NumPy array.
+      num_visual_words: Integer, larger than 0.
+      descriptor_name: String.
+
+    Returns:
+      reshaped_descriptors: NumPy array of shape [num_visual_words, D], where D
+        is the dimensionality per visual word.
+
+    Raises:
+      ValueError: If descriptor dimensionality is inconsistent, or if
+        descriptor type is unsupported.
+    """
+    if self._aggregation_type == _ASMK_STAR:
+      if aggregated_descriptors.dtype != 'uint8':
+        raise ValueError('Incorrect input descriptor type: %s' %
+                         aggregated_descriptors.dtype)
+      per_visual_word_dimensionality = int(
+          len(aggregated_descriptors) / num_visual_words)
+    else:
+      _CheckAsmkDimensionality(aggregated_descriptors, num_visual_words,
+                               self._feature_dimensionality, descriptor_name)
+      per_visual_word_dimensionality = self._feature_dimensionality
+
+    if self._per_visual_word_dimensionality is None:
+      self._per_visual_word_dimensionality = per_visual_word_dimensionality
+    elif (len(aggregated_descriptors) / num_visual_words !=
+          self._per_visual_word_dimensionality):
+      raise ValueError('ASMK* dimensionality is inconsistent.')
+
+    return np.reshape(aggregated_descriptors,
+                      [num_visual_words, per_visual_word_dimensionality])
@@ -132,6 +132,159 @@ class FeatureAggregationSimilarityTest(tf.test.TestCase):
     # Compare actual and expected results.
     self.assertAllClose(similarity, exp_similarity)
 
+  def testAsmkInvertedFileMatchesComputeSimilarity(self):
+    # Construct inputs.
+    query_descriptors = np.array([
+        0.0, 0.0, -0.707107, -0.707107, 0.5, 0.866025, 0.816497, 0.577350, 1.0,
+        0.0
+    ])
+    query_visual_words = np.array([0, 1, 2, 3, 4])
+    index_descriptors = [
+        np.array([0.0, 1.0, 1.0, 0.0, 0.707107, 0.707107]),
+        np.array([]),
+        np.array([0.6, 0.8]),
+        np.array([1.0, 0.0, 0.0, 1.0]),
+    ]
+    index_visual_words = [
+        np.array([1, 2, 4]),
+        np.array([], dtype=int),
+        np.array([2]),
+        np.array([3, 5]),
+    ]
+    config = aggregation_config_pb2.AggregationConfig()
+    config.codebook_size = 6
+    config.feature_dimensionality = 2
+    config.aggregation_type = aggregation_config_pb2.AggregationConfig.ASMK
+    config.use_l2_normalization = True
+
+    # Run tested function.
+    inverted_file = feature_aggregation_similarity.AsmkInvertedFile(config)
+    inverted_file.Build(index_descriptors, index_visual_words)
+    similarities = inverted_file.ComputeSimilarities(query_descriptors,
+                                                     query_visual_words)
+    empty_query_similarities = inverted_file.ComputeSimilarities(
+        np.array([]), np.array([], dtype=int))
+
+    # Define expected results.
+    similarity_computer = (
+        feature_aggregation_similarity.SimilarityAggregatedRepresentation(
+            config))
+    exp_similarities = [
+        similarity_computer.ComputeSimilarity(query_descriptors, descriptors,
+                                              query_visual_words, visual_words)
+        for descriptors, visual_words in zip(index_descriptors,
+                                             index_visual_words)
+    ]
+
+    # Compare actual and expected results.
+    self.assertEqual(inverted_file.size, 4)
+    self.assertAllEqual(similarities, exp_similarities)
+    self.assertAllClose(similarities[:2], [0.123562, -1.0])
+    self.assertAllEqual(empty_query_similarities, [-1.0, -1.0, -1.0, -1.0])
+
+  def testAsmkInvertedFileMatchesComputeSimilarityExactly(self):
+    # Construct inputs.
+    random_state = np.random.RandomState(0)
+    config = aggregation_config_pb2.AggregationConfig()
+    config.codebook_size = 20
+    config.feature_dimensionality = 128
+    config.aggregation_type = aggregation_config_pb2.AggregationConfig.ASMK
+    config.use_l2_normalization = True
+    config.alpha = 3.0
+    config.tau = 0.0
+    index_visual_words = [
+        np.sort(random_state.choice(20, n, replace=False))
+        for n in [5, 0, 12, 20, 1]
+    ]
+    index_descriptors = [
+        random_state.randn(128 * len(visual_words)).astype(np.float32)
+        for visual_words in index_visual_words
+    ]
+    query_visual_words = np.sort(random_state.choice(20, 8, replace=False))
+    query_descriptors = random_state.randn(
+        128 * len(query_visual_words)).astype(np.float32)
+
+    # Run tested function.
+    inverted_file = feature_aggregation_similarity.AsmkInvertedFile(config)
+    inverted_file.Build(index_descriptors, index_visual_words)
+    similarities = inverted_file.ComputeSimilarities(query_descriptors,
+                                                     query_visual_words)
+
+    # Define expected results.
+    similarity_computer = (
+        feature_aggregation_similarity.SimilarityAggregatedRepresentation(
+            config))
+    exp_similarities = [
+        similarity_computer.ComputeSimilarity(query_descriptors, descriptors,
+                                              query_visual_words, visual_words)
+        for descriptors, visual_words in zip(index_descriptors,
+                                             index_visual_words)
+    ]
+
+    # Compare actual and expected results.
+    self.assertAllEqual(similarities, exp_similarities)
+
+  def testAsmkStarInvertedFileMatchesComputeSimilarityExactly(self):
+    # Construct inputs.
+    random_state = np.random.RandomState(0)
+    config = aggregation_config_pb2.AggregationConfig()
+    config.codebook_size = 20
+    config.feature_dimensionality = 16
+    config.aggregation_type = aggregation_config_pb2.AggregationConfig.ASMK_STAR
+    config.use_l2_normalization = True
+    config.alpha = 3.0
+    config.tau = 0.0
+    index_visual_words = [
+        np.sort(random_state.choice(20, n, replace=False))
+        for n in [5, 0, 12, 20, 1]
+    ]
+    index_descriptors = [
+        random_state.randint(256, size=2 * len(visual_words)).astype('uint8')
+        for visual_words in index_visual_words
+    ]
+    query_visual_words = np.sort(random_state.choice(20, 8, replace=False))
+    query_descriptors = random_state.randint(
+        256, size=2 * len(query_visual_words)).astype('uint8')
+
+    # Run tested function.
+    inverted_file = feature_aggregation_similarity.AsmkInvertedFile(config)
+    inverted_file.Build(index_descriptors, index_visual_words)
+    similarities = inverted_file.ComputeSimilarities(query_descriptors,
+                                                     query_visual_words)
+
+    # Define expected results.
+    similarity_computer = (
+        feature_aggregation_similarity.SimilarityAggregatedRepresentation(
+            config))
+    exp_similarities = [
+        similarity_computer.ComputeSimilarity(query_descriptors, descriptors,
+                                              query_visual_words, visual_words)
+        for descriptors, visual_words in zip(index_descriptors,
+                                             index_visual_words)
+    ]
+
+    # Compare actual and expected results.
+    self.assertAllEqual(similarities, exp_similarities)
+
+  def testAsmkInvertedFileRaisesOnInvalidInputs(self):
+    config = aggregation_config_pb2.AggregationConfig()
+    config.feature_dimensionality = 2
+    config.aggregation_type = aggregation_config_pb2.AggregationConfig.VLAD
+    with self.assertRaises(ValueError):
+      feature_aggregation_similarity.AsmkInvertedFile(config)
+
+    config.aggregation_type = aggregation_config_pb2.AggregationConfig.ASMK_STAR
+    inverted_file = feature_aggregation_similarity.AsmkInvertedFile(config)
+    with self.assertRaises(ValueError):
+      inverted_file.ComputeSimilarities(
+          np.array([1], dtype='uint8'), np.array([0]))
+    with self.assertRaises(ValueError):
+      inverted_file.Build([np.array([0.0, 1.0])], [np.array([0])])
+    with self.assertRaises(ValueError):
+      inverted_file.Build(
+          [np.array([1], dtype='uint8'),
+           np.array([1, 2], dtype='uint8')], [np.array([0]), np.array([0])])
+
 
 if __name__ == '__main__':
   tf.test.main()
@@ -0,0 +1,380 @@
+# Lint as: python3
+# Copyright 2021 The TensorFlow Authors All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Retrieval indices for global image descriptors.
+
+Similarity between descriptors is their inner product, as used for DELG global
+descriptors and VLAD aggregated descriptors. `ExactSearch` scores queries
+against all index descriptors with batched matrix products. `IvfPqIndex` is an
+approximate nearest neighbour index: descriptors are partitioned into inverted
+lists by a coarse quantizer and their residuals are compressed by product
+quantization, so that a query only scores the few lists closest to it, with
+table lookups.
+
+For more details on the inverted file with product quantization, please refer
+to the paper:
+"Product Quantization for Nearest Neighbor Search", Jegou et al., TPAMI 2011.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import io
+
+import numpy as np
+import tensorflow as tf
+
+# Number of query descriptors scored at once in exact search.
+_QUERY_BATCH_SIZE = 256
+
+# Number of descriptors assigned to centroids at once in k-means.
+_KMEANS_BATCH_SIZE = 4096
+
+# Maximum number of centroids per product quantizer, so that codes fit a byte.
+_MAX_CODEBOOK_SIZE = 256
+
+
+def TopK(scores, k):
+  """Finds the indices of the k largest scores along the last axis.
+
+  Only the k largest scores are sorted, after a linear-time partial selection.
+
+  Args:
+    scores: NumPy array of shape [..., N].
+    k: Integer, number of indices to return. If larger than N, N indices are
+      returned.
+
+  Returns:
+    indices: Integer NumPy array of shape [..., min(k, N)], sorted by
+      decreasing score.
+  """
+  scores = np.asarray(scores)
+  num_scores = scores.shape[-1]
+  k = min(k, num_scores)
+  if k < num_scores:
+    indices = np.argpartition(-scores, k - 1, axis=-1)[..., :k]
+  else:
+    indices = np.broadcast_to(np.arange(num_scores), scores.shape)
+  order = np.argsort(
+      -np.take_along_axis(scores, indices, axis=-1), axis=-1, kind='stable')
+  return np.take_along_axis(indices, order, axis=-1)
+
+
+def ExactSearch(query_descriptors, index_descriptors, k):
+  """Finds the k most similar index descriptors of each query, exactly.
+
+  Args:
+    query_descriptors: NumPy array of shape [#queries, D].
+    index_descriptors: NumPy array of shape [#index_images, D].
+    k: Integer, number of results per query.
+
+  Returns:
+    indices: Integer NumPy array of shape [#queries, min(k, #index_images)],
+      with the most similar index images of each query, sorted by decreasing
+      similarity.
+    similarities: NumPy array of the same shape, with their similarities.
+  """
+  indices = []
+  similarities = []
+  for start in range(0, len(query_descriptors), _QUERY_BATCH_SIZE):
+    batch_similarities = np.dot(
+        query_descriptors[start:start + _QUERY_BATCH_SIZE],
+        index_descriptors.T)
+    batch_indices = TopK(batch_similarities, k)
+    indices.append(batch_indices)
+    similarities.append(
+        np.take_along_axis(batch_similarities, batch_indices, axis=-1))
+  num_results = min(k, len(index_descriptors))
+  if not indices:
+    return (np.zeros([0, num_results], dtype=np.int64),
+            np.zeros([0, num_results], dtype=index_descriptors.dtype))
+  return np.concatenate(indices), np.concatenate(similarities)
+
+
+def RecallAtK(approximate_indices, exact_indices, k):
+  """Computes the recall@k of approximate search against exact search.
+
+  Args:
+    approximate_indices: Integer NumPy array of shape [#queries, K1], with the
+      results of approximate search sorted by decreasing similarity.
+    exact_indices: Integer NumPy array of shape [#queries, K2], with the
+      results of exact search sorted by decreasing similarity.
+    k: Integer, number of results to compare. Must be <= K1 and K2.
+
+  Returns:
+    recall: Float, the average fraction of the exact top k results of each
+      query found in its approximate top k results.
+
+  Raises:
+    ValueError: If there are fewer than k results.
+  """
+  if k > approximate_indices.shape[1] or k > exact_indices.shape[1]:
+    raise ValueError('Fewer than %d results to compute recall: %d and %d' %
+                     (k, approximate_indices.shape[1], exact_indices.shape[1]))
+  found = [
+      len(np.intersect1d(approximate[:k], exact[:k]))
+      for approximate, exact in zip(approximate_indices, exact_indices)
+  ]
+  return np.mean(found) / k
+
+
+def _NearestCentroids(data, centroids):
+  """Assigns each data point to its nearest centroid in L2 distance.
+
+  Args:
+    data: NumPy array of shape [N, D].
+    centroids: NumPy array of shape [C, D].
+
+  Returns:
+    assignments: Integer NumPy array of shape [N].
+  """
+  squared_norms = np.sum(np.square(centroids), axis=1)
+  assignments = np.zeros([len(data)], dtype=np.int64)
+  for start in range(0, len(data), _KMEANS_BATCH_SIZE):
+    batch = data[start:start + _KMEANS_BATCH_SIZE]
+    distances = squared_norms - 2 * np.dot(batch, centroids.T)
+    assignments[start:start + _KMEANS_BATCH_SIZE] = np.argmin(distances, axis=1)
+  return assignments
+
+
+def _KMeans(data, num_clusters, num_iterations, random_state):
+  """Clusters data points with Lloyd's k-means algorithm.
+
+  Centroids are initialized to distinct random data points. A cluster left
+  empty by an iteration is re-initialized to a random data point.
+
+  Args:
+    data: NumPy array of shape [N, D], with N >= num_clusters.
+    num_clusters: Integer.
+    num_iterations: Integer.
+    random_state: np.random.RandomState.
+
+  Returns:
+    centroids: NumPy array of shape [num_clusters, D].
+  """
+  num_points = len(data)
+  centroids = data[random_state.choice(
+      num_points, num_clusters, replace=False)].copy()
+  for _ in range(num_iterations):
+    assignments = _NearestCentroids(data, centroids)
+    counts = np.bincount(assignments, minlength=num_clusters)
+    non_empty = counts > 0
+    starts = np.cumsum(counts) - counts
+    sums = np.add.reduceat(
+        data[np.argsort(assignments, kind='stable')], starts[non_empty], axis=0)
+    centroids[non_empty] = sums / counts[non_empty, np.newaxis]
+    num_empty = num_clusters - np.count_nonzero(non_empty)
+    if num_empty:
+      centroids[~non_empty] = data[random_state.choice(
+          num_points, num_empty, replace=False)]
+  return centroids
+
+
+class IvfPqIndex(object):
+  """Inverted file index with product quantization (IVF-PQ).
+
+  Building the index clusters the descriptors with k-means into `num_lists`
+  inverted lists. The residual of each descriptor to its list centroid is
+  split into `num_subquantizers` sub-vectors, each encoded by the index of
+  its nearest centroid among up to 256 learned for that sub-space, so that a
+  descriptor is stored in `num_subquantizers` bytes.
+
+  A query is scored against the `num_probes` lists whose centroids are most
+  similar to it. The similarity of the query q with a descriptor x of list l
+  is approximated as <q, c_l> + sum_m <q_m, r_m>, where c_l is the list
+  centroid and r_m the m-th reconstructed residual sub-vector; the <q_m, r_m>
+  terms are looked up in tables computed once per query. The cost of a query
+  is thus proportional to the size of the probed lists, not of the index.
+
+  Args:
+    num_lists: Integer, number of inverted lists.
+    num_subquantizers: Integer, number of product quantization sub-spaces. It
+      must divide the descriptor dimensionality.
+    num_probes: Integer, default number of lists scored per query.
+    num_iterations: Integer, number of k-means iterations when building.
+    seed: Integer, seed for k-means initialization.
+  """
+
+  def __init__(self,
+               num_lists=64,
+               num_subquantizers=16,
+               num_probes=8,
+               num_iterations=20,
+               seed=0):
+    self.num_lists = num_lists
+    self.num_subquantizers = num_subquantizers
+    self.num_probes = num_probes
+    self._num_iterations = num_iterations
+    self._seed = seed
+
+    # Coarse quantizer, [num_lists, D].
+    self._centroids = None
+    # Product quantizer codebooks, [num_subquantizers, codebook_size, D_sub].
+    self._codebooks = None
+    # Descriptors of list l are at positions [list_offsets[l],
+    # list_offsets[l + 1]) of `_ids` (their index) and `_codes` (their PQ
+    # codes, [N, num_subquantizers]).
+    self._list_offsets = None
+    self._ids = None
+    self._codes = None
+
+  @property
+  def size(self):
+    """Number of descriptors in the index."""
+    return 0 if self._ids is None else len(self._ids)
+
+  def Build(self, descriptors):
+    """Builds the index.
+
+    Args:
+      descriptors: NumPy array of shape [N, D], where N >= num_lists. Search
+        results are row indices of this array.
+
+    Raises:
+      ValueError: If there are fewer descriptors than lists, or if D is not
+        divisible by num_subquantizers.
+    """
+    descriptors = np.asarray(descriptors, dtype=np.float32)
+    num_descriptors, dimensionality = descriptors.shape
+    if num_descriptors < self.num_lists:
+      raise ValueError('Cannot build %d lists from %d descriptors' %
+                       (self.num_lists, num_descriptors))
+    if dimensionality % self.num_subquantizers:
+      raise ValueError(
+          'Descriptor dimensionality %d is not divisible by the number of '
+          'subquantizers %d' % (dimensionality, self.num_subquantizers))
+    random_state = np.random.RandomState(self._seed)
+
+    self._centroids = _KMeans(descriptors, self.num_lists,
+                              self._num_iterations, random_state)
+    assignments = _NearestCentroids(descriptors, self._centroids)
+    residuals = np.reshape(descriptors - self._centroids[assignments],
+                           [num_descriptors, self.num_subquantizers, -1])
+
+    codebook_size = min(_MAX_CODEBOOK_SIZE, num_descriptors)
+    self._codebooks = np.stack([
+        _KMeans(residuals[:, m], codebook_size, self._num_iterations,
+                random_state) for m in range(self.num_subquantizers)
+    ])
+    codes = np.stack([
+        _NearestCentroids(residuals[:, m], self._codebooks[m])
+        for m in range(self.num_subquantizers)
+    ], axis=1).astype(np.uint8)
+
+    self._ids = np.argsort(assignments, kind='stable')
+    self._codes = codes[self._ids]
+    self._list_offsets = np.concatenate(
+        [[0], np.cumsum(np.bincount(assignments, minlength=self.num_lists))])
+
+  def Search(self, query_descriptors, k, num_probes=None):
+    """Finds the k most similar index descriptors of each query, approximately.
+
+    Args:
+      query_descriptors: NumPy array of shape [#queries, D].
+      k: Integer, number of results per query.
+      num_probes: Integer, number of lists scored per query. If None, uses the
+        default of the index.
+
+    Returns:
+      indices: Integer NumPy array of shape [#queries, k], with the most
+        similar index descriptors of each query, sorted by decreasing
+        approximate similarity. If the probed lists hold fewer than k
+        descriptors, the remaining entries are -1.
+      similarities: NumPy array of the same shape, with the approximate
+        similarities, or -inf for missing results.
+
+    Raises:
+      ValueError: If the index was not built or loaded.
+    """
+    if self._centroids is None:
+      raise ValueError('The index must be built or loaded before searching')
+    if num_probes is None:
+      num_probes = self.num_probes
+    query_descriptors = np.asarray(query_descriptors, dtype=np.float32)
+    num_queries = len(query_descriptors)
+
+    coarse_similarities = np.dot(query_descriptors, self._centroids.T)
+    probes = TopK(coarse_similarities, num_probes)
+    subquantizers = np.arange(self.num_subquantizers)
+
+    indices = np.full([num_queries, k], -1, dtype=np.int64)
+    similarities = np.full([num_queries, k], -np.inf, dtype=np.float32)
+    for i in range(num_queries):
+      # Similarities of each query sub-vector with each codebook centroid.
+      lookup_table = np.einsum(
+          'md,mcd->mc',
+          np.reshape(query_descriptors[i], [self.num_subquantizers, -1]),
+          self._codebooks)
+      # Positions of the descriptors of the probed lists in `_ids`.
+      starts = self._list_offsets[probes[i]]
+      sizes = self._list_offsets[probes[i] + 1] - starts
+      candidate_starts = np.cumsum(sizes) - sizes
+      positions = np.arange(np.sum(sizes)) + np.repeat(
+          starts - candidate_starts, sizes)
+      candidate_similarities = (
+          np.repeat(coarse_similarities[i, probes[i]], sizes) +
+          np.sum(lookup_table[subquantizers, self._codes[positions]], axis=1))
+      top = TopK(candidate_similarities, k)
+      indices[i, :len(top)] = self._ids[positions[top]]
+      similarities[i, :len(top)] = candidate_similarities[top]
+    return indices, similarities
+
+  def Save(self, file_path):
+    """Saves the index to a file.
+
+    Args:
+      file_path: Path of the file, which may be on any filesystem supported by
+        tf.io.gfile.
+
+    Raises:
+      ValueError: If the index was not built.
+    """
+    if self._centroids is None:
+      raise ValueError('The index must be built before saving')
+    buffer = io.BytesIO()
+    np.savez(
+        buffer,
+        num_probes=self.num_probes,
+        centroids=self._centroids,
+        codebooks=self._codebooks,
+        list_offsets=self._list_offsets,
+        ids=self._ids,
+        codes=self._codes)
+    with tf.io.gfile.GFile(file_path, 'wb') as f:
+      f.write(buffer.getvalue())
+
+  @classmethod
+  def Load(cls, file_path):
+    """Loads an index saved with `Save`.
+
+    Args:
+      file_path: Path of the file.
+
+    Returns:
+      index: IvfPqIndex.
+    """
+    with tf.io.gfile.GFile(file_path, 'rb') as f:
+      data = np.load(io.BytesIO(f.read()))
+    index = cls(
+        num_lists=len(data['centroids']),
+        num_subquantizers=len(data['codebooks']),
+        num_probes=int(data['num_probes']))
+    index._centroids = data['centroids']
+    index._codebooks = data['codebooks']
+    index._list_offsets = data['list_offsets']
+    index._ids = data['ids']
+    index._codes = data['codes']
+    return index
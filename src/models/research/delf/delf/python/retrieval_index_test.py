@@ -0,0 +1,166 @@
+# Lint as: python3
+# Copyright 2021 The TensorFlow Authors All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for DELF retrieval indices."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+
+from absl import flags
+import numpy as np
+import tensorflow as tf
+
+from delf import retrieval_index
+
+FLAGS = flags.FLAGS
+
+
+def _RandomDescriptors(num_descriptors, dimensionality, seed):
+  random_state = np.random.RandomState(seed)
+  descriptors = random_state.randn(num_descriptors,
+                                   dimensionality).astype(np.float32)
+  return descriptors / np.linalg.norm(descriptors, axis=1, keepdims=True)
+
+
+class RetrievalIndexTest(tf.test.TestCase):
+
+  def testTopKWorks(self):
+    # Construct inputs.
+    scores = np.array([[0.1, 0.5, 0.3, 0.5, 0.0], [3.0, 1.0, 2.0, 0.0, 4.0]])
+
+    # Run tested function.
+    indices = retrieval_index.TopK(scores, 3)
+    all_indices = retrieval_index.TopK(scores, 10)
+
+    # Define expected results.
+    exp_indices = np.array([[1, 3, 2], [4, 0, 2]])
+    exp_all_indices = np.array([[1, 3, 2, 0, 4], [4, 0, 2, 1, 3]])
+
+    # Compare actual and expected results.
+    self.assertAllEqual(indices, exp_indices)
+    self.assertAllEqual(all_indices, exp_all_indices)
+
+  def testExactSearchWorks(self):
+    # Construct inputs.
+    query_descriptors = _RandomDescriptors(300, 16, seed=0)
+    index_descriptors = _RandomDescriptors(50, 16, seed=1)
+
+    # Run tested function.
+    indices, similarities = retrieval_index.ExactSearch(
+        query_descriptors, index_descriptors, 5)
+
+    # Define expected results.
+    all_similarities = np.dot(query_descriptors, index_descriptors.T)
+    exp_indices = np.argsort(-all_similarities, axis=1)[:, :5]
+    exp_similarities = np.take_along_axis(all_similarities, exp_indices, axis=1)
+
+    # Compare actual and expected results.
+    self.assertAllEqual(indices, exp_indices)
+    self.assertAllClose(similarities, exp_similarities)
+
+  def testRecallAtKWorks(self):
+    # Construct inputs.
+    approximate_indices = np.array([[0, 1, 2], [5, 3, 4]])
+    exact_indices = np.array([[1, 0, 3], [3, 4, 5]])
+
+    # Run tested function.
+    recall_at_1 = retrieval_index.RecallAtK(approximate_indices, exact_indices,
+                                            1)
+    recall_at_2 = retrieval_index.RecallAtK(approximate_indices, exact_indices,
+                                            2)
+
+    # Compare actual and expected results.
+    self.assertAllClose(recall_at_1, 0.0)
+    self.assertAllClose(recall_at_2, 0.75)
+    with self.assertRaises(ValueError):
+      retrieval_index.RecallAtK(approximate_indices, exact_indices, 4)
+
+  def testIvfPqSearchIsExactWithLosslessCodes(self):
+    # Construct inputs. With at most 256 descriptors, each residual sub-vector
+    # is its own codebook centroid, so codes are lossless and probing all lists
+    # gives exact search.
+    index_descriptors = _RandomDescriptors(200, 16, seed=0)
+    query_descriptors = _RandomDescriptors(20, 16, seed=1)
+    index = retrieval_index.IvfPqIndex(num_lists=4, num_subquantizers=4)
+    index.Build(index_descriptors)
+
+    # Run tested function.
+    indices, similarities = index.Search(query_descriptors, 10, num_probes=4)
+
+    # Define expected results.
+    exp_indices, exp_similarities = retrieval_index.ExactSearch(
+        query_descriptors, index_descriptors, 10)
+
+    # Compare actual and expected results.
+    self.assertEqual(index.size, 200)
+    self.assertAllEqual(indices, exp_indices)
+    self.assertAllClose(similarities, exp_similarities, atol=1e-5)
+
+  def testIvfPqSearchPadsMissingResults(self):
+    # Construct inputs.
+    index_descriptors = _RandomDescriptors(40, 8, seed=0)
+    query_descriptors = _RandomDescriptors(3, 8, seed=1)
+    index = retrieval_index.IvfPqIndex(
+        num_lists=8, num_subquantizers=2, num_probes=1)
+    index.Build(index_descriptors)
+
+    # Run tested function.
+    indices, similarities = index.Search(query_descriptors, 40)
+
+    # Compare actual and expected results.
+    for query_indices, query_similarities in zip(indices, similarities):
+      num_results = np.count_nonzero(query_indices >= 0)
+      self.assertLess(num_results, 40)
+      self.assertTrue(np.all(query_indices[num_results:] == -1))
+      self.assertTrue(np.all(np.isneginf(query_similarities[num_results:])))
+      self.assertTrue(np.all(np.isfinite(query_similarities[:num_results])))
+
+  def testIvfPqSaveAndLoadWorks(self):
+    # Construct inputs.
+    index_descriptors = _RandomDescriptors(1000, 32, seed=0)
+    query_descriptors = _RandomDescriptors(10, 32, seed=1)
+    index = retrieval_index.IvfPqIndex(
+        num_lists=16, num_subquantizers=8, num_probes=4)
+    index.Build(index_descriptors)
+    file_path = os.path.join(FLAGS.test_tmpdir, 'index.npz')
+
+    # Run tested function.
+    index.Save(file_path)
+    loaded_index = retrieval_index.IvfPqIndex.Load(file_path)
+
+    # Compare actual and expected results.
+    indices, similarities = index.Search(query_descriptors, 20)
+    loaded_indices, loaded_similarities = loaded_index.Search(
+        query_descriptors, 20)
+    self.assertEqual(loaded_index.num_probes, 4)
+    self.assertEqual(loaded_index.size, 1000)
+    self.assertAllEqual(indices, loaded_indices)
+    self.assertAllEqual(similarities, loaded_similarities)
+
+  def testIvfPqRaisesOnInvalidInputs(self):
+    index = retrieval_index.IvfPqIndex(num_lists=4, num_subquantizers=3)
+    with self.assertRaises(ValueError):
+      index.Search(_RandomDescriptors(1, 6, seed=0), 1)
+    with self.assertRaises(ValueError):
+      index.Build(_RandomDescriptors(3, 6, seed=0))
+    with self.assertRaises(ValueError):
+      index.Build(_RandomDescriptors(10, 8, seed=0))
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -36,7 +36,8 @@ class CocoDetectionEvaluator(object_detection_evaluation.DetectionEvaluator):
                include_metrics_per_category=False,
                all_metrics_per_category=False,
                skip_predictions_for_unlabeled_class=False,
-               super_categories=None):
+               super_categories=None,
+               streaming=False):
     """Constructor.
 
     Args:
@@ -55,6 +56,11 @@ class CocoDetectionEvaluator(object_detection_evaluation.DetectionEvaluator):
         in the label_map).  Metrics are aggregated along these super-categories
         and added to the `per_category_ap` and are associated with the name
           `PerformanceBySuperCategory/<super-category-name>`.
+      streaming: If True, the detections of each image are matched to its
+        groundtruth as soon as they are added, and only the compact match
+        results are kept until evaluate(). This bounds the memory used on
+        large eval sets, but the detections can then not be dumped to a json
+        file.
     """
     super(CocoDetectionEvaluator, self).__init__(categories)
     # _image_ids is a dictionary that maps unique image ids to Booleans which
@@ -70,12 +76,24 @@ class CocoDetectionEvaluator(object_detection_evaluation.DetectionEvaluator):
     self._skip_predictions_for_unlabeled_class = skip_predictions_for_unlabeled_class
     self._groundtruth_labeled_classes = {}
     self._super_categories = super_categories
+    self._streaming = streaming
+    # Groundtruth of the images whose detections were not yet added, and the
+    # evaluator of the images whose detections were, when streaming.
+    self._pending_groundtruth = {}
+    self._streaming_evaluator = None
+    if streaming:
+      self._streaming_evaluator = coco_tools.COCOStreamingEvalWrapper(
+          self._categories)
 
   def clear(self):
     """Clears the state to prepare for a fresh evaluation."""
     self._image_ids.clear()
     self._groundtruth_list = []
     self._detection_boxes_list = []
+    self._pending_groundtruth.clear()
+    if self._streaming:
+      self._streaming_evaluator = coco_tools.COCOStreamingEvalWrapper(
+          self._categories)
 
   def add_single_ground_truth_image_info(self,
                                          image_id,
@@ -133,20 +151,22 @@ class CocoDetectionEvaluator(object_detection_evaluation.DetectionEvaluator):
         0]:
       groundtruth_keypoint_visibilities = None
 
-    self._groundtruth_list.extend(
-        coco_tools.ExportSingleImageGroundtruthToCoco(
-            image_id=image_id,
-            next_annotation_id=self._annotation_id,
-            category_id_set=self._category_id_set,
-            groundtruth_boxes=groundtruth_dict[
-                standard_fields.InputDataFields.groundtruth_boxes],
-            groundtruth_classes=groundtruth_dict[
-                standard_fields.InputDataFields.groundtruth_classes],
-            groundtruth_is_crowd=groundtruth_is_crowd,
-            groundtruth_area=groundtruth_area,
-            groundtruth_keypoints=groundtruth_keypoints,
-            groundtruth_keypoint_visibilities=groundtruth_keypoint_visibilities)
-    )
+    groundtruth_list = coco_tools.ExportSingleImageGroundtruthToCoco(
+        image_id=image_id,
+        next_annotation_id=self._annotation_id,
+        category_id_set=self._category_id_set,
+        groundtruth_boxes=groundtruth_dict[
+            standard_fields.InputDataFields.groundtruth_boxes],
+        groundtruth_classes=groundtruth_dict[
+            standard_fields.InputDataFields.groundtruth_classes],
+        groundtruth_is_crowd=groundtruth_is_crowd,
+        groundtruth_area=groundtruth_area,
+        groundtruth_keypoints=groundtruth_keypoints,
+        groundtruth_keypoint_visibilities=groundtruth_keypoint_visibilities)
+    if self._streaming:
+      self._pending_groundtruth[image_id] = groundtruth_list
+    else:
+      self._groundtruth_list.extend(groundtruth_list)
 
     self._annotation_id += groundtruth_dict[standard_fields.InputDataFields.
                                             groundtruth_boxes].shape[0]
@@ -211,32 +231,35 @@ class CocoDetectionEvaluator(object_detection_evaluation.DetectionEvaluator):
       for box_id in range(num_det_boxes):
         if det_classes[box_id] in self._groundtruth_labeled_classes[image_id]:
           keep_box_ids.append(box_id)
-      self._detection_boxes_list.extend(
-          coco_tools.ExportSingleImageDetectionBoxesToCoco(
-              image_id=image_id,
-              category_id_set=self._category_id_set,
-              detection_boxes=detections_dict[
-                  standard_fields.DetectionResultFields.detection_boxes]
-              [keep_box_ids],
-              detection_scores=detections_dict[
-                  standard_fields.DetectionResultFields.detection_scores]
-              [keep_box_ids],
-              detection_classes=detections_dict[
-                  standard_fields.DetectionResultFields.detection_classes]
-              [keep_box_ids],
-              detection_keypoints=detection_keypoints))
+      detections_list = coco_tools.ExportSingleImageDetectionBoxesToCoco(
+          image_id=image_id,
+          category_id_set=self._category_id_set,
+          detection_boxes=detections_dict[
+              standard_fields.DetectionResultFields.detection_boxes]
+          [keep_box_ids],
+          detection_scores=detections_dict[
+              standard_fields.DetectionResultFields.detection_scores]
+          [keep_box_ids],
+          detection_classes=detections_dict[
+              standard_fields.DetectionResultFields.detection_classes]
+          [keep_box_ids],
+          detection_keypoints=detection_keypoints)
+    else:
+      detections_list = coco_tools.ExportSingleImageDetectionBoxesToCoco(
+          image_id=image_id,
+          category_id_set=self._category_id_set,
+          detection_boxes=detections_dict[
+              standard_fields.DetectionResultFields.detection_boxes],
+          detection_scores=detections_dict[
+              standard_fields.DetectionResultFields.detection_scores],
+          detection_classes=detections_dict[
+              standard_fields.DetectionResultFields.detection_classes],
+          detection_keypoints=detection_keypoints)
+    if self._streaming:
+      self._streaming_evaluator.AddSingleImage(
+          image_id, self._pending_groundtruth.pop(image_id), detections_list)
     else:
-      self._detection_boxes_list.extend(
-          coco_tools.ExportSingleImageDetectionBoxesToCoco(
-              image_id=image_id,
-              category_id_set=self._category_id_set,
-              detection_boxes=detections_dict[
-                  standard_fields.DetectionResultFields.detection_boxes],
-              detection_scores=detections_dict[
-                  standard_fields.DetectionResultFields.detection_scores],
-              detection_classes=detections_dict[
-                  standard_fields.DetectionResultFields.detection_classes],
-              detection_keypoints=detection_keypoints))
+      self._detection_boxes_list.extend(detections_list)
     self._image_ids[image_id] = True
 
   def dump_detections_to_json_file(self, json_output_path):
@@ -245,8 +268,14 @@ class CocoDetectionEvaluator(object_detection_evaluation.DetectionEvaluator):
     Args:
       json_output_path: String containing the output file's path. It can be also
         None. In that case nothing will be written to the output file.
+
+    Raises:
+      ValueError: If the evaluator is streaming, as it does not keep the
+        detections.
     """
     if json_output_path and json_output_path is not None:
+      if self._streaming:
+        raise ValueError('Detections are not kept when streaming.')
       with tf.gfile.GFile(json_output_path, 'w') as fid:
         tf.logging.info('Dumping detections to output json file.')
         json_utils.Dump(
@@ -291,16 +320,25 @@ class CocoDetectionEvaluator(object_detection_evaluation.DetectionEvaluator):
       `PerformanceBySuperCategory/<super-category-name>`
     """
     tf.logging.info('Performing evaluation on %d images.', len(self._image_ids))
-    groundtruth_dict = {
-        'annotations': self._groundtruth_list,
-        'images': [{'id': image_id} for image_id in self._image_ids],
-        'categories': self._categories
-    }
-    coco_wrapped_groundtruth = coco_tools.COCOWrapper(groundtruth_dict)
-    coco_wrapped_detections = coco_wrapped_groundtruth.LoadAnnotations(
-        self._detection_boxes_list)
-    box_evaluator = coco_tools.COCOEvalWrapper(
-        coco_wrapped_groundtruth, coco_wrapped_detections, agnostic_mode=False)
+    if self._streaming:
+      # Images without detections are evaluated against their groundtruth only.
+      for image_id, groundtruth_list in self._pending_groundtruth.items():
+        self._streaming_evaluator.AddSingleImage(image_id, groundtruth_list, [])
+        self._image_ids[image_id] = True
+      self._pending_groundtruth.clear()
+      box_evaluator = self._streaming_evaluator
+    else:
+      groundtruth_dict = {
+          'annotations': self._groundtruth_list,
+          'images': [{'id': image_id} for image_id in self._image_ids],
+          'categories': self._categories
+      }
+      coco_wrapped_groundtruth = coco_tools.COCOWrapper(groundtruth_dict)
+      coco_wrapped_detections = coco_wrapped_groundtruth.LoadAnnotations(
+          self._detection_boxes_list)
+      box_evaluator = coco_tools.COCOEvalWrapper(
+          coco_wrapped_groundtruth, coco_wrapped_detections,
+          agnostic_mode=False)
     box_metrics, box_per_category_ap = box_evaluator.ComputeMetrics(
         include_metrics_per_category=self._include_metrics_per_category,
         all_metrics_per_category=self._all_metrics_per_category,
@@ -963,7 +1001,8 @@ class CocoMaskEvaluator(object_detection_evaluation.DetectionEvaluator):
   def __init__(self, categories,
                include_metrics_per_category=False,
                all_metrics_per_category=False,
-               super_categories=None):
+               super_categories=None,
+               streaming=False):
     """Constructor.
 
     Args:
@@ -980,6 +1019,11 @@ class CocoMaskEvaluator(object_detection_evaluation.DetectionEvaluator):
         in the label_map).  Metrics are aggregated along these super-categories
         and added to the `per_category_ap` and are associated with the name
           `PerformanceBySuperCategory/<super-category-name>`.
+      streaming: If True, the detection masks of each image are matched to its
+        groundtruth as soon as they are added, and only the compact match
+        results are kept until evaluate(). This bounds the memory used by the
+        RLE encoded masks on large eval sets, but the detections can then not
+        be dumped to a json file.
     """
     super(CocoMaskEvaluator, self).__init__(categories)
     self._image_id_to_mask_shape_map = {}
@@ -991,6 +1035,14 @@ class CocoMaskEvaluator(object_detection_evaluation.DetectionEvaluator):
     self._include_metrics_per_category = include_metrics_per_category
     self._super_categories = super_categories
     self._all_metrics_per_category = all_metrics_per_category
+    self._streaming = streaming
+    # Groundtruth of the images whose detections were not yet added, and the
+    # evaluator of the images whose detections were, when streaming.
+    self._pending_groundtruth = {}
+    self._streaming_evaluator = None
+    if streaming:
+      self._streaming_evaluator = coco_tools.COCOStreamingEvalWrapper(
+          self._categories, iou_type='segm')
 
   def clear(self):
     """Clears the state to prepare for a fresh evaluation."""
@@ -998,6 +1050,10 @@ class CocoMaskEvaluator(object_detection_evaluation.DetectionEvaluator):
     self._image_ids_with_detections.clear()
     self._groundtruth_list = []
     self._detection_masks_list = []
+    self._pending_groundtruth.clear()
+    if self._streaming:
+      self._streaming_evaluator = coco_tools.COCOStreamingEvalWrapper(
+          self._categories, iou_type='segm')
 
   def add_single_ground_truth_image_info(self,
                                          image_id,
@@ -1044,20 +1100,21 @@ class CocoMaskEvaluator(object_detection_evaluation.DetectionEvaluator):
         standard_fields.InputDataFields.groundtruth_instance_masks]
     groundtruth_instance_masks = convert_masks_to_binary(
         groundtruth_instance_masks)
-    self._groundtruth_list.extend(
-        coco_tools.
-        ExportSingleImageGroundtruthToCoco(
-            image_id=image_id,
-            next_annotation_id=self._annotation_id,
-            category_id_set=self._category_id_set,
-            groundtruth_boxes=groundtruth_dict[standard_fields.InputDataFields.
-                                               groundtruth_boxes],
-            groundtruth_classes=groundtruth_dict[standard_fields.
-                                                 InputDataFields.
-                                                 groundtruth_classes],
-            groundtruth_masks=groundtruth_instance_masks,
-            groundtruth_is_crowd=groundtruth_is_crowd,
-            groundtruth_area=groundtruth_area))
+    groundtruth_list = coco_tools.ExportSingleImageGroundtruthToCoco(
+        image_id=image_id,
+        next_annotation_id=self._annotation_id,
+        category_id_set=self._category_id_set,
+        groundtruth_boxes=groundtruth_dict[standard_fields.InputDataFields.
+                                           groundtruth_boxes],
+        groundtruth_classes=groundtruth_dict[standard_fields.InputDataFields.
+                                             groundtruth_classes],
+        groundtruth_masks=groundtruth_instance_masks,
+        groundtruth_is_crowd=groundtruth_is_crowd,
+        groundtruth_area=groundtruth_area)
+    if self._streaming:
+      self._pending_groundtruth[image_id] = groundtruth_list
+    else:
+      self._groundtruth_list.extend(groundtruth_list)
     self._annotation_id += groundtruth_dict[standard_fields.InputDataFields.
                                             groundtruth_boxes].shape[0]
     self._image_id_to_mask_shape_map[image_id] = groundtruth_dict[
@@ -1105,17 +1162,21 @@ class CocoMaskEvaluator(object_detection_evaluation.DetectionEvaluator):
                            groundtruth_masks_shape,
                            detection_masks.shape))
     detection_masks = convert_masks_to_binary(detection_masks)
-    self._detection_masks_list.extend(
-        coco_tools.ExportSingleImageDetectionMasksToCoco(
-            image_id=image_id,
-            category_id_set=self._category_id_set,
-            detection_masks=detection_masks,
-            detection_scores=detections_dict[standard_fields.
-                                             DetectionResultFields.
-                                             detection_scores],
-            detection_classes=detections_dict[standard_fields.
-                                              DetectionResultFields.
-                                              detection_classes]))
+    detections_list = coco_tools.ExportSingleImageDetectionMasksToCoco(
+        image_id=image_id,
+        category_id_set=self._category_id_set,
+        detection_masks=detection_masks,
+        detection_scores=detections_dict[standard_fields.
+                                         DetectionResultFields.
+                                         detection_scores],
+        detection_classes=detections_dict[standard_fields.
+                                          DetectionResultFields.
+                                          detection_classes])
+    if self._streaming:
+      self._streaming_evaluator.AddSingleImage(
+          image_id, self._pending_groundtruth.pop(image_id), detections_list)
+    else:
+      self._detection_masks_list.extend(detections_list)
     self._image_ids_with_detections.update([image_id])
 
   def dump_detections_to_json_file(self, json_output_path):
@@ -1124,8 +1185,14 @@ class CocoMaskEvaluator(object_detection_evaluation.DetectionEvaluator):
     Args:
       json_output_path: String containing the output file's path. It can be also
         None. In that case nothing will be written to the output file.
+
+    Raises:
+      ValueError: If the evaluator is streaming, as it does not keep the
+        detections.
     """
     if json_output_path and json_output_path is not None:
+      if self._streaming:
+        raise ValueError('Detections are not kept when streaming.')
       tf.logging.info('Dumping detections to output json file.')
       with tf.gfile.GFile(json_output_path, 'w') as fid:
         json_utils.Dump(
@@ -1168,20 +1235,28 @@ class CocoMaskEvaluator(object_detection_evaluation.DetectionEvaluator):
       metrics aggregated along the super_categories with keys of the form:
       `PerformanceBySuperCategory/<super-category-name>`
     """
-    groundtruth_dict = {
-        'annotations': self._groundtruth_list,
-        'images': [{'id': image_id, 'height': shape[1], 'width': shape[2]}
-                   for image_id, shape in self._image_id_to_mask_shape_map.
-                   items()],
-        'categories': self._categories
-    }
-    coco_wrapped_groundtruth = coco_tools.COCOWrapper(
-        groundtruth_dict, detection_type='segmentation')
-    coco_wrapped_detection_masks = coco_wrapped_groundtruth.LoadAnnotations(
-        self._detection_masks_list)
-    mask_evaluator = coco_tools.COCOEvalWrapper(
-        coco_wrapped_groundtruth, coco_wrapped_detection_masks,
-        agnostic_mode=False, iou_type='segm')
+    if self._streaming:
+      # Images without detections are evaluated against their groundtruth only.
+      for image_id, groundtruth_list in self._pending_groundtruth.items():
+        self._streaming_evaluator.AddSingleImage(image_id, groundtruth_list, [])
+        self._image_ids_with_detections.update([image_id])
+      self._pending_groundtruth.clear()
+      mask_evaluator = self._streaming_evaluator
+    else:
+      groundtruth_dict = {
+          'annotations': self._groundtruth_list,
+          'images': [{'id': image_id, 'height': shape[1], 'width': shape[2]}
+                     for image_id, shape in self._image_id_to_mask_shape_map.
+                     items()],
+          'categories': self._categories
+      }
+      coco_wrapped_groundtruth = coco_tools.COCOWrapper(
+          groundtruth_dict, detection_type='segmentation')
+      coco_wrapped_detection_masks = coco_wrapped_groundtruth.LoadAnnotations(
+          self._detection_masks_list)
+      mask_evaluator = coco_tools.COCOEvalWrapper(
+          coco_wrapped_groundtruth, coco_wrapped_detection_masks,
+          agnostic_mode=False, iou_type='segm')
     mask_metrics, mask_per_category_ap = mask_evaluator.ComputeMetrics(
         include_metrics_per_category=self._include_metrics_per_category,
         super_categories=self._super_categories,
@@ -172,6 +172,49 @@ class CocoDetectionEvaluationTest(tf.test.TestCase):
     metrics = coco_evaluator.evaluate()
     self.assertAlmostEqual(metrics['DetectionBoxes_Precision/mAP'], 1.0)
 
+  def testStreamingMatchesNonStreaming(self):
+    """Tests that streaming evaluation gives the same metrics."""
+    coco_evaluator = coco_evaluation.CocoDetectionEvaluator(
+        _get_categories_list())
+    streaming_coco_evaluator = coco_evaluation.CocoDetectionEvaluator(
+        _get_categories_list(), streaming=True)
+    np.random.seed(0)
+    for image_id in range(10):
+      corners = np.random.uniform(0., 200., size=(4, 2))
+      boxes = np.concatenate([corners, corners + 50.], axis=1)
+      classes = np.random.randint(1, 4, size=4)
+      detection_boxes = boxes[:3] + np.random.uniform(-10., 10., size=(3, 4))
+      detection_scores = np.random.uniform(size=3)
+      for evaluator in [coco_evaluator, streaming_coco_evaluator]:
+        evaluator.add_single_ground_truth_image_info(
+            image_id=image_id,
+            groundtruth_dict={
+                standard_fields.InputDataFields.groundtruth_boxes: boxes,
+                standard_fields.InputDataFields.groundtruth_classes: classes
+            })
+        # The last image has no detections.
+        if image_id < 9:
+          evaluator.add_single_detected_image_info(
+              image_id=image_id,
+              detections_dict={
+                  standard_fields.DetectionResultFields.detection_boxes:
+                      detection_boxes,
+                  standard_fields.DetectionResultFields.detection_scores:
+                      detection_scores,
+                  standard_fields.DetectionResultFields.detection_classes:
+                      classes[:3]
+              })
+    self.assertFalse(streaming_coco_evaluator._groundtruth_list)
+    self.assertFalse(streaming_coco_evaluator._detection_boxes_list)
+    with self.assertRaises(ValueError):
+      streaming_coco_evaluator.dump_detections_to_json_file('detections.json')
+
+    metrics = coco_evaluator.evaluate()
+    self.assertGreater(metrics['DetectionBoxes_Precision/mAP'], 0.)
+    self.assertDictEqual(metrics, streaming_coco_evaluator.evaluate())
+    streaming_coco_evaluator.clear()
+    self.assertFalse(streaming_coco_evaluator._pending_groundtruth)
+
   def testRejectionOnDuplicateGroundtruth(self):
     """Tests that groundtruth cannot be added more than once for an image."""
     coco_evaluator = coco_evaluation.CocoDetectionEvaluator(
@@ -38,11 +38,23 @@ then evaluation (in multi-class mode) can be invoked as follows:
                                          agnostic_mode=False)
   metrics = evaluator.ComputeMetrics()
 
+To bound memory on large eval sets, the images can instead be evaluated as they
+are exported:
+
+  evaluator = coco_tools.COCOStreamingEvalWrapper(categories)
+  for image_id, boxes, classes, ... in ...:
+    evaluator.AddSingleImage(
+        image_id,
+        coco_tools.ExportSingleImageGroundtruthToCoco(...),
+        coco_tools.ExportSingleImageDetectionBoxesToCoco(...))
+  metrics = evaluator.ComputeMetrics()
+
 """
 from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+from collections import defaultdict
 from collections import OrderedDict
 import copy
 import time
@@ -356,6 +368,130 @@ class COCOEvalWrapper(cocoeval.COCOeval):
     return summary_metrics, per_category_ap
 
 
+class COCOStreamingEvalWrapper(COCOEvalWrapper):
+  """COCOEvalWrapper which evaluates each image as soon as it is added.
+
+  COCOEvalWrapper needs the groundtruth and detections of the whole eval set in
+  coco.COCO objects, which holds every annotation dict (and RLE encoded mask)
+  until the metrics are computed. This class instead runs the per image matching
+  of COCOeval.evaluate() on one image at a time, and only keeps the detection
+  scores, match flags and ignore flags that COCOeval.accumulate() reads, as
+  small numpy arrays. The annotations of an image can be dropped once it is
+  added, and ComputeMetrics() only accumulates the kept results.
+
+  The metrics are the same as those of COCOEvalWrapper on the same annotations.
+
+    evaluator = coco_tools.COCOStreamingEvalWrapper(categories)
+    evaluator.AddSingleImage(image_id, groundtruth_list, detections_list)
+    ...
+    metrics = evaluator.ComputeMetrics()
+  """
+
+  def __init__(self, categories, agnostic_mode=False, iou_type='bbox'):
+    """COCOStreamingEvalWrapper constructor.
+
+    Args:
+      categories: a list of dictionaries representing all possible categories,
+        in the format of ExportGroundtruthToCOCO.
+      agnostic_mode: boolean (default: False).  If True, evaluation ignores
+        class labels, treating all detections as proposals.
+      iou_type: IOU type to use for evaluation. Supports `bbox` and `segm`.
+
+    Raises:
+      ValueError: if iou_type is unsupported.
+    """
+    supported_iou_types = ['bbox', 'segm']
+    if iou_type not in supported_iou_types:
+      raise ValueError('Unsupported iou type: {}. '
+                       'Supported values are: {}'.format(
+                           iou_type, supported_iou_types))
+    groundtruth = COCOWrapper(
+        {'images': [], 'annotations': [], 'categories': categories})
+    super(COCOStreamingEvalWrapper, self).__init__(
+        groundtruth, agnostic_mode=agnostic_mode, iou_type=iou_type)
+    # COCOeval.accumulate() overwrites params.catIds in agnostic mode.
+    self._category_ids = list(np.unique(self.params.catIds))
+    # Maps each image id to its per (category, area range) index results.
+    self._image_evals = {}
+
+  def AddSingleImage(self, image_id, groundtruth_list, detections_list):
+    """Matches the detections of an image to its groundtruth.
+
+    Args:
+      image_id: unique image identifier either of type integer or string.
+      groundtruth_list: list of groundtruth annotations of the image, as
+        returned by ExportSingleImageGroundtruthToCoco.
+      detections_list: list of detections of the image, as returned by
+        ExportSingleImageDetectionBoxesToCoco for `bbox` or
+        ExportSingleImageDetectionMasksToCoco for `segm`.
+
+    Raises:
+      ValueError: if the image was already added.
+    """
+    if image_id in self._image_evals:
+      raise ValueError('Image {} was already added'.format(image_id))
+
+    p = self.params
+    p.catIds = self._category_ids
+    p.maxDets = sorted(p.maxDets)
+    category_id_set = set(self._category_ids)
+
+    # Same annotation fields as COCOWrapper.LoadAnnotations() and
+    # COCOeval._prepare().
+    self._gts = defaultdict(list)
+    self._dts = defaultdict(list)
+    for gt in groundtruth_list:
+      if gt['category_id'] in category_id_set:
+        gt = dict(gt, ignore='iscrowd' in gt and gt['iscrowd'])
+        self._gts[image_id, gt['category_id']].append(gt)
+    for idx, dt in enumerate(detections_list):
+      if dt['category_id'] in category_id_set:
+        dt = dict(dt, id=idx + 1, iscrowd=0)
+        if self._iou_type == 'bbox':
+          dt['area'] = dt['bbox'][2] * dt['bbox'][3]
+        else:
+          dt['area'] = mask.area(dt['segmentation'])
+          dt['bbox'] = mask.toBbox(dt['segmentation'])
+        self._dts[image_id, dt['category_id']].append(dt)
+
+    category_ids = self._category_ids if p.useCats else [-1]
+    self.ious = {(image_id, category_id): self.computeIoU(image_id, category_id)
+                 for category_id in category_ids}
+    image_evals = {}
+    for category_index, category_id in enumerate(category_ids):
+      for area_index, area_range in enumerate(p.areaRng):
+        eval_img = self.evaluateImg(image_id, category_id, area_range,
+                                    p.maxDets[-1])
+        if eval_img is None:
+          continue
+        image_evals[category_index, area_index] = {
+            'dtScores': np.array(eval_img['dtScores'], dtype=np.float64),
+            'dtMatches': eval_img['dtMatches'] > 0,
+            'dtIgnore': eval_img['dtIgnore'].astype(bool),
+            'gtIgnore': eval_img['gtIgnore'].astype(bool),
+        }
+    self._image_evals[image_id] = image_evals
+    self._gts = defaultdict(list)
+    self._dts = defaultdict(list)
+    self.ious = {}
+
+  def evaluate(self):
+    """Gathers the results of the added images for COCOeval.accumulate()."""
+    p = self.params
+    p.imgIds = list(np.unique(list(self._image_evals)))
+    p.catIds = self._category_ids
+    p.maxDets = sorted(p.maxDets)
+    num_categories = len(self._category_ids) if p.useCats else 1
+    self.evalImgs = [
+        self._image_evals[image_id].get((category_index, area_index))
+        for category_index in range(num_categories)
+        for area_index in range(len(p.areaRng))
+        for image_id in p.imgIds
+    ]
+    self.eval = {}
+    self._paramsEval = copy.deepcopy(p)
+
+
 def _ConvertBoxToCOCOFormat(box):
   """Converts a box in [ymin, xmin, ymax, xmax] format to COCO format.
 
@@ -78,6 +78,78 @@ class CocoToolsTest(tf.test.TestCase):
     summary_metrics, _ = evaluator.ComputeMetrics()
     self.assertAlmostEqual(1.0, summary_metrics['Precision/mAP'])
 
+  def testCocoStreamingWrapper(self):
+    evaluator = coco_tools.COCOStreamingEvalWrapper(
+        self._groundtruth_dict['categories'])
+    for image in self._groundtruth_dict['images']:
+      evaluator.AddSingleImage(
+          image['id'],
+          [annotation for annotation in self._groundtruth_dict['annotations']
+           if annotation['image_id'] == image['id']],
+          [detection for detection in self._detections_list
+           if detection['image_id'] == image['id']])
+    summary_metrics, _ = evaluator.ComputeMetrics()
+    self.assertAlmostEqual(1.0, summary_metrics['Precision/mAP'])
+    with self.assertRaises(ValueError):
+      evaluator.AddSingleImage('first', [], [])
+
+  def testCocoStreamingWrapperMatchesCocoEvalWrapper(self):
+    np.random.seed(0)
+    categories = self._groundtruth_dict['categories']
+    category_id_set = set([category['id'] for category in categories])
+    for iou_type in ['bbox', 'segm']:
+      streaming_evaluator = coco_tools.COCOStreamingEvalWrapper(
+          categories, iou_type=iou_type)
+      image_list = []
+      groundtruth_list = []
+      detections_list = []
+      for image_id in range(20):
+        # Detections are noisy copies of the groundtruth, and random boxes.
+        num_groundtruth = np.random.randint(5)
+        num_detections = num_groundtruth + np.random.randint(5)
+        corners = np.random.randint(0, 48, size=(num_detections, 2))
+        sizes = np.random.randint(1, 16, size=(num_detections, 2))
+        boxes = np.concatenate([corners, corners + sizes], axis=1).astype(float)
+        masks = np.zeros((num_detections, 64, 64), dtype=np.uint8)
+        for i, (ymin, xmin, ymax, xmax) in enumerate(boxes.astype(int)):
+          masks[i, ymin:ymax, xmin:xmax] = 1
+        classes = np.random.randint(3, size=num_detections)
+        scores = np.round(np.random.rand(num_detections), 1)
+        image_groundtruth = coco_tools.ExportSingleImageGroundtruthToCoco(
+            image_id=image_id,
+            next_annotation_id=len(groundtruth_list) + 1,
+            category_id_set=category_id_set,
+            groundtruth_boxes=boxes[:num_groundtruth],
+            groundtruth_classes=classes[:num_groundtruth],
+            groundtruth_masks=(masks[:num_groundtruth]
+                               if iou_type == 'segm' else None),
+            groundtruth_is_crowd=np.random.randint(2, size=num_groundtruth))
+        boxes += np.random.randn(num_detections, 4)
+        if iou_type == 'bbox':
+          image_detections = coco_tools.ExportSingleImageDetectionBoxesToCoco(
+              image_id, category_id_set, boxes, scores, classes)
+        else:
+          image_detections = coco_tools.ExportSingleImageDetectionMasksToCoco(
+              image_id, category_id_set, np.roll(masks, 1, axis=2), scores,
+              classes)
+        streaming_evaluator.AddSingleImage(
+            image_id, image_groundtruth, image_detections)
+        image_list.append({'id': image_id, 'height': 64, 'width': 64})
+        groundtruth_list.extend(image_groundtruth)
+        detections_list.extend(image_detections)
+
+      groundtruth = coco_tools.COCOWrapper(
+          {'annotations': groundtruth_list, 'images': image_list,
+           'categories': categories},
+          detection_type='bbox' if iou_type == 'bbox' else 'segmentation')
+      detections = groundtruth.LoadAnnotations(detections_list)
+      evaluator = coco_tools.COCOEvalWrapper(
+          groundtruth, detections, iou_type=iou_type)
+      expected_metrics, _ = evaluator.ComputeMetrics()
+      summary_metrics, _ = streaming_evaluator.ComputeMetrics()
+      self.assertGreater(expected_metrics['Precision/mAP'], 0.)
+      self.assertDictEqual(expected_metrics, summary_metrics)
+
   def testExportGroundtruthToCOCO(self):
     image_ids = ['first', 'second']
     groundtruth_boxes = [np.array([[100, 100, 200, 200]], float),
@@ -29,6 +29,11 @@ from six.moves import range
 from object_detection.utils import np_box_list
 from object_detection.utils import np_box_ops
 
+# Maximum number of boxes, and of pairwise IOU values, non-max suppression
+# processes at once.
+_NMS_MAX_TILE_ROWS = 64
+_NMS_MAX_TILE_ELEMENTS = 1 << 22
+
 
 class SortOrder(object):
   """Enum class for sort order.
@@ -212,29 +217,9 @@ def non_max_suppression(boxlist,
     else:
       return boxlist
 
-  boxes = boxlist.get()
-  num_boxes = boxlist.num_boxes()
-  # is_index_valid is True only for all remaining valid boxes,
-  is_index_valid = np.full(num_boxes, 1, dtype=bool)
-  selected_indices = []
-  num_output = 0
-  for i in range(num_boxes):
-    if num_output < max_output_size:
-      if is_index_valid[i]:
-        num_output += 1
-        selected_indices.append(i)
-        is_index_valid[i] = False
-        valid_indices = np.where(is_index_valid)[0]
-        if valid_indices.size == 0:
-          break
-
-        intersect_over_union = np_box_ops.iou(
-            np.expand_dims(boxes[i, :], axis=0), boxes[valid_indices, :])
-        intersect_over_union = np.squeeze(intersect_over_union, axis=0)
-        is_index_valid[valid_indices] = np.logical_and(
-            is_index_valid[valid_indices],
-            intersect_over_union <= iou_threshold)
-  return gather(boxlist, np.array(selected_indices))
+  selected_indices = _greedy_non_max_suppression(boxlist.get(), iou_threshold,
+                                                 max_output_size)
+  return gather(boxlist, selected_indices)
 
 
 def multi_class_non_max_suppression(boxlist, score_thresh, iou_thresh,
@@ -266,11 +251,13 @@ def multi_class_non_max_suppression(boxlist, score_thresh, iou_thresh,
       corresponding scores for each box with scores sorted in decreasing order
       and a rank-1 classes field representing a class label for each box.
   Raises:
-    ValueError: if iou_thresh is not in [0, 1] or if input boxlist does not have
-      a valid scores field.
+    ValueError: if iou_thresh is not in [0, 1], if max_output_size is negative
+      or if input boxlist does not have a valid scores field.
   """
   if not 0 <= iou_thresh <= 1.0:
     raise ValueError('thresh must be between 0 and 1')
+  if max_output_size < 0:
+    raise ValueError('max_output_size must be bigger than 0.')
   if not isinstance(boxlist, np_box_list.BoxList):
     raise ValueError('boxlist must be a BoxList')
   if not boxlist.has_field('scores'):
@@ -291,21 +278,29 @@ def multi_class_non_max_suppression(boxlist, score_thresh, iou_thresh,
   if num_boxes != num_scores:
     raise ValueError('Incorrect scores field length: actual vs expected.')
 
-  selected_boxes_list = []
+  # Order the (box, class) candidates by class, then as non_max_suppression
+  # orders each class, so that one greedy pass handles all classes.
+  candidate_indices = []
+  candidate_classes = []
   for class_idx in range(num_classes):
-    boxlist_and_class_scores = np_box_list.BoxList(boxlist.get())
     class_scores = np.reshape(scores[0:num_scores, class_idx], [-1])
-    boxlist_and_class_scores.add_field('scores', class_scores)
-    boxlist_filt = filter_scores_greater_than(boxlist_and_class_scores,
-                                              score_thresh)
-    nms_result = non_max_suppression(boxlist_filt,
-                                     max_output_size=max_output_size,
-                                     iou_threshold=iou_thresh,
-                                     score_threshold=score_thresh)
-    nms_result.add_field(
-        'classes', np.zeros_like(nms_result.get_field('scores')) + class_idx)
-    selected_boxes_list.append(nms_result)
-  selected_boxes = concatenate(selected_boxes_list)
+    indices = np.where(np.greater(class_scores, score_thresh))[0]
+    indices = indices[np.argsort(class_scores[indices])[::-1]]
+    candidate_indices.append(indices)
+    candidate_classes.append(np.full(indices.size, class_idx, dtype=int))
+  candidate_indices = np.concatenate(candidate_indices)
+  candidate_classes = np.concatenate(candidate_classes)
+
+  boxes = boxlist.get()
+  selected = _greedy_non_max_suppression(
+      boxes[candidate_indices], iou_thresh, max_output_size, candidate_classes)
+  selected_indices = candidate_indices[selected]
+  selected_classes = candidate_classes[selected]
+  selected_scores = scores[selected_indices, selected_classes]
+  selected_boxes = np_box_list.BoxList(boxes[selected_indices])
+  selected_boxes.add_field('scores', selected_scores)
+  selected_boxes.add_field('classes',
+                           selected_classes.astype(selected_scores.dtype))
   sorted_boxes = sort_by_field(selected_boxes, 'scores')
   return sorted_boxes
 
@@ -561,3 +556,69 @@ def _update_valid_indices_by_removing_high_iou_boxes(
     selected_indices, is_index_valid, intersect_over_union, threshold):
   max_iou = np.max(intersect_over_union[:, selected_indices], axis=1)
   return np.logical_and(is_index_valid, max_iou <= threshold)
+
+
+def _greedy_non_max_suppression(boxes, iou_threshold, max_output_size,
+                                classes=None):
+  """Greedily selects boxes, suppressing later boxes with a high IOU.
+
+  Box i is selected if no selected box before it of the same class has an IOU
+  above iou_threshold with it, and fewer than max_output_size boxes of its
+  class were selected before it. This is the loop of non_max_suppression, but
+  the IOUs of a tile of remaining boxes against the later boxes of their class
+  are computed at once. Tiles are no larger than the number of boxes that may
+  still be selected, so few IOUs are computed for boxes that end up dropped.
+
+  Args:
+    boxes: a numpy array of shape [N, 4] sorted by decreasing score.
+    iou_threshold: intersection over union threshold. If 1.0, no box is
+      suppressed.
+    max_output_size: maximum number of selected boxes per class.
+    classes: (optional) integer numpy array of shape [N] with the class of each
+      box, in which each class is contiguous. If None, all boxes are of one
+      class.
+
+  Returns:
+    an integer numpy array with the indices of the selected boxes in increasing
+    order.
+  """
+  num_boxes = boxes.shape[0]
+  if classes is None:
+    run_ends = [num_boxes]
+  else:
+    run_ends = np.append(np.flatnonzero(np.diff(classes)) + 1, num_boxes)
+
+  # is_index_valid is True only for all remaining valid boxes.
+  is_index_valid = np.ones(num_boxes, dtype=bool)
+  selected_indices = []
+  run_start = 0
+  for run_end in run_ends:
+    start = run_start
+    run_start = run_end
+    num_output = 0
+    while start < run_end and num_output < max_output_size:
+      valid_indices = np.flatnonzero(is_index_valid[start:run_end]) + start
+      if valid_indices.size == 0:
+        break
+      if iou_threshold >= 1.0:
+        selected_indices.extend(valid_indices[:max_output_size - num_output])
+        break
+
+      tile_size = max(1, min(max_output_size - num_output,
+                             _NMS_MAX_TILE_ROWS,
+                             _NMS_MAX_TILE_ELEMENTS // valid_indices.size))
+      rows = valid_indices[:tile_size]
+      is_suppressed = np.logical_not(
+          np_box_ops.iou(boxes[rows], boxes[valid_indices]) <= iou_threshold)
+      for row, i in enumerate(rows):
+        if not is_index_valid[i]:
+          continue
+        selected_indices.append(i)
+        num_output += 1
+        if num_output == max_output_size:
+          break
+        # The IOUs of the box with itself and earlier boxes are ignored.
+        is_suppressed[row, :row + 1] = False
+        is_index_valid[valid_indices[is_suppressed[row]]] = False
+      start = rows[-1] + 1
+  return np.array(selected_indices, dtype=int)
@@ -19,11 +19,14 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+from unittest import mock  # pylint: disable=g-importing-member
+
 import numpy as np
 import tensorflow.compat.v1 as tf
 
 from object_detection.utils import np_box_list
 from object_detection.utils import np_box_list_ops
+from object_detection.utils import np_box_ops
 
 
 class AreaRelatedTest(tf.test.TestCase):
@@ -413,6 +416,41 @@ class NonMaximumSuppressionTest(tf.test.TestCase):
     self.assertAllClose(classes_clean, expected_classes)
     self.assertAllClose(boxes, expected_boxes)
 
+  def test_multiclass_nms_with_negative_max_output_size(self):
+    boxlist = np_box_list.BoxList(self._boxes)
+    boxlist.add_field('scores', np.zeros((6, 2), dtype=float))
+
+    with self.assertRaisesRegexp(ValueError, 'max_output_size'):
+      np_box_list_ops.multi_class_non_max_suppression(
+          boxlist, score_thresh=0.5, iou_thresh=0.5, max_output_size=-1)
+
+  def test_tiled_nms_matches_greedy_loop(self):
+    np.random.seed(0)
+    corners = np.random.rand(200, 2) * 0.8
+    sizes = np.random.rand(200, 2) * 0.2
+    boxes = np.concatenate([corners, corners + sizes], axis=1)
+    boxlist = np_box_list.BoxList(boxes)
+    boxlist.add_field('scores', np.random.rand(200))
+    max_output_size = 50
+    iou_threshold = 0.3
+
+    # Greedy selection, one box at a time.
+    sorted_boxes = np_box_list_ops.sort_by_field(boxlist, 'scores').get()
+    expected_boxes = []
+    for box in sorted_boxes:
+      if len(expected_boxes) == max_output_size:
+        break
+      if not expected_boxes or np.all(np_box_ops.iou(
+          box[np.newaxis], np.array(expected_boxes)) <= iou_threshold):
+        expected_boxes.append(box)
+
+    for tile_rows in [1, 7, 64]:
+      with mock.patch.object(
+          np_box_list_ops, '_NMS_MAX_TILE_ROWS', tile_rows):
+        nms_boxlist = np_box_list_ops.non_max_suppression(
+            boxlist, max_output_size, iou_threshold)
+      self.assertAllEqual(nms_boxlist.get(), np.array(expected_boxes))
+
 
 if __name__ == '__main__':
   tf.test.main()
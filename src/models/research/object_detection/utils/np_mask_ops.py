@@ -27,6 +27,11 @@ from __future__ import print_function
 import numpy as np
 
 EPSILON = 1e-7
+# Upper bound on the size of one block of masks converted to floats by
+# intersection().
+MAX_TILE_BYTES = 64 * 1024 * 1024
+# Sums of 0/1 products are exact in float32 up to 2^24 pixels per mask.
+_MAX_FLOAT32_PIXELS = 2**24
 
 
 def area(masks):
@@ -47,33 +52,55 @@ def area(masks):
   return np.sum(masks, axis=(1, 2), dtype=np.float32)
 
 
-def intersection(masks1, masks2):
+def intersection(masks1, masks2, tile_size=None):
   """Compute pairwise intersection areas between masks.
 
+  The masks are flattened to [N, height * width] matrices and all pairwise
+  intersections are computed as one matrix product. Since the mask values are
+  in {0,1}, the product equals the sum of np.minimum over the pixels, and the
+  float sums are exact. The masks are converted to floats in tiles of at most
+  tile_size masks from each collection, so memory stays bounded for large N, M
+  and mask resolution.
+
   Args:
     masks1: a numpy array with shape [N, height, width] holding N masks. Masks
       values are of type np.uint8 and values are in {0,1}.
     masks2: a numpy array with shape [M, height, width] holding M masks. Masks
       values are of type np.uint8 and values are in {0,1}.
+    tile_size: (optional) the number of masks from masks1 and from masks2 that
+      are multiplied at once. By default, as many as fit in MAX_TILE_BYTES.
 
   Returns:
     a numpy array with shape [N*M] representing pairwise intersection area.
 
   Raises:
-    ValueError: If masks1 and masks2 are not of type np.uint8.
+    ValueError: If masks1 and masks2 are not of type np.uint8, or tile_size is
+      not positive.
   """
   if masks1.dtype != np.uint8 or masks2.dtype != np.uint8:
     raise ValueError('masks1 and masks2 should be of type np.uint8')
+  if tile_size is not None and tile_size < 1:
+    raise ValueError('tile_size should be positive')
   n = masks1.shape[0]
   m = masks2.shape[0]
   answer = np.zeros([n, m], dtype=np.float32)
-  for i in np.arange(n):
-    for j in np.arange(m):
-      answer[i, j] = np.sum(np.minimum(masks1[i], masks2[j]), dtype=np.float32)
+  if n == 0 or m == 0:
+    return answer
+  flat1 = masks1.reshape(n, -1)
+  flat2 = masks2.reshape(m, -1)
+  pixels = flat1.shape[1]
+  dtype = np.float32 if pixels <= _MAX_FLOAT32_PIXELS else np.float64
+  if tile_size is None:
+    tile_size = max(1, MAX_TILE_BYTES // (pixels * np.dtype(dtype).itemsize))
+  for i in range(0, n, tile_size):
+    tile1 = flat1[i:i + tile_size].astype(dtype)
+    for j in range(0, m, tile_size):
+      tile2 = flat2[j:j + tile_size].astype(dtype)
+      answer[i:i + tile_size, j:j + tile_size] = np.dot(tile1, tile2.T)
   return answer
 
 
-def iou(masks1, masks2):
+def iou(masks1, masks2, tile_size=None):
   """Computes pairwise intersection-over-union between mask collections.
 
   Args:
@@ -81,6 +108,7 @@ def iou(masks1, masks2):
       values are of type np.uint8 and values are in {0,1}.
     masks2: a numpy array with shape [M, height, width] holding N masks. Masks
       values are of type np.uint8 and values are in {0,1}.
+    tile_size: (optional) see intersection().
 
   Returns:
     a numpy array with shape [N, M] representing pairwise iou scores.
@@ -90,7 +118,7 @@ def iou(masks1, masks2):
   """
   if masks1.dtype != np.uint8 or masks2.dtype != np.uint8:
     raise ValueError('masks1 and masks2 should be of type np.uint8')
-  intersect = intersection(masks1, masks2)
+  intersect = intersection(masks1, masks2, tile_size)
   area1 = area(masks1)
   area2 = area(masks2)
   union = np.expand_dims(area1, axis=1) + np.expand_dims(
@@ -98,7 +126,7 @@ def iou(masks1, masks2):
   return intersect / np.maximum(union, EPSILON)
 
 
-def ioa(masks1, masks2):
+def ioa(masks1, masks2, tile_size=None):
   """Computes pairwise intersection-over-area between box collections.
 
   Intersection-over-area (ioa) between two masks, mask1 and mask2 is defined as
@@ -110,6 +138,7 @@ def ioa(masks1, masks2):
       values are of type np.uint8 and values are in {0,1}.
     masks2: a numpy array with shape [M, height, width] holding N masks. Masks
       values are of type np.uint8 and values are in {0,1}.
+    tile_size: (optional) see intersection().
 
   Returns:
     a numpy array with shape [N, M] representing pairwise ioa scores.
@@ -119,6 +148,6 @@ def ioa(masks1, masks2):
   """
   if masks1.dtype != np.uint8 or masks2.dtype != np.uint8:
     raise ValueError('masks1 and masks2 should be of type np.uint8')
-  intersect = intersection(masks1, masks2)
+  intersect = intersection(masks1, masks2, tile_size)
   areas = np.expand_dims(area(masks2), axis=0)
   return intersect / (areas + EPSILON)
@@ -74,6 +74,20 @@ class MaskOpsTests(tf.test.TestCase):
         [[8.0, 0.0, 8.0], [0.0, 9.0, 7.0]], dtype=np.float32)
     self.assertAllClose(intersection, expected_intersection)
 
+  def testIntersectionTiled(self):
+    masks1 = np.random.randint(0, 2, size=(7, 13, 11)).astype(np.uint8)
+    masks2 = np.random.randint(0, 2, size=(5, 13, 11)).astype(np.uint8)
+    expected_intersection = np.array(
+        [[np.sum(np.minimum(mask1, mask2), dtype=np.float32)
+          for mask2 in masks2] for mask1 in masks1], dtype=np.float32)
+    for tile_size in [None, 1, 3, 5, 7, 10]:
+      intersection = np_mask_ops.intersection(masks1, masks2, tile_size)
+      self.assertAllEqual(intersection, expected_intersection)
+
+  def testIntersectionEmpty(self):
+    intersection = np_mask_ops.intersection(self.masks1[:0], self.masks2)
+    self.assertAllEqual(intersection.shape, [0, 3])
+
   def testIOU(self):
     iou = np_mask_ops.iou(self.masks1, self.masks2)
     expected_iou = np.array(
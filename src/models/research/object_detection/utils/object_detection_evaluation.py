@@ -34,7 +34,10 @@ from __future__ import print_function
 from abc import ABCMeta
 from abc import abstractmethod
 import collections
+from concurrent import futures
 import logging
+import multiprocessing
+from multiprocessing import shared_memory
 import unicodedata
 import numpy as np
 import six
@@ -161,7 +164,8 @@ class ObjectDetectionEvaluator(DetectionEvaluator):
                evaluate_masks=False,
                group_of_weight=0.0,
                nms_iou_threshold=1.0,
-               nms_max_output_boxes=10000):
+               nms_max_output_boxes=10000,
+               num_workers=0):
     """Constructor.
 
     Args:
@@ -191,6 +195,9 @@ class ObjectDetectionEvaluator(DetectionEvaluator):
         weight group_of_weight is added to false negatives.
       nms_iou_threshold: NMS IoU threashold.
       nms_max_output_boxes: maximal number of boxes after NMS.
+      num_workers: (optional) number of worker processes computing per-image
+        metrics in shards of images. If 0, they are computed in the calling
+        thread as images are added.
 
     Raises:
       ValueError: If the category ids are not 1-indexed.
@@ -208,6 +215,7 @@ class ObjectDetectionEvaluator(DetectionEvaluator):
     self._group_of_weight = group_of_weight
     self._nms_iou_threshold = nms_iou_threshold
     self._nms_max_output_boxes = nms_max_output_boxes
+    self._num_workers = num_workers
     self._evaluation = ObjectDetectionEvaluation(
         num_groundtruth_classes=self._num_classes,
         matching_iou_threshold=self._matching_iou_threshold,
@@ -217,7 +225,8 @@ class ObjectDetectionEvaluator(DetectionEvaluator):
         label_id_offset=self._label_id_offset,
         group_of_weight=self._group_of_weight,
         nms_iou_threshold=self._nms_iou_threshold,
-        nms_max_output_boxes=self._nms_max_output_boxes)
+        nms_max_output_boxes=self._nms_max_output_boxes,
+        num_workers=self._num_workers)
     self._image_ids = set([])
     self._evaluate_corlocs = evaluate_corlocs
     self._evaluate_precision_recall = evaluate_precision_recall
@@ -459,6 +468,7 @@ class ObjectDetectionEvaluator(DetectionEvaluator):
 
   def clear(self):
     """Clears the state to prepare for a fresh evaluation."""
+    self._evaluation.clear_detections()
     self._evaluation = ObjectDetectionEvaluation(
         num_groundtruth_classes=self._num_classes,
         matching_iou_threshold=self._matching_iou_threshold,
@@ -466,6 +476,7 @@ class ObjectDetectionEvaluator(DetectionEvaluator):
         label_id_offset=self._label_id_offset,
         nms_iou_threshold=self._nms_iou_threshold,
         nms_max_output_boxes=self._nms_max_output_boxes,
+        num_workers=self._num_workers,
     )
     self._image_ids.clear()
 
@@ -745,7 +756,8 @@ class OpenImagesDetectionEvaluator(ObjectDetectionEvaluator):
                evaluate_masks=False,
                evaluate_corlocs=False,
                metric_prefix='OpenImagesV2',
-               group_of_weight=0.0):
+               group_of_weight=0.0,
+               num_workers=0):
     """Constructor.
 
     Args:
@@ -764,6 +776,8 @@ class OpenImagesDetectionEvaluator(ObjectDetectionEvaluator):
         weight group_of_weight is added to true positives. Consequently, if no
         detection falls within a group-of box, weight group_of_weight is added
         to false negatives.
+      num_workers: (optional) number of worker processes computing per-image
+        metrics. See ObjectDetectionEvaluator.
     """
 
     super(OpenImagesDetectionEvaluator, self).__init__(
@@ -772,7 +786,8 @@ class OpenImagesDetectionEvaluator(ObjectDetectionEvaluator):
         evaluate_corlocs,
         metric_prefix=metric_prefix,
         group_of_weight=group_of_weight,
-        evaluate_masks=evaluate_masks)
+        evaluate_masks=evaluate_masks,
+        num_workers=num_workers)
     self._expected_keys = set([
         standard_fields.InputDataFields.key,
         standard_fields.InputDataFields.groundtruth_boxes,
@@ -878,7 +893,8 @@ class OpenImagesChallengeEvaluator(OpenImagesDetectionEvaluator):
                evaluate_masks=False,
                matching_iou_threshold=0.5,
                evaluate_corlocs=False,
-               group_of_weight=1.0):
+               group_of_weight=1.0,
+               num_workers=0):
     """Constructor.
 
     Args:
@@ -896,6 +912,8 @@ class OpenImagesChallengeEvaluator(OpenImagesDetectionEvaluator):
         matching_iou_threshold, weight group_of_weight is added to true
         positives. Consequently, if no detection falls within a group-of box,
         weight group_of_weight is added to false negatives.
+      num_workers: (optional) number of worker processes computing per-image
+        metrics. See ObjectDetectionEvaluator.
     """
     if not evaluate_masks:
       metrics_prefix = 'OpenImagesDetectionChallenge'
@@ -908,7 +926,8 @@ class OpenImagesChallengeEvaluator(OpenImagesDetectionEvaluator):
         evaluate_masks=evaluate_masks,
         evaluate_corlocs=evaluate_corlocs,
         group_of_weight=group_of_weight,
-        metric_prefix=metrics_prefix)
+        metric_prefix=metrics_prefix,
+        num_workers=num_workers)
 
     self._evaluatable_labels = {}
     # Only one of the two has to be provided, but both options are given
@@ -1023,7 +1042,8 @@ class OpenImagesDetectionChallengeEvaluator(OpenImagesChallengeEvaluator):
   def __init__(self,
                categories,
                matching_iou_threshold=0.5,
-               evaluate_corlocs=False):
+               evaluate_corlocs=False,
+               num_workers=0):
     """Constructor.
 
     Args:
@@ -1033,13 +1053,16 @@ class OpenImagesDetectionChallengeEvaluator(OpenImagesChallengeEvaluator):
       matching_iou_threshold: IOU threshold to use for matching groundtruth
         boxes to detection boxes.
       evaluate_corlocs: if True, additionally evaluates and returns CorLoc.
+      num_workers: (optional) number of worker processes computing per-image
+        metrics. See ObjectDetectionEvaluator.
     """
     super(OpenImagesDetectionChallengeEvaluator, self).__init__(
         categories=categories,
         evaluate_masks=False,
         matching_iou_threshold=matching_iou_threshold,
         evaluate_corlocs=False,
-        group_of_weight=1.0)
+        group_of_weight=1.0,
+        num_workers=num_workers)
 
 
 class OpenImagesInstanceSegmentationChallengeEvaluator(
@@ -1049,7 +1072,8 @@ class OpenImagesInstanceSegmentationChallengeEvaluator(
   def __init__(self,
                categories,
                matching_iou_threshold=0.5,
-               evaluate_corlocs=False):
+               evaluate_corlocs=False,
+               num_workers=0):
     """Constructor.
 
     Args:
@@ -1059,13 +1083,16 @@ class OpenImagesInstanceSegmentationChallengeEvaluator(
       matching_iou_threshold: IOU threshold to use for matching groundtruth
         boxes to detection boxes.
       evaluate_corlocs: if True, additionally evaluates and returns CorLoc.
+      num_workers: (optional) number of worker processes computing per-image
+        metrics. See ObjectDetectionEvaluator.
     """
     super(OpenImagesInstanceSegmentationChallengeEvaluator, self).__init__(
         categories=categories,
         evaluate_masks=True,
         matching_iou_threshold=matching_iou_threshold,
         evaluate_corlocs=False,
-        group_of_weight=0.0)
+        group_of_weight=0.0,
+        num_workers=num_workers)
 
 
 ObjectDetectionEvaluationState = collections.namedtuple(
@@ -1091,7 +1118,9 @@ class ObjectDetectionEvaluation(object):
                use_weighted_mean_ap=False,
                label_id_offset=0,
                group_of_weight=0.0,
-               per_image_eval_class=per_image_evaluation.PerImageEvaluation):
+               per_image_eval_class=per_image_evaluation.PerImageEvaluation,
+               num_workers=0,
+               shard_size=256):
     """Constructor.
 
     Args:
@@ -1115,6 +1144,11 @@ class ObjectDetectionEvaluation(object):
         weight group_of_weight is added to false negatives.
       per_image_eval_class: The class that contains functions for computing per
         image metrics.
+      num_workers: (optional) number of worker processes. If > 0, detected
+        images are batched into shards of shard_size images whose per-image
+        metrics are computed in the workers, and merged back in the order the
+        images were added, so the metrics are identical to the serial ones.
+      shard_size: (optional) number of images per shard sent to a worker.
 
     Raises:
       ValueError: if num_groundtruth_classes is smaller than 1.
@@ -1143,10 +1177,16 @@ class ObjectDetectionEvaluation(object):
     self.num_gt_instances_per_class = np.zeros(self.num_class, dtype=float)
     self.num_gt_imgs_per_class = np.zeros(self.num_class, dtype=int)
 
+    self.num_workers = num_workers
+    self.shard_size = shard_size
+    self._pool = None
+
     self._initialize_detections()
 
   def _initialize_detections(self):
     """Initializes internal data structures."""
+    self._shard = []
+    self._shard_futures = collections.deque()
     self.detection_keys = set()
     self.scores_per_class = [[] for _ in range(self.num_class)]
     self.tp_fp_labels_per_class = [[] for _ in range(self.num_class)]
@@ -1160,8 +1200,80 @@ class ObjectDetectionEvaluation(object):
     self.corloc_per_class = np.ones(self.num_class, dtype=float)
 
   def clear_detections(self):
+    self._shutdown_pool()
     self._initialize_detections()
 
+  def _shutdown_pool(self):
+    """Stops the worker processes and frees the shards that were not merged."""
+    if self._pool is None:
+      return
+    for future in self._shard_futures:
+      future.cancel()
+    self._pool.shutdown()
+    self._pool = None
+    # Shards that were running could not be cancelled; their shared memory
+    # blocks are only unlinked by a merge.
+    while self._shard_futures:
+      future = self._shard_futures.popleft()
+      if not future.cancelled() and future.exception() is None:
+        _unlink_shared_arrays(future.result()[0])
+
+  def _submit_shard(self):
+    """Sends the pending images to a worker process."""
+    if self._pool is None:
+      self._pool = futures.ProcessPoolExecutor(
+          max_workers=self.num_workers,
+          mp_context=multiprocessing.get_context('spawn'))
+    self._shard_futures.append(
+        self._pool.submit(_compute_shard_metrics, self.per_image_eval,
+                          self.num_class, self._shard))
+    self._shard = []
+    # Merge the finished shards in order, and block when too many are pending
+    # so that their inputs do not pile up in memory.
+    try:
+      while self._shard_futures and (
+          self._shard_futures[0].done() or
+          len(self._shard_futures) > 2 * self.num_workers):
+        self._merge_next_shard()
+    except BaseException:
+      self._shutdown_pool()
+      raise
+
+  def _merge_next_shard(self):
+    """Merges the metrics of the oldest shard computed by a worker process.
+
+    The shard is only dropped from the pending ones once merged, so that its
+    shared memory block is still freed by _shutdown_pool if merging fails.
+    """
+    shm_name, array_specs, classes, num_images_correctly_detected_per_class = (
+        self._shard_futures[0].result())
+    arrays = _read_shared_arrays(shm_name, array_specs)
+    scores_per_class = [[] for _ in range(self.num_class)]
+    tp_fp_labels_per_class = [[] for _ in range(self.num_class)]
+    for i, class_index in enumerate(classes):
+      scores_per_class[class_index].append(arrays[2 * i])
+      tp_fp_labels_per_class[class_index].append(arrays[2 * i + 1])
+    self.merge_internal_state(
+        ObjectDetectionEvaluationState(
+            np.zeros(self.num_class, dtype=float), scores_per_class,
+            tp_fp_labels_per_class, np.zeros(self.num_class, dtype=int),
+            num_images_correctly_detected_per_class))
+    self._shard_futures.popleft()
+
+  def _flush_shards(self):
+    """Waits for all images sent to worker processes and merges them.
+
+    The worker processes are then shut down; they are started again if more
+    images are added.
+    """
+    try:
+      if self._shard:
+        self._submit_shard()
+      while self._shard_futures:
+        self._merge_next_shard()
+    finally:
+      self._shutdown_pool()
+
   def get_internal_state(self):
     """Returns internal state of the evaluation.
 
@@ -1170,6 +1282,7 @@ class ObjectDetectionEvaluation(object):
     Returns:
       internal state of the evaluation.
     """
+    self._flush_shards()
     return ObjectDetectionEvaluationState(
         self.num_gt_instances_per_class, self.scores_per_class,
         self.tp_fp_labels_per_class, self.num_gt_imgs_per_class,
@@ -1314,17 +1427,23 @@ class ObjectDetectionEvaluation(object):
         groundtruth_masks = np.empty(shape=[0, 1, 1], dtype=float)
       groundtruth_is_difficult_list = np.array([], dtype=bool)
       groundtruth_is_group_of_list = np.array([], dtype=bool)
+    image_info = dict(
+        detected_boxes=detected_boxes,
+        detected_scores=detected_scores,
+        detected_class_labels=detected_class_labels,
+        groundtruth_boxes=groundtruth_boxes,
+        groundtruth_class_labels=groundtruth_class_labels,
+        groundtruth_is_difficult_list=groundtruth_is_difficult_list,
+        groundtruth_is_group_of_list=groundtruth_is_group_of_list,
+        detected_masks=detected_masks,
+        groundtruth_masks=groundtruth_masks)
+    if self.num_workers > 0:
+      self._shard.append(image_info)
+      if len(self._shard) >= self.shard_size:
+        self._submit_shard()
+      return
     scores, tp_fp_labels, is_class_correctly_detected_in_image = (
-        self.per_image_eval.compute_object_detection_metrics(
-            detected_boxes=detected_boxes,
-            detected_scores=detected_scores,
-            detected_class_labels=detected_class_labels,
-            groundtruth_boxes=groundtruth_boxes,
-            groundtruth_class_labels=groundtruth_class_labels,
-            groundtruth_is_difficult_list=groundtruth_is_difficult_list,
-            groundtruth_is_group_of_list=groundtruth_is_group_of_list,
-            detected_masks=detected_masks,
-            groundtruth_masks=groundtruth_masks))
+        self.per_image_eval.compute_object_detection_metrics(**image_info))
     for i in range(self.num_class):
       if scores[i].shape[0] > 0:
         self.scores_per_class[i].append(scores[i])
@@ -1377,6 +1496,7 @@ class ObjectDetectionEvaluation(object):
         corloc: numpy float array
         mean_corloc: Mean CorLoc score for each class, float scalar
     """
+    self._flush_shards()
     if (self.num_gt_instances_per_class == 0).any():
       logging.warning(
           'The following classes have no ground truth examples: %s',
@@ -1439,3 +1559,117 @@ class ObjectDetectionEvaluation(object):
                                       self.precisions_per_class,
                                       self.recalls_per_class,
                                       self.corloc_per_class, mean_corloc)
+
+
+def _compute_shard_metrics(per_image_eval, num_class, image_infos):
+  """Computes the per-image metrics of a shard of images in a worker process.
+
+  Args:
+    per_image_eval: the PerImageEvaluation of the evaluation.
+    num_class: number of ground-truth classes.
+    image_infos: a list of dicts with the arguments of
+      PerImageEvaluation.compute_object_detection_metrics for each image.
+
+  Returns:
+    shm_name: name of the shared memory block holding the arrays, or None if
+      there are none.
+    array_specs: see _write_shared_arrays.
+    classes: indices of the classes with detections; the arrays hold the scores
+      and tp_fp_labels of each of them in turn, in the order of the images.
+    num_images_correctly_detected_per_class: float numpy array of length
+      num_class.
+  """
+  scores_per_class = [[] for _ in range(num_class)]
+  tp_fp_labels_per_class = [[] for _ in range(num_class)]
+  num_images_correctly_detected_per_class = np.zeros(num_class)
+  for image_info in image_infos:
+    scores, tp_fp_labels, is_class_correctly_detected_in_image = (
+        per_image_eval.compute_object_detection_metrics(**image_info))
+    for i in range(num_class):
+      if scores[i].shape[0] > 0:
+        scores_per_class[i].append(scores[i])
+        tp_fp_labels_per_class[i].append(tp_fp_labels[i])
+    num_images_correctly_detected_per_class += (
+        is_class_correctly_detected_in_image)
+
+  classes = [i for i in range(num_class) if scores_per_class[i]]
+  arrays = []
+  for i in classes:
+    arrays.append(np.concatenate(scores_per_class[i]))
+    arrays.append(np.concatenate(tp_fp_labels_per_class[i]))
+  shm_name, array_specs = _write_shared_arrays(arrays)
+  return (shm_name, array_specs, classes,
+          num_images_correctly_detected_per_class)
+
+
+def _write_shared_arrays(arrays):
+  """Copies 1-d numpy arrays into a new shared memory block.
+
+  The block is left for the reader to unlink.
+
+  Args:
+    arrays: a list of 1-d numpy arrays.
+
+  Returns:
+    shm_name: name of the shared memory block, or None if the arrays are empty.
+    array_specs: a list with the dtype string, length and byte offset of each
+      array.
+  """
+  array_specs = []
+  size = 0
+  for array in arrays:
+    array_specs.append((array.dtype.str, array.shape[0], size))
+    # Keep every array 8-byte aligned.
+    size += -(-array.nbytes // 8) * 8
+  if not size:
+    return None, array_specs
+  shm = shared_memory.SharedMemory(create=True, size=size)
+  try:
+    for array, (dtype, length, offset) in zip(arrays, array_specs):
+      np.ndarray((length,), dtype=dtype, buffer=shm.buf, offset=offset)[:] = (
+          array)
+  finally:
+    shm.close()
+  return shm.name, array_specs
+
+
+def _unlink_shared_arrays(shm_name):
+  """Unlinks a block from _write_shared_arrays without reading it.
+
+  Args:
+    shm_name: name of the shared memory block, or None.
+  """
+  if shm_name is None:
+    return
+  try:
+    shm = shared_memory.SharedMemory(name=shm_name)
+  except FileNotFoundError:
+    # Already unlinked by _read_shared_arrays.
+    return
+  shm.close()
+  shm.unlink()
+
+
+def _read_shared_arrays(shm_name, array_specs):
+  """Copies the arrays out of a block from _write_shared_arrays and unlinks it.
+
+  Args:
+    shm_name: name of the shared memory block, or None.
+    array_specs: the array specs returned with it.
+
+  Returns:
+    A list of 1-d numpy arrays.
+  """
+  if shm_name is None:
+    return [np.empty(length, dtype=dtype) for dtype, length, _ in array_specs]
+  shm = shared_memory.SharedMemory(name=shm_name)
+  try:
+    return [
+        np.ndarray((length,), dtype=dtype, buffer=shm.buf,
+                   offset=offset).copy()
+        for dtype, length, offset in array_specs
+    ]
+  finally:
+    shm.close()
+    shm.unlink()
+
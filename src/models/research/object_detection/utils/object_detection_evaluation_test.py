@@ -19,6 +19,7 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import os
 import unittest
 from absl.testing import parameterized
 import numpy as np
@@ -1054,6 +1055,80 @@ class ObjectDetectionEvaluationTest(tf.test.TestCase):
     self.assertAlmostEqual(copy_mean_ap, mean_ap)
     self.assertAlmostEqual(copy_mean_corloc, mean_corloc)
 
+  def test_sharded_evaluation(self):
+    # Test that computing per-image metrics in worker processes gives the same
+    # results as computing them serially.
+    random_state = np.random.RandomState(0)
+    images = []
+    for _ in range(20):
+      num_gt = random_state.randint(0, 5)
+      num_detections = random_state.randint(0, 10)
+      groundtruth_boxes = random_state.rand(num_gt, 4)
+      groundtruth_boxes[:, 2:] += groundtruth_boxes[:, :2]
+      detected_boxes = random_state.rand(num_detections, 4)
+      detected_boxes[:, 2:] += detected_boxes[:, :2]
+      images.append((groundtruth_boxes, random_state.randint(0, 3, num_gt),
+                     detected_boxes,
+                     np.round(random_state.rand(num_detections), 1),
+                     random_state.randint(0, 3, num_detections)))
+
+    def evaluate(num_workers):
+      od_eval = object_detection_evaluation.ObjectDetectionEvaluation(
+          3, num_workers=num_workers, shard_size=3)
+      for image_key, (groundtruth_boxes, groundtruth_class_labels,
+                      detected_boxes, detected_scores,
+                      detected_class_labels) in enumerate(images):
+        od_eval.add_single_ground_truth_image_info(
+            image_key, groundtruth_boxes, groundtruth_class_labels)
+        od_eval.add_single_detected_image_info(
+            image_key, detected_boxes, detected_scores, detected_class_labels)
+      metrics = od_eval.evaluate()
+      od_eval.clear_detections()
+      return metrics
+
+    (average_precision_per_class, mean_ap, precisions_per_class,
+     recalls_per_class, corloc_per_class, mean_corloc) = evaluate(0)
+    (sharded_average_precision_per_class, sharded_mean_ap,
+     sharded_precisions_per_class, sharded_recalls_per_class,
+     sharded_corloc_per_class, sharded_mean_corloc) = evaluate(2)
+
+    for i in range(3):
+      self.assertAllEqual(sharded_precisions_per_class[i],
+                          precisions_per_class[i])
+      self.assertAllEqual(sharded_recalls_per_class[i], recalls_per_class[i])
+    self.assertAllEqual(sharded_average_precision_per_class,
+                        average_precision_per_class)
+    self.assertAllEqual(sharded_corloc_per_class, corloc_per_class)
+    self.assertEqual(sharded_mean_ap, mean_ap)
+    self.assertEqual(sharded_mean_corloc, mean_corloc)
+
+  @unittest.skipUnless(
+      os.path.isdir('/dev/shm'), 'Shared memory blocks are listed in /dev/shm.')
+  def test_sharded_evaluation_frees_workers_and_shared_memory(self):
+    # Test that the worker processes are shut down once evaluated or cleared,
+    # and that the shared memory blocks of shards never merged are unlinked.
+    blocks_before = set(os.listdir('/dev/shm'))
+    od_eval = object_detection_evaluation.ObjectDetectionEvaluation(
+        3, num_workers=2, shard_size=1)
+
+    def add_images(first_image_key):
+      for image_key in range(first_image_key, first_image_key + 8):
+        od_eval.add_single_ground_truth_image_info(
+            image_key, np.array([[0.0, 0.0, 1.0, 1.0]]), np.array([0]))
+        od_eval.add_single_detected_image_info(
+            image_key, np.array([[0.0, 0.0, 1.0, 1.0], [0.5, 0.5, 1.5, 1.5]]),
+            np.array([0.9, 0.5]), np.array([0, 1]))
+
+    add_images(0)
+    od_eval.evaluate()
+    self.assertIsNone(od_eval._pool)
+
+    add_images(8)
+    self.assertIsNotNone(od_eval._pool)
+    od_eval.clear_detections()
+    self.assertIsNone(od_eval._pool)
+    self.assertEmpty(set(os.listdir('/dev/shm')) - blocks_before)
+
 
 @unittest.skipIf(tf_version.is_tf2(), 'Eval Metrics ops are supported in TF1.X '
                  'only.')
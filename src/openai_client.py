@@ -1,15 +1,38 @@
+import asyncio
 import json
 import logging
 import os
+import random
+import time
 from typing import Optional, Union
 
 import openai
 from pydantic import BaseModel, Field
 
+from async_utils import run_blocking
+from response_cache import ResponseCache
+
 logger = logging.getLogger(__name__)
 
 
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
+CHAT_MODEL = "gpt-3.5-turbo"
+
+# Default account limits for gpt-3.5-turbo; override per client.
+REQUESTS_PER_MINUTE = 3_500
+TOKENS_PER_MINUTE = 90_000
+CONCURRENCY = 16
+MAX_RETRIES = 6
+BACKOFF_BASE = 1.0  # seconds
+BACKOFF_MAX = 60.0  # seconds
+COMPLETION_TOKENS = 512  # reserved per request until the real usage is known
+RETRYABLE_ERRORS = (
+    openai.error.RateLimitError,
+    openai.error.APIError,
+    openai.error.ServiceUnavailableError,
+    openai.error.APIConnectionError,
+    openai.error.Timeout,
+)
 
 
 class Message(BaseModel):
@@ -94,6 +117,62 @@ class OpenAIChatFormattingError(Exception):
     """
 
 
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count for rate limiting; about 4 characters per token.
+    """
+    return len(text) // 4 + 1
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at capacity per minute.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.tokens = per_minute
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1.0):
+        amount = min(amount, self.capacity)
+        async with self.lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+    def refund(self, amount: float):
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class RateLimiter:
+    """
+    Requests-per-minute and tokens-per-minute limits for one account.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float = REQUESTS_PER_MINUTE,
+        tokens_per_minute: float = TOKENS_PER_MINUTE,
+    ):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+
+    async def acquire(self, tokens: int):
+        await self.requests.acquire(1)
+        await self.tokens.acquire(tokens)
+
+
 class OpenAIConfig(BaseModel):
     api_key: str
 
@@ -105,17 +184,126 @@ class OpenAI:
 
     api_key: str
 
-    def __init__(self, api_key=OPENAI_API_KEY):
+    def __init__(
+        self,
+        api_key=OPENAI_API_KEY,
+        *,
+        requests_per_minute: float = REQUESTS_PER_MINUTE,
+        tokens_per_minute: float = TOKENS_PER_MINUTE,
+        concurrency: int = CONCURRENCY,
+        max_retries: int = MAX_RETRIES,
+        cache: Optional[ResponseCache] = None,
+    ):
         openai.api_key = api_key
+        self.cache = cache
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self._limiter = None
+        self._limiter_loop = None
+
+    @property
+    def limiter(self) -> RateLimiter:
+        """
+        Rate limiter for the running event loop.
+
+        Its asyncio locks bind to one loop, so a new loop gets a new limiter
+        with full buckets. Every chat_many call runs its own loop, so the
+        requests and tokens per minute limits are not enforced across
+        back-to-back chat_many calls; use achat_many in one loop for that.
+        """
+        loop = asyncio.get_running_loop()
+        if self._limiter is None or self._limiter_loop is not loop:
+            self._limiter = RateLimiter(
+                self.requests_per_minute, self.tokens_per_minute
+            )
+            self._limiter_loop = loop
+        return self._limiter
+
+    def _cache_get(self, endpoint: str, model: str, prompt):
+        """
+        Returns (key, cached value); both are None without a cache.
+        """
+        if self.cache is None:
+            return None, None
+        key = ResponseCache.make_key(endpoint, model, prompt)
+        return key, self.cache.get(key)
+
+    def _cache_put(self, key: Optional[str], value):
+        if self.cache is not None:
+            self.cache.put(key, value)
 
     def chat(self, prompt: str) -> str:
+        key, cached = self._cache_get("chat", CHAT_MODEL, prompt)
+        if cached is not None:
+            return cached
         completion: dict = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
+            model=CHAT_MODEL,
             messages=[{"role": "user", "content": prompt}],
         )
         logger.debug("Getting content of openai Completion", content_dict=completion)
         c = Completion(**completion)
-        return OpenAI._parse_message(c.get_content())
+        content = OpenAI._parse_message(c.get_content())
+        self._cache_put(key, content)
+        return content
+
+    async def achat(self, prompt: str) -> str:
+        """
+        Async chat under the client's rate limits.
+
+        Retries rate limit (429), server (5xx) and connection errors with
+        exponential backoff and jitter.
+        """
+        key, cached = self._cache_get("chat", CHAT_MODEL, prompt)
+        if cached is not None:
+            return cached
+        reserved = estimate_tokens(prompt) + COMPLETION_TOKENS
+        for attempt in range(self.max_retries + 1):
+            await self.limiter.acquire(reserved)
+            try:
+                completion: dict = await openai.ChatCompletion.acreate(
+                    model=CHAT_MODEL,
+                    messages=[{"role": "user", "content": prompt}],
+                )
+            except RETRYABLE_ERRORS as error:
+                if attempt == self.max_retries:
+                    raise
+                delay = min(BACKOFF_MAX, BACKOFF_BASE * 2**attempt)
+                delay *= 0.5 + random.random()
+                logger.warning(
+                    "OpenAI request failed (%r), retrying in %.1fs", error, delay
+                )
+                await asyncio.sleep(delay)
+                continue
+            c = Completion(**completion)
+            # Give back the part of the reservation the request did not use.
+            self.limiter.tokens.refund(max(0, reserved - c.usage.total_tokens))
+            content = OpenAI._parse_message(c.get_content())
+            self._cache_put(key, content)
+            return content
+
+    async def achat_many(self, prompts: list[str]) -> list[str]:
+        """
+        Run many chats concurrently, at most `concurrency` in flight.
+        Results are returned in the order of the prompts.
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def run(prompt):
+            async with semaphore:
+                return await self.achat(prompt)
+
+        return await asyncio.gather(*[run(prompt) for prompt in prompts])
+
+    def chat_many(self, prompts: list[str]) -> list[str]:
+        """
+        Blocking wrapper around achat_many; see async_utils.run_blocking.
+
+        Each call starts a fresh rate limiter (see limiter), so the per minute
+        limits only hold within one call.
+        """
+        return run_blocking(self.achat_many(prompts))
 
     def chat_list_resp(self, prompt: str, *, n=5) -> list[str]:
         prompt = (
@@ -163,7 +351,10 @@ class OpenAI:
 
         https://platform.openai.com/docs/guides/moderation/overview
         """
-        resp = openai.Moderation.create(input=content)
+        key, resp = self._cache_get("moderation", "", content)
+        if resp is None:
+            resp = openai.Moderation.create(input=content)
+            self._cache_put(key, resp)
         results = ModerationResults(**resp)
         if isinstance(content, list):
             print(results)
@@ -0,0 +1,193 @@
+import hashlib
+import json
+import logging
+import os
+import pathlib
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.environ.get(
+    "PBLC_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "pblc_localnet")
+)
+CACHE_PATH = os.path.join(CACHE_DIR, "openai_responses.sqlite")
+MAX_ENTRIES = 100_000
+TTL = None  # seconds; None keeps entries until they are evicted by size
+
+
+class CacheMissError(KeyError):
+    """
+    Raised in replay mode when a response is not in the cache.
+
+    Replay mode is for offline test runs, where hitting the API is a bug.
+    """
+
+
+def normalize_prompt(prompt: Any) -> Any:
+    """
+    Collapse whitespace so prompts that differ only in layout share a key.
+    """
+    if isinstance(prompt, str):
+        return re.sub(r"\s+", " ", prompt).strip()
+    if isinstance(prompt, list):
+        return [normalize_prompt(p) for p in prompt]
+    return prompt
+
+
+class ResponseCache:
+    """
+    SQLite-backed cache of API responses.
+
+    Keys are a hash of endpoint, model, normalized prompt and parameters.
+    Entries older than ttl seconds are treated as misses, and once there are
+    more than max_entries the least recently used ones are evicted. With
+    read_only=True the cache only replays stored responses and raises
+    CacheMissError on a miss; the database is then opened read-only and
+    never created or changed.
+    """
+
+    def __init__(
+        self,
+        path: str = CACHE_PATH,
+        ttl: Optional[float] = TTL,
+        max_entries: int = MAX_ENTRIES,
+        read_only: bool = False,
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.read_only = read_only
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if read_only:
+            self._conn = self._connect_read_only()
+            return
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " created REAL NOT NULL,"
+            " accessed REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)"
+        )
+        self._conn.commit()
+        # Running number of entries, so that put does not count them each time.
+        # Entries written by other processes are only counted on open.
+        (self._count,) = self._conn.execute(
+            "SELECT COUNT(*) FROM responses"
+        ).fetchone()
+
+    def _connect_read_only(self) -> Optional[sqlite3.Connection]:
+        """
+        Open the database without creating it. Returns None if there is no
+        cache yet, in which case every lookup misses.
+        """
+        if not os.path.exists(self.path):
+            return None
+        uri = f"{pathlib.Path(self.path).absolute().as_uri()}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        table = conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'responses'"
+        ).fetchone()
+        if table is None:
+            conn.close()
+            return None
+        return conn
+
+    @staticmethod
+    def make_key(endpoint: str, model: str, prompt: Any, **params) -> str:
+        payload = json.dumps(
+            {
+                "endpoint": endpoint,
+                "model": model,
+                "prompt": normalize_prompt(prompt),
+                "params": params,
+            },
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Returns the cached value, or None on a miss.
+        """
+        now = time.time()
+        with self._lock:
+            row = None
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT value, created FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+            if row is not None and self.ttl is not None and now - row[1] > self.ttl:
+                if not self.read_only:
+                    cursor = self._conn.execute(
+                        "DELETE FROM responses WHERE key = ?", (key,)
+                    )
+                    self._count -= cursor.rowcount
+                    self._conn.commit()
+                row = None
+            if row is None:
+                self.misses += 1
+                if self.read_only:
+                    raise CacheMissError(key)
+                return None
+            self.hits += 1
+            if not self.read_only:
+                self._conn.execute(
+                    "UPDATE responses SET accessed = ? WHERE key = ?", (now, key)
+                )
+                self._conn.commit()
+            return json.loads(row[0])
+
+    def put(self, key: str, value: Any):
+        if self.read_only:
+            return
+        now = time.time()
+        with self._lock:
+            data = json.dumps(value)
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO responses VALUES (?, ?, ?, ?)",
+                (key, data, now, now),
+            )
+            if cursor.rowcount:
+                self._count += 1
+            else:
+                self._conn.execute(
+                    "UPDATE responses SET value = ?, created = ?, accessed = ?"
+                    " WHERE key = ?",
+                    (data, now, now, key),
+                )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        if self._count <= self.max_entries:
+            return
+        cursor = self._conn.execute(
+            "DELETE FROM responses WHERE key IN ("
+            " SELECT key FROM responses ORDER BY accessed LIMIT ?)",
+            (self._count - self.max_entries,),
+        )
+        self._count -= cursor.rowcount
+        logger.debug("Evicted %s cached responses", cursor.rowcount)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
@@ -1,5 +1,25 @@
+from typing import Iterable, Iterator, Union
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import spacy
 
+BATCH_SIZE = 64  # documents per nlp.pipe batch
+N_PROCESS = 1
+FLUSH_DOCS = 1_000  # documents per output record batch
+TEXT_COLUMN = 'caption_text_clean'
+ID_COLUMN = 'vid_id'
+
+ENTITY_SCHEMA = pa.schema([
+    ('doc_id', pa.string()),
+    ('start_char', pa.int64()),
+    ('end_char', pa.int64()),
+    ('label', pa.string()),
+    ('text', pa.string()),
+])
+
+
 class NERAnalyzer:
     def __init__(self, model='en_core_web_sm'):
         self.nlp = spacy.load(model)
@@ -14,4 +34,86 @@ class NERAnalyzer:
                 'label': entity.label_
             })
         
-        return entities
\ No newline at end of file
+        return entities
+
+    def _ner_pipes(self):
+        """
+        The ner component plus any shared embedding layer it listens to;
+        every other component can be disabled for entity extraction.
+        """
+        enabled = {'ner'}
+        for name, component in self.nlp.pipeline:
+            listeners = getattr(component, 'listener_map', {})
+            if 'ner' in listeners:
+                enabled.add(name)
+        return [name for name in self.nlp.pipe_names if name in enabled]
+
+    @staticmethod
+    def _iter_texts(docs, text_column, id_column):
+        for item in docs:
+            if isinstance(item, pd.DataFrame):
+                chunk = item[[id_column, text_column]].dropna()
+                for doc_id, text in chunk.itertuples(index=False):
+                    yield str(text), str(doc_id)
+            else:
+                doc_id, text = item
+                yield str(text), str(doc_id)
+
+    def analyze_many(
+        self,
+        docs: Iterable[Union[pd.DataFrame, tuple]],
+        text_column=TEXT_COLUMN,
+        id_column=ID_COLUMN,
+        batch_size=BATCH_SIZE,
+        n_process=N_PROCESS,
+        flush_docs=FLUSH_DOCS,
+    ) -> Iterator[pa.RecordBatch]:
+        """
+        Extract entities from a whole corpus.
+
+        Args:
+            docs: DataFrame chunks, e.g. from load_data.iter_batches, or
+                (doc_id, text) tuples.
+            text_column (str): Column holding the text of a DataFrame chunk.
+            id_column (str): Column holding the document id.
+            batch_size (int): Documents per nlp.pipe batch.
+            n_process (int): Worker processes for nlp.pipe.
+            flush_docs (int): Documents per yielded record batch.
+
+        Yields:
+            pa.RecordBatch: Columns doc_id, start_char, end_char, label, text.
+        """
+        columns = {name: [] for name in ENTITY_SCHEMA.names}
+        seen = 0
+        texts = self._iter_texts(docs, text_column, id_column)
+        with self.nlp.select_pipes(enable=self._ner_pipes()):
+            for doc, doc_id in self.nlp.pipe(
+                texts, as_tuples=True, batch_size=batch_size, n_process=n_process
+            ):
+                for entity in doc.ents:
+                    columns['doc_id'].append(doc_id)
+                    columns['start_char'].append(entity.start_char)
+                    columns['end_char'].append(entity.end_char)
+                    columns['label'].append(entity.label_)
+                    columns['text'].append(entity.text)
+                seen += 1
+                # Documents without entities add no rows; skip empty batches.
+                if seen % flush_docs == 0 and columns['doc_id']:
+                    yield pa.RecordBatch.from_pydict(columns, schema=ENTITY_SCHEMA)
+                    columns = {name: [] for name in ENTITY_SCHEMA.names}
+        if columns['doc_id']:
+            yield pa.RecordBatch.from_pydict(columns, schema=ENTITY_SCHEMA)
+
+    def write_entities(self, docs, path, **kwargs):
+        """
+        Stream the entities of docs into a Parquet file at path.
+
+        Returns:
+            int: The number of entities written.
+        """
+        count = 0
+        with pq.ParquetWriter(path, ENTITY_SCHEMA) as writer:
+            for batch in self.analyze_many(docs, **kwargs):
+                writer.write_batch(batch)
+                count += batch.num_rows
+        return count
@@ -1,9 +1,17 @@
+import base64
+import hashlib
+import io
 import logging
 import os
-import tempfile
+import threading
+from io import BytesIO
+from typing import BinaryIO, Iterable, Optional, Union
 
+import google.auth
+from google.auth.transport.requests import AuthorizedSession
 from google.cloud import storage
-from pytube import YouTube
+from google.cloud.storage import transfer_manager
+from requests.adapters import HTTPAdapter
 
 # Set up logging
 logging.basicConfig(
@@ -16,13 +24,263 @@ GCS_REGION = None  # no default set
 GCS_BUCKET = "pblc_data"
 GCS_PREFIX = "localnet"
 
+GCS_SCOPES = ["https://www.googleapis.com/auth/devstorage.read_write"]
+POOL_MAXSIZE = 32  # pooled HTTP connections shared by all uploads
+CHUNK_SIZE = 8 * 1024 * 1024  # resumable chunk size, a multiple of 256 KiB
+PARALLEL_THRESHOLD = 128 * 1024 * 1024  # files above this are uploaded in parts
+PARALLEL_CHUNK_SIZE = 32 * 1024 * 1024
+PARALLEL_WORKERS = 8
+
+
+class StreamReader:
+    """
+    Read-only wrapper that lets a pipe, which cannot seek or tell, be
+    passed to a resumable upload. Tracks the position itself and computes
+    the MD5 of everything read, so the upload can be verified without a
+    second pass over the data.
+
+    The last chunk read is kept, so the upload can seek back to its start
+    and send it again, e.g. in ResumableUpload.recover. Bytes before the
+    last chunk are gone and cannot be sent again.
+    """
+
+    def __init__(self, stream: BinaryIO):
+        self.stream = stream
+        self.position = 0
+        self.md5 = hashlib.md5()
+        self.chunk = b""
+        self.chunk_start = 0
+
+    def read(self, size: int = -1) -> bytes:
+        # After a seek, serve the kept chunk first; the MD5 already has it.
+        offset = self.position - self.chunk_start
+        data = self.chunk[offset:] if size < 0 else self.chunk[offset : offset + size]
+        if size < 0 or len(data) < size:
+            new = self.stream.read(size if size < 0 else size - len(data))
+            self.md5.update(new)
+            data += new
+            self.chunk = data
+            self.chunk_start = self.position
+        self.position += len(data)
+        return data
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        chunk_end = self.chunk_start + len(self.chunk)
+        if whence != io.SEEK_SET or not self.chunk_start <= offset <= chunk_end:
+            raise io.UnsupportedOperation(
+                f"Can only seek within the last chunk read, "
+                f"bytes {self.chunk_start} to {chunk_end}"
+            )
+        self.position = offset
+        return offset
+
+    def tell(self) -> int:
+        return self.position
+
+    def md5_base64(self) -> str:
+        """
+        The MD5 in the base64 form gcs reports as the blob's md5_hash.
+        """
+        return base64.b64encode(self.md5.digest()).decode("ascii")
+
+
+class IterStream(io.RawIOBase):
+    """
+    Raw stream over an iterator of byte chunks, such as a streaming
+    download. Wrap it in io.BufferedReader to get blocking read(size).
+    """
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self.chunks = iter(chunks)
+        self.leftover = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self.leftover:
+            try:
+                self.leftover = next(self.chunks)
+            except StopIteration:
+                return 0
+        n = min(len(buffer), len(self.leftover))
+        buffer[:n] = self.leftover[:n]
+        self.leftover = self.leftover[n:]
+        return n
+
+
+def _pooled_client(project: str = GCS_PROJECT) -> storage.Client:
+    """
+    Build a storage client whose HTTP session keeps a pool of connections
+    large enough for many concurrent uploads.
+    """
+    credentials, _ = google.auth.default(scopes=GCS_SCOPES)
+    session = AuthorizedSession(credentials)
+    adapter = HTTPAdapter(pool_connections=POOL_MAXSIZE, pool_maxsize=POOL_MAXSIZE)
+    session.mount("https://", adapter)
+    return storage.Client(project=project, credentials=credentials, _http=session)
+
 
 class StoreGCS:
-    def __init__(self) -> None:
-        self.client = storage.Client(project=GCS_PROJECT)
+    """
+    Uploader shared by every module that writes to gcs.
+
+    Holds one pooled client and reuses bucket handles. Large objects are
+    sent with resumable, chunked uploads and very large files in parallel
+    parts. Use get_store() to get the process-wide instance.
+    """
+
+    def __init__(self, client: storage.Client = None) -> None:
+        self.client = client or _pooled_client()
         self.gcs_bucket_name = GCS_BUCKET
         self.gcs_file_prefix = GCS_PREFIX
         self.gcs_region = GCS_REGION
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, bucket_name: str = None) -> storage.Bucket:
+        """
+        Returns a cached bucket handle; no request is made to look it up.
+        """
+        bucket_name = bucket_name or self.gcs_bucket_name
+        with self._lock:
+            if bucket_name not in self._buckets:
+                self._buckets[bucket_name] = self.client.bucket(bucket_name)
+            return self._buckets[bucket_name]
+
+    def upload_stream(
+        self,
+        stream: BinaryIO,
+        gcs_path: str,
+        content_type: Optional[str] = None,
+        bucket_name: str = None,
+        size: Optional[int] = None,
+    ) -> str:
+        """
+        Upload a binary file-like object to Google Cloud Storage.
+
+        Objects larger than CHUNK_SIZE, or of unknown size, go through a
+        resumable upload in CHUNK_SIZE pieces.
+
+        Returns:
+            str: The GCS path of the uploaded object.
+        """
+        bucket_name = bucket_name or self.gcs_bucket_name
+        blob = self.bucket(bucket_name).blob(gcs_path)
+        if size is None or size > CHUNK_SIZE:
+            blob.chunk_size = CHUNK_SIZE
+        blob.upload_from_file(stream, size=size, content_type=content_type)
+        gcs_file_path = f"gs://{bucket_name}/{gcs_path}"
+        logging.info(f"Uploaded to GCS: {gcs_file_path}")
+        return gcs_file_path
+
+    def upload_pipe(
+        self,
+        stream: BinaryIO,
+        gcs_path: str,
+        content_type: Optional[str] = None,
+        bucket_name: str = None,
+    ) -> str:
+        """
+        Upload a non-seekable stream of unknown length, e.g. a download or
+        a transcoder's stdout, in resumable chunks without local files.
+
+        The MD5 is computed while the bytes go out and checked against the
+        one gcs reports for the finished object.
+
+        Returns:
+            str: The GCS path of the uploaded object.
+        """
+        bucket_name = bucket_name or self.gcs_bucket_name
+        reader = StreamReader(stream)
+        blob = self.bucket(bucket_name).blob(gcs_path)
+        blob.chunk_size = CHUNK_SIZE
+        blob.upload_from_file(reader, content_type=content_type)
+        if blob.md5_hash and blob.md5_hash != reader.md5_base64():
+            blob.delete()
+            raise IOError(f"Checksum mismatch uploading gs://{bucket_name}/{gcs_path}")
+        gcs_file_path = f"gs://{bucket_name}/{gcs_path}"
+        logging.info(f"Streamed {reader.tell()} bytes to GCS: {gcs_file_path}")
+        return gcs_file_path
+
+    def upload_chunks(
+        self,
+        chunks: Iterable[bytes],
+        gcs_path: str,
+        content_type: Optional[str] = None,
+        bucket_name: str = None,
+    ) -> str:
+        """
+        Upload an iterator of byte chunks, see upload_pipe.
+        """
+        return self.upload_pipe(
+            io.BufferedReader(IterStream(chunks), buffer_size=CHUNK_SIZE),
+            gcs_path,
+            content_type=content_type,
+            bucket_name=bucket_name,
+        )
+
+    def upload_data(
+        self,
+        data: Union[str, bytes],
+        gcs_path: str,
+        content_type: Optional[str] = None,
+        bucket_name: str = None,
+    ) -> str:
+        """
+        Upload an in-memory string or bytes without touching local disk.
+
+        Returns:
+            str: The GCS path of the uploaded object.
+        """
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        return self.upload_stream(
+            BytesIO(data),
+            gcs_path,
+            content_type=content_type,
+            bucket_name=bucket_name,
+            size=len(data),
+        )
+
+    def upload_file(
+        self,
+        local_path: str,
+        gcs_path: str,
+        content_type: Optional[str] = None,
+        bucket_name: str = None,
+    ) -> str:
+        """
+        Upload a local file; files above PARALLEL_THRESHOLD are sent as
+        parallel parts that gcs assembles into one object.
+
+        Returns:
+            str: The GCS path of the uploaded object.
+        """
+        bucket_name = bucket_name or self.gcs_bucket_name
+        size = os.path.getsize(local_path)
+        if size <= PARALLEL_THRESHOLD:
+            with open(local_path, "rb") as f:
+                return self.upload_stream(
+                    f,
+                    gcs_path,
+                    content_type=content_type,
+                    bucket_name=bucket_name,
+                    size=size,
+                )
+
+        blob = self.bucket(bucket_name).blob(gcs_path)
+        transfer_manager.upload_chunks_concurrently(
+            local_path,
+            blob,
+            content_type=content_type,
+            chunk_size=PARALLEL_CHUNK_SIZE,
+            worker_type=transfer_manager.THREAD,
+            max_workers=PARALLEL_WORKERS,
+        )
+        gcs_file_path = f"gs://{bucket_name}/{gcs_path}"
+        logging.info(f"Uploaded to GCS in parallel parts: {gcs_file_path}")
+        return gcs_file_path
 
     def upload_to_gcs(self, local_path, gcs_path):
         """
@@ -35,12 +293,22 @@ class StoreGCS:
         Returns:
             str: The GCS path of the uploaded file.
         """
-        bucket = self.client.bucket(self.gcs_bucket_name)
-        blob = bucket.blob(gcs_path)
-        blob.upload_from_filename(local_path)
+        gcs_file_path = self.upload_file(local_path, gcs_path)
         os.remove(local_path)
         logging.info(f"Local file {local_path} removed.")
-
-        gcs_file_path = f"gs://{self.gcs_bucket_name}/{gcs_path}"
-        logging.info(f"Uploaded to GCS: {gcs_file_path}")
         return gcs_file_path
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> StoreGCS:
+    """
+    Returns the process-wide StoreGCS, creating it on first use.
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = StoreGCS()
+        return _store
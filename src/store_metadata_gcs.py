@@ -1,30 +1,16 @@
-import logging
-
-import pandas as pd
-
-from src.load_data import EXCLUDE_LIST, YEARS, load_all_metadata
-from src.store_gcs import GCS_BUCKET, StoreGCS
-
-# Configure logging
-logging.basicConfig(level=logging.INFO)
-
 import asyncio
 import logging
 
 import pandas as pd
-from google.cloud import storage
 
-from src.load_data import EXCLUDE_LIST, YEARS, load_cloud_metadata
-from src.store_gcs import GCS_BUCKET, StoreGCS
+from load_data import EXCLUDE_LIST, YEARS, load_cloud_metadata
+from store_gcs import GCS_BUCKET, get_store
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 
 FILE_PREFIX = "localnet/metadata"
 
-# Initialize a GCS client
-storage_client = storage.Client()
-
 
 async def download_and_upload_metadata(year, exclude_list, bucket_name, file_prefix):
     # Download the data
@@ -40,13 +26,15 @@ async def download_and_upload_metadata(year, exclude_list, bucket_name, file_pre
     # Define the GCS object name
     gcs_object_name = f"{file_prefix}/metadata_{year}.csv"
 
-    # Upload the data to GCS
-    bucket = storage_client.get_bucket(bucket_name)
-    blob = bucket.blob(gcs_object_name)
-    data.to_csv(gcs_object_name, index=False)
-    with open(gcs_object_name, "rb") as data_file:
-        logging.info(f"Uploading data: {gcs_object_name}")
-        blob.upload_from_file(data_file, content_type="application/csv")
+    # Upload the data to GCS straight from memory
+    logging.info(f"Uploading data: {gcs_object_name}")
+    await asyncio.to_thread(
+        get_store().upload_data,
+        data.to_csv(index=False),
+        gcs_object_name,
+        content_type="application/csv",
+        bucket_name=bucket_name,
+    )
 
     logging.info(
         f"Data for year {year} uploaded to GCS: gs://{bucket_name}/{gcs_object_name}"
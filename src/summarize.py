@@ -0,0 +1,159 @@
+import asyncio
+import logging
+from typing import AsyncIterator, Optional
+
+import tiktoken
+
+from async_utils import run_blocking
+from openai_client import CHAT_MODEL, OpenAI
+from response_cache import ResponseCache
+
+logger = logging.getLogger(__name__)
+
+CHUNK_TOKENS = 3_000
+OVERLAP_TOKENS = 200
+REDUCE_TOKENS = 3_000  # max tokens of partial summaries combined in one prompt
+
+MAP_PROMPT = (
+    "The following is an excerpt from the transcript of a public meeting. "
+    "Summarize the discussion, decisions and votes in a few sentences."
+)
+REDUCE_PROMPT = (
+    "The following are summaries of consecutive parts of one public meeting. "
+    "Combine them into a single summary of the meeting."
+)
+
+
+def split_tokens(
+    text: str,
+    chunk_tokens: int = CHUNK_TOKENS,
+    overlap_tokens: int = OVERLAP_TOKENS,
+    model: str = CHAT_MODEL,
+) -> list[str]:
+    """
+    Split text into chunks of at most chunk_tokens tokens, each starting
+    overlap_tokens before the end of the previous one. Blank text gives no
+    chunks.
+    """
+    if overlap_tokens >= chunk_tokens:
+        raise ValueError("overlap_tokens must be smaller than chunk_tokens")
+    if not text.strip():
+        return []
+    encoding = tiktoken.encoding_for_model(model)
+    tokens = encoding.encode(text)
+    step = chunk_tokens - overlap_tokens
+    return [
+        encoding.decode(tokens[start : start + chunk_tokens])
+        for start in range(0, max(len(tokens) - overlap_tokens, 1), step)
+    ]
+
+
+class MeetingSummarizer:
+    """
+    Map-reduce summarizer for transcripts longer than one prompt.
+
+    The transcript is split by tokens with overlap, each chunk is summarized
+    concurrently through the client's rate limiter (map), and the partial
+    summaries are combined in groups of at most reduce_tokens tokens until
+    one summary is left (reduce). Chunk summaries are cached by chunk and
+    map prompt, so changing the reduce prompt does not redo the map stage.
+    """
+
+    def __init__(
+        self,
+        client: OpenAI,
+        map_prompt: str = MAP_PROMPT,
+        reduce_prompt: str = REDUCE_PROMPT,
+        chunk_tokens: int = CHUNK_TOKENS,
+        overlap_tokens: int = OVERLAP_TOKENS,
+        reduce_tokens: int = REDUCE_TOKENS,
+        cache: Optional[ResponseCache] = None,
+    ):
+        self.client = client
+        self.map_prompt = map_prompt
+        self.reduce_prompt = reduce_prompt
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        self.reduce_tokens = reduce_tokens
+        self.cache = cache or client.cache or ResponseCache()
+        self.encoding = tiktoken.encoding_for_model(CHAT_MODEL)
+
+    async def _summarize_chunk(self, chunk: str) -> str:
+        key = ResponseCache.make_key(
+            "summarize_map", CHAT_MODEL, chunk, map_prompt=self.map_prompt
+        )
+        summary = self.cache.get(key)
+        if summary is None:
+            summary = await self.client.achat(f"{self.map_prompt}\n\n```{chunk}```")
+            self.cache.put(key, summary)
+        return summary
+
+    def _groups(self, summaries: list[str]) -> list[list[str]]:
+        """
+        Pack consecutive summaries into groups of at most reduce_tokens tokens.
+        """
+        groups, group, size = [], [], 0
+        for summary in summaries:
+            n = len(self.encoding.encode(summary))
+            if group and size + n > self.reduce_tokens:
+                groups.append(group)
+                group, size = [], 0
+            group.append(summary)
+            size += n
+        if group:
+            groups.append(group)
+        return groups
+
+    async def _reduce_group(self, group: list[str]) -> str:
+        if len(group) == 1:
+            return group[0]
+        joined = "\n\n".join(f"Part {i + 1}: {s}" for i, s in enumerate(group))
+        return await self.client.achat(f"{self.reduce_prompt}\n\n```{joined}```")
+
+    async def astream(self, text: str) -> AsyncIterator[tuple[str, int, str]]:
+        """
+        Yields (stage, index, summary) as results arrive: every chunk summary
+        as ("map", chunk index, ...), every combined summary as
+        ("reduce", level, ...), and finally ("final", 0, summary).
+        """
+        chunks = split_tokens(text, self.chunk_tokens, self.overlap_tokens)
+        logger.info("Summarizing transcript in %s chunks", len(chunks))
+        semaphore = asyncio.Semaphore(self.client.concurrency)
+
+        async def map_one(i, chunk):
+            async with semaphore:
+                return i, await self._summarize_chunk(chunk)
+
+        summaries = [None] * len(chunks)
+        for done in asyncio.as_completed(
+            [map_one(i, chunk) for i, chunk in enumerate(chunks)]
+        ):
+            i, summary = await done
+            summaries[i] = summary
+            yield "map", i, summary
+
+        level = 0
+        while len(summaries) > 1:
+            level += 1
+            groups = self._groups(summaries)
+            if len(groups) == len(summaries):
+                # Every summary alone exceeds the budget; pair them up.
+                groups = [summaries[i : i + 2] for i in range(0, len(summaries), 2)]
+            summaries = await asyncio.gather(
+                *[self._reduce_group(group) for group in groups]
+            )
+            for summary in summaries:
+                yield "reduce", level, summary
+        yield "final", 0, summaries[0] if summaries else ""
+
+    async def asummarize(self, text: str) -> str:
+        summary = ""
+        async for stage, _, summary in self.astream(text):
+            pass
+        return summary
+
+    def summarize(self, text: str) -> str:
+        """
+        Blocking wrapper around asummarize; see async_utils.run_blocking.
+        """
+        return run_blocking(self.asummarize(text))
@@ -0,0 +1,83 @@
+import base64
+import hashlib
+import os
+import sys
+
+import pytest
+from google.api_core.exceptions import NotFound
+
+# The modules under src/ import each other as top-level modules.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from store_gcs import StoreGCS  # noqa: E402
+
+
+class FakeBlob:
+    """
+    In-memory stand-in for storage.Blob: uploads land in the bucket's
+    objects, and md5_hash is set like gcs sets it.
+    """
+
+    def __init__(self, bucket, name):
+        self.bucket = bucket
+        self.name = name
+        self.chunk_size = None
+        self.md5_hash = None
+
+    def upload_from_file(self, stream, size=None, content_type=None):
+        data = b""
+        while size is None or len(data) < size:
+            chunk = stream.read(self.chunk_size or 1024 * 1024)
+            if not chunk:
+                break
+            data += chunk
+        stored = data + b"corrupted" if self.bucket.corrupt else data
+        self.md5_hash = base64.b64encode(hashlib.md5(stored).digest()).decode()
+        self.bucket.put(self.name, stored)
+
+    def download_as_text(self):
+        return self.bucket.objects[self.name].decode()
+
+    def delete(self):
+        if self.name not in self.bucket.objects:
+            raise NotFound(self.name)
+        del self.bucket.objects[self.name]
+
+
+class FakeBucket:
+    def __init__(self, name):
+        self.name = name
+        self.objects = {}
+        self.generations = {}
+        self.corrupt = False  # store different bytes than were sent
+
+    def blob(self, name):
+        return FakeBlob(self, name)
+
+    def put(self, name, data):
+        self.objects[name] = data
+        self.generations[name] = self.generations.get(name, 0) + 1
+
+    def get_blob(self, name):
+        if name not in self.objects:
+            return None
+        blob = FakeBlob(self, name)
+        blob.generation = self.generations[name]
+        blob.crc32c = hashlib.md5(self.objects[name]).hexdigest()
+        return blob
+
+
+class FakeClient:
+    def __init__(self):
+        self.buckets = {}
+
+    def bucket(self, name):
+        return self.buckets.setdefault(name, FakeBucket(name))
+
+
+@pytest.fixture
+def store():
+    """
+    A StoreGCS whose client keeps objects in memory.
+    """
+    return StoreGCS(client=FakeClient())
@@ -0,0 +1,40 @@
+import asyncio
+import threading
+
+import pytest
+
+from async_utils import run_blocking
+
+
+async def _thread_name(result):
+    await asyncio.sleep(0)
+    return result, threading.current_thread().name
+
+
+def test_run_blocking_without_a_loop():
+    result, thread = run_blocking(_thread_name(1))
+    assert result == 1
+    assert thread == threading.current_thread().name
+
+
+def test_run_blocking_inside_a_running_loop():
+    # As in a Jupyter notebook, where the kernel's event loop is running.
+    async def notebook_cell():
+        return run_blocking(_thread_name(2))
+
+    result, thread = asyncio.run(notebook_cell())
+    assert result == 2
+    assert thread != threading.current_thread().name
+
+
+def test_run_blocking_raises_errors():
+    async def fail():
+        raise ValueError("failed")
+
+    async def notebook_cell():
+        return run_blocking(fail())
+
+    with pytest.raises(ValueError, match="failed"):
+        run_blocking(fail())
+    with pytest.raises(ValueError, match="failed"):
+        asyncio.run(notebook_cell())
@@ -0,0 +1,71 @@
+from io import BytesIO
+
+import pandas as pd
+import pandas.testing as pdt
+import pytest
+
+from csv_scan import CsvColumnScanner, read_csv_columns
+
+CSV = (
+    b"id,caption,start,end\n"
+    b'1,"a caption",0.5,1.0\n'
+    b',"b",1.0,\n'
+    b'3,"spans\nseveral\nlines",2.0,3.5\n'
+    b'4,"has ""quotes"", and commas",,4.0\r\n'
+    b"\n"
+    b"5,plain,5.0,6.0\n"
+    b'6,"",6.0,7.0'
+)
+
+
+def _expected(data, usecols, skiprows=0):
+    frame = pd.read_csv(BytesIO(data), usecols=usecols)
+    return frame.iloc[skiprows:].reset_index(drop=True)
+
+
+@pytest.mark.parametrize(
+    "exclude_list",
+    [
+        [],
+        ["caption"],
+        ["caption", "start", "end"],
+        ["id", "caption", "start"],
+        ["id", "start", "end"],
+    ],
+)
+@pytest.mark.parametrize("chunk_size", [1, 7, 1 << 20])
+def test_matches_pandas_usecols(exclude_list, chunk_size):
+    usecols = [c for c in ["id", "caption", "start", "end"] if c not in exclude_list]
+    frame = read_csv_columns(
+        BytesIO(CSV), exclude_list=exclude_list, chunk_size=chunk_size
+    )
+    pdt.assert_frame_equal(frame, _expected(CSV, usecols))
+
+
+def test_single_column_keeps_empty_fields():
+    data = b'id,caption\n1,"a"\n,"b"\n3,"c"\n'
+    frame = read_csv_columns(BytesIO(data), exclude_list=["caption"])
+    pdt.assert_frame_equal(frame, _expected(data, ["id"]))
+    assert frame["id"].isna().tolist() == [False, True, False]
+
+
+@pytest.mark.parametrize("skiprows", [0, 1, 2, 3, 10])
+def test_skiprows_counts_records(skiprows):
+    frame = read_csv_columns(BytesIO(CSV), usecols=["id", "end"], skiprows=skiprows)
+    # Skipped rows no longer take part in dtype inference.
+    pdt.assert_frame_equal(
+        frame, _expected(CSV, ["id", "end"], skiprows), check_dtype=False
+    )
+
+
+def test_usecols():
+    frame = read_csv_columns(BytesIO(CSV), usecols=["start", "id"])
+    pdt.assert_frame_equal(frame, _expected(CSV, ["id", "start"]))
+
+
+def test_scanner_skips_caption_bytes():
+    scanner = CsvColumnScanner(BytesIO(CSV))
+    rows = list(scanner.rows({0}))
+    assert rows == [[b"id"], [b"1"], [b""], [b"3"], [b"4"], [b"5"], [b"6"]]
+    assert scanner.bytes_read == len(CSV)
+    assert scanner.bytes_kept == len(b"id1345" + b"6")
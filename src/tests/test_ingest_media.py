@@ -0,0 +1,164 @@
+import asyncio
+import os
+import threading
+
+import pandas as pd
+import pytest
+
+import ingest_media
+from ingest_media import (
+    DONE,
+    FAILED,
+    PENDING,
+    IngestPool,
+    LocalFileFetcher,
+    VidExtractFetcher,
+    WorkQueue,
+    ingest,
+)
+
+
+class FlakyFetcher:
+    """
+    Fails the first `failures` attempts of every id, and records how many
+    fetches run at once. With a barrier, every fetch waits for the barrier's
+    other parties, so that many fetches must run at once.
+    """
+
+    def __init__(self, failures: int = 0, barrier: threading.Barrier = None):
+        self.failures = failures
+        self.barrier = barrier
+        self.attempts = {}
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def fetch(self, vid_id: str) -> str:
+        with self._lock:
+            self.attempts[vid_id] = self.attempts.get(vid_id, 0) + 1
+            attempt = self.attempts[vid_id]
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            if self.barrier is not None:
+                self.barrier.wait(timeout=5)
+            if attempt <= self.failures:
+                raise RuntimeError(f"attempt {attempt} failed")
+            return f"gs://bucket/{vid_id}.flac"
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+def _frame(vid_ids):
+    return pd.DataFrame({"vid_id": vid_ids})
+
+
+def _status(queue: WorkQueue, vid_id: str) -> tuple:
+    return queue._conn.execute(
+        "SELECT status, attempts, gcs_path FROM jobs WHERE vid_id = ?", (vid_id,)
+    ).fetchone()
+
+
+def test_queue_add_is_idempotent(tmp_path):
+    queue = WorkQueue(str(tmp_path / "queue.sqlite"))
+    assert queue.add(["a", "b"]) == 2
+    assert queue.add(["b", "c"]) == 1
+    assert queue.counts() == {PENDING: 3}
+
+
+def test_queue_resumes_running_ids(tmp_path):
+    path = str(tmp_path / "queue.sqlite")
+    queue = WorkQueue(path)
+    queue.add(["a", "b", "c"])
+    first = queue.claim()
+    queue.mark_done(first, "gs://bucket/a")
+    queue.claim()  # left running by a crashed process
+
+    reopened = WorkQueue(path)
+    assert reopened.counts() == {DONE: 1, PENDING: 2}
+    assert reopened.add(["a", "b", "c"]) == 0
+    claimed = {reopened.claim(), reopened.claim()}
+    assert first not in claimed
+    assert reopened.claim() is None
+
+
+def test_pool_retries_failures(tmp_path):
+    queue = WorkQueue(str(tmp_path / "queue.sqlite"), max_attempts=3)
+    queue.add(["a", "b"])
+    fetcher = FlakyFetcher(failures=2)
+    counts = asyncio.run(IngestPool(queue, fetcher, workers=2).run())
+    assert counts == {DONE: 2}
+    assert fetcher.attempts == {"a": 3, "b": 3}
+    assert _status(queue, "a") == (DONE, 3, "gs://bucket/a.flac")
+
+
+def test_pool_marks_failed_after_max_attempts(tmp_path):
+    queue = WorkQueue(str(tmp_path / "queue.sqlite"), max_attempts=2)
+    queue.add(["a"])
+    fetcher = FlakyFetcher(failures=5)
+    counts = asyncio.run(IngestPool(queue, fetcher, workers=4).run())
+    assert counts == {FAILED: 1}
+    assert fetcher.attempts == {"a": 2}
+    assert _status(queue, "a") == (FAILED, 2, None)
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_pool_runs_workers_at_once(tmp_path, workers):
+    queue = WorkQueue(str(tmp_path / "queue.sqlite"))
+    queue.add([str(i) for i in range(9)])
+    fetcher = FlakyFetcher(barrier=threading.Barrier(workers))
+    counts = asyncio.run(IngestPool(queue, fetcher, workers=workers).run())
+    assert counts == {DONE: 9}
+    assert fetcher.max_active == workers
+    assert sorted(fetcher.attempts.values()) == [1] * 9
+
+
+def test_vid_extract_fetcher_names_audio_by_vid_id(monkeypatch):
+    calls = []
+
+    class FakeVidExtract:
+        def __init__(self, video_url, gcs_bucket_name, temp_dir):
+            self.video_url = video_url
+
+        def extract_audio_only(self, **kwargs):
+            calls.append((self.video_url, kwargs))
+            return f"gs://bucket/{kwargs['name']}_aud.flac"
+
+    monkeypatch.setattr(ingest_media, "VidExtract", FakeVidExtract)
+    assert VidExtractFetcher().fetch("abc") == "gs://bucket/abc_aud.flac"
+    assert calls == [(f"{ingest_media.VID_PREFIX}abc", {"name": "abc"})]
+
+
+def test_ingest_with_local_fetcher(tmp_path):
+    source_dir = tmp_path / "source"
+    source_dir.mkdir()
+    for vid_id in ["a", "b"]:
+        (source_dir / f"{vid_id}.flac").write_bytes(vid_id.encode())
+    dest_dir = str(tmp_path / "dest")
+    queue_path = str(tmp_path / "queue.sqlite")
+
+    fetcher = LocalFileFetcher(str(source_dir), dest_dir)
+    counts = ingest({2020: _frame(["a", "b", "c"])}, fetcher, queue_path, workers=2)
+    assert counts == {DONE: 2, FAILED: 1}
+    assert sorted(os.listdir(dest_dir)) == ["a.flac", "b.flac"]
+    assert _status(WorkQueue(queue_path), "a")[2] == os.path.join(dest_dir, "a.flac")
+
+    # A rerun only fetches the ids it has not seen yet.
+    (source_dir / "d.flac").write_bytes(b"d")
+    os.remove(os.path.join(dest_dir, "a.flac"))
+    counts = ingest(_frame(["a", "b", "c", "d"]), fetcher, queue_path, workers=2)
+    assert counts == {DONE: 3, FAILED: 1}
+    assert sorted(os.listdir(dest_dir)) == ["b.flac", "d.flac"]
+
+
+def test_ingest_inside_running_loop(tmp_path):
+    source_dir = tmp_path / "source"
+    source_dir.mkdir()
+    (source_dir / "a.flac").write_bytes(b"a")
+    fetcher = LocalFileFetcher(str(source_dir), str(tmp_path / "dest"))
+
+    async def notebook_cell():
+        return ingest(_frame(["a"]), fetcher, str(tmp_path / "queue.sqlite"))
+
+    assert asyncio.run(notebook_cell()) == {DONE: 1}
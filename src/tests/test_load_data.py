@@ -0,0 +1,69 @@
+import pandas as pd
+import pytest
+
+import load_data
+from load_data import iter_batches, iter_place_groups
+
+
+class FakeCache:
+    """
+    Stands in for the ParquetCache; streams in-memory frames keyed by uri.
+    """
+
+    def __init__(self, frames):
+        self.frames = frames
+
+    def iter_batches(self, uri, batch_size, exclude_list=None, **kwargs):
+        data = self.frames[uri].drop(columns=exclude_list or [])
+        for start in range(0, len(data), batch_size):
+            yield data.iloc[start : start + batch_size].reset_index(drop=True)
+
+
+def _uri(year):
+    return f"gs://pblc_data/localnet/meetings.{year}.csv"
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = FakeCache(
+        {
+            _uri(2020): pd.DataFrame(
+                {
+                    "st_fips": [1, 1, 1, 2, 2],
+                    "caption": ["a", "b", "c", "d", "e"],
+                }
+            ),
+            _uri(2021): pd.DataFrame({"st_fips": [2, 3], "caption": ["f", "g"]}),
+        }
+    )
+    monkeypatch.setattr(load_data, "get_cache", lambda: cache)
+    return cache
+
+
+def test_iter_batches_adds_the_year(cache):
+    batches = list(iter_batches(years=[2020, 2021], batch_size=2))
+    assert [len(batch) for batch in batches] == [2, 2, 1, 2]
+    assert [batch["year"].iloc[0] for batch in batches] == [2020] * 3 + [2021]
+
+
+def test_iter_batches_excludes_columns(cache):
+    batches = list(iter_batches(years=[2020], exclude_list=["caption"]))
+    assert list(batches[0].columns) == ["st_fips", "year"]
+
+
+def test_iter_place_groups_joins_groups_across_batches(cache):
+    # With two rows per batch, the 2020 rows of places 1 and 2 both span a
+    # batch boundary.
+    groups = list(iter_place_groups(years=[2020, 2021], batch_size=2))
+    assert [key for key, _ in groups] == [(2020, 1), (2020, 2), (2021, 2), (2021, 3)]
+    assert [group["caption"].tolist() for _, group in groups] == [
+        ["a", "b", "c"],
+        ["d", "e"],
+        ["f"],
+        ["g"],
+    ]
+
+
+def test_iter_place_groups_rejects_unknown_keys(cache):
+    with pytest.raises(ValueError, match="place_fips"):
+        list(iter_place_groups(years=[2020], keys=["year", "place_fips"]))
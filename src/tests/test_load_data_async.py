@@ -0,0 +1,89 @@
+import asyncio
+import io
+import json
+
+import pandas as pd
+import pytest
+
+import load_data_async
+from load_data_async import (
+    METADATA_MANIFEST,
+    METADATA_PARTITIONS,
+    METADATA_PREFIX,
+    update_metadata,
+)
+from store_gcs import GCS_BUCKET, GCS_PREFIX
+
+COMBINED = f"{METADATA_PREFIX}/metadata_all_years.csv"
+
+
+@pytest.fixture
+def bucket(monkeypatch, store):
+    """
+    Fake bucket holding two years of source csv files; the metadata of a
+    year is read as one row naming the year and its source generation.
+    """
+    monkeypatch.setattr(load_data_async, "get_store", lambda: store)
+    bucket = store.bucket(GCS_BUCKET)
+    for year in (2020, 2021):
+        bucket.put(f"{GCS_PREFIX}/meetings.{year}.csv", b"source")
+
+    def read_metadata(base_path, exclude_list):
+        year = int(base_path.rsplit(".", 2)[-2])
+        generation = bucket.generations[f"{GCS_PREFIX}/meetings.{year}.csv"]
+        return pd.DataFrame({"year": [year], "generation": [generation]})
+
+    monkeypatch.setattr(load_data_async, "_read_metadata", read_metadata)
+    bucket.failing_partitions = set()
+    pandas_read_parquet = pd.read_parquet
+
+    def read_parquet(path):
+        name = path[len(f"gs://{GCS_BUCKET}/") :]
+        year = int(name.split("year=")[1].split("/")[0])
+        if year in bucket.failing_partitions:
+            raise OSError(f"Failed to download {path}")
+        return pandas_read_parquet(io.BytesIO(bucket.objects[name]))
+
+    monkeypatch.setattr(load_data_async.pd, "read_parquet", read_parquet)
+    return bucket
+
+
+def _combined(bucket) -> pd.DataFrame:
+    return pd.read_csv(io.BytesIO(bucket.objects[COMBINED]))
+
+
+def test_update_metadata_only_reprocesses_changed_years(bucket):
+    results = asyncio.run(update_metadata([2020, 2021], []))
+    assert results["generation"].tolist() == [1, 1]
+    assert f"{METADATA_PARTITIONS}/year=2020/data.parquet" in bucket.objects
+    assert set(json.loads(bucket.objects[METADATA_MANIFEST])) == {"2020", "2021"}
+
+    bucket.put(f"{GCS_PREFIX}/meetings.2021.csv", b"changed source")
+    results = asyncio.run(update_metadata([2020, 2021], []))
+    assert results["generation"].tolist() == [1, 2]
+    assert _combined(bucket)["generation"].tolist() == [1, 2]
+
+
+def test_update_metadata_keeps_combined_when_a_partition_fails(bucket):
+    asyncio.run(update_metadata([2020, 2021], []))
+    generation = bucket.generations[COMBINED]
+    manifest = bucket.objects[METADATA_MANIFEST]
+
+    bucket.put(f"{GCS_PREFIX}/meetings.2021.csv", b"changed source")
+    bucket.failing_partitions.add(2020)
+    results = asyncio.run(update_metadata([2020, 2021], []))
+    assert results["year"].tolist() == [2021]
+    assert bucket.generations[COMBINED] == generation
+    # 2021 is left out of the manifest, so the next run retries it.
+    assert bucket.objects[METADATA_MANIFEST] == manifest
+
+    bucket.failing_partitions.clear()
+    asyncio.run(update_metadata([2020, 2021], []))
+    assert _combined(bucket)["generation"].tolist() == [1, 2]
+
+
+def test_update_metadata_keeps_combined_when_a_source_is_missing(bucket):
+    asyncio.run(update_metadata([2020, 2021], []))
+    generation = bucket.generations[COMBINED]
+    asyncio.run(update_metadata([2020, 2021, 2022], []))
+    assert bucket.generations[COMBINED] == generation
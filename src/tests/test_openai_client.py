@@ -0,0 +1,133 @@
+import asyncio
+
+import openai
+import pytest
+
+import openai_client
+from openai_client import OpenAI
+
+
+@pytest.fixture
+def client(monkeypatch):
+    async def achat(self, prompt):
+        await asyncio.sleep(0.01)
+        return prompt.upper()
+
+    monkeypatch.setattr(OpenAI, "achat", achat)
+    return OpenAI(api_key="test", concurrency=2)
+
+
+def test_chat_many_keeps_prompt_order(client):
+    assert client.chat_many(["a", "b", "c"]) == ["A", "B", "C"]
+
+
+def test_chat_many_inside_running_loop(client):
+    # As in a Jupyter notebook, where the kernel's event loop is running.
+    async def notebook_cell():
+        return client.chat_many(["a", "b"])
+
+    assert asyncio.run(notebook_cell()) == ["A", "B"]
+
+
+COMPLETION = {
+    "choices": [
+        {
+            "finish_reason": "stop",
+            "index": 0,
+            "message": {"content": "hi", "role": "assistant"},
+        }
+    ],
+    "created": 0,
+    "id": "chatcmpl-test",
+    "model": "gpt-3.5-turbo",
+    "object": "chat.completion",
+    "usage": {"completion_tokens": 1, "prompt_tokens": 1, "total_tokens": 2},
+}
+
+
+real_sleep = asyncio.sleep
+
+
+class FakeClock:
+    """
+    Stands in for time.monotonic and asyncio.sleep; sleeping advances the clock.
+    """
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    async def sleep(self, delay):
+        self.sleeps.append(delay)
+        self.now += delay
+        await real_sleep(0)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(openai_client.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(openai_client.asyncio, "sleep", clock.sleep)
+    monkeypatch.setattr(openai_client.random, "random", lambda: 0.5)
+    return clock
+
+
+def _acreate(monkeypatch, responses, clock):
+    """
+    Patches acreate to return or raise each of responses in turn; returns
+    the clock times of the calls.
+    """
+    responses = iter(responses)
+    calls = []
+
+    async def acreate(**kwargs):
+        calls.append(clock.now)
+        response = next(responses)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    monkeypatch.setattr(openai.ChatCompletion, "acreate", acreate)
+    return calls
+
+
+def test_achat_retries_rate_limit_with_growing_delays(monkeypatch, clock):
+    calls = _acreate(
+        monkeypatch,
+        [
+            openai.error.RateLimitError("slow down"),
+            openai.error.RateLimitError("slow down"),
+            COMPLETION,
+        ],
+        clock,
+    )
+    client = OpenAI(api_key="test")
+
+    assert asyncio.run(client.achat("hello")) == "hi"
+    assert len(calls) == 3
+    base = openai_client.BACKOFF_BASE
+    assert clock.sleeps == [base, 2 * base]
+
+
+def test_achat_raises_non_retryable_error(monkeypatch, clock):
+    calls = _acreate(
+        monkeypatch, [openai.error.InvalidRequestError("bad", None)], clock
+    )
+    client = OpenAI(api_key="test")
+
+    with pytest.raises(openai.error.InvalidRequestError):
+        asyncio.run(client.achat("hello"))
+    assert len(calls) == 1
+    assert clock.sleeps == []
+
+
+def test_achat_many_spreads_burst_over_requests_per_minute(monkeypatch, clock):
+    calls = _acreate(monkeypatch, [COMPLETION] * 4, clock)
+    client = OpenAI(api_key="test", requests_per_minute=2, tokens_per_minute=1_000_000)
+
+    assert asyncio.run(client.achat_many(["a", "b", "c", "d"])) == ["hi"] * 4
+    # Two requests fit the bucket; the rest wait 30s each for a refill.
+    assert calls == pytest.approx([0, 0, 30, 60])
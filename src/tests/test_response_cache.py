@@ -0,0 +1,84 @@
+import os
+import sqlite3
+
+import pytest
+
+from response_cache import CacheMissError, ResponseCache
+
+
+def _count(path) -> int:
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+
+def test_put_and_get(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+    key = ResponseCache.make_key("chat", "model", "a  prompt")
+    assert cache.get(key) is None
+    cache.put(key, {"text": "answer"})
+    assert cache.get(ResponseCache.make_key("chat", "model", "a prompt")) == {
+        "text": "answer"
+    }
+    assert cache.stats() == {"hits": 1, "misses": 1, "hit_rate": 0.5}
+
+
+def test_evicts_least_recently_used(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = ResponseCache(path, max_entries=3)
+    for key in "abc":
+        cache.put(key, key)
+    cache.get("a")
+    cache.put("b", "b2")  # replacing an entry does not grow the cache
+    assert _count(path) == 3
+    cache.put("d", "d")
+    assert _count(path) == 3
+    assert cache.get("c") is None
+    assert [cache.get(key) for key in "abd"] == ["a", "b2", "d"]
+
+
+def test_count_is_read_on_open(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = ResponseCache(path)
+    for key in "abcd":
+        cache.put(key, key)
+    cache.close()
+    cache = ResponseCache(path, max_entries=2)
+    cache.put("e", "e")
+    assert _count(path) == 2
+
+
+def test_expired_entries_miss(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = ResponseCache(path, ttl=-1, max_entries=1)
+    cache.put("a", "a")
+    assert cache.get("a") is None
+    assert _count(path) == 0
+    cache.put("b", "b")
+    assert _count(path) == 1
+
+
+def test_read_only_does_not_create_the_database(tmp_path):
+    path = str(tmp_path / "missing" / "cache.sqlite")
+    cache = ResponseCache(path, read_only=True)
+    with pytest.raises(CacheMissError):
+        cache.get("a")
+    cache.put("a", "a")
+    cache.close()
+    assert not os.path.exists(os.path.dirname(path))
+
+
+def test_read_only_replays_without_writing(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    writer = ResponseCache(path)
+    writer.put("a", "a")
+    writer.close()
+    mtime = os.path.getmtime(path)
+
+    cache = ResponseCache(path, read_only=True)
+    assert cache.get("a") == "a"
+    cache.put("b", "b")
+    with pytest.raises(CacheMissError):
+        cache.get("b")
+    cache.close()
+    assert os.path.getmtime(path) == mtime
+    assert _count(path) == 1
@@ -0,0 +1,51 @@
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+from spacy_ner import NERAnalyzer
+
+
+@pytest.fixture
+def analyzer():
+    analyzer = NERAnalyzer(model="blank:en")
+    # A rule-based stand-in for the statistical ner component.
+    ruler = analyzer.nlp.add_pipe("entity_ruler", name="ner")
+    ruler.add_patterns(
+        [
+            {"label": "GPE", "pattern": "Springfield"},
+            {"label": "ORG", "pattern": "City Council"},
+        ]
+    )
+    return analyzer
+
+
+def test_analyze_many_reads_frames_and_tuples(analyzer):
+    frame = pd.DataFrame(
+        {
+            "vid_id": ["a", "b", "c"],
+            "caption_text_clean": [
+                "The City Council of Springfield met.",
+                None,
+                "Nothing here.",
+            ],
+        }
+    )
+    batches = list(analyzer.analyze_many([frame, ("d", "Back in Springfield")]))
+    assert len(batches) == 1
+    assert batches[0].to_pydict() == {
+        "doc_id": ["a", "a", "d"],
+        "start_char": [4, 20, 8],
+        "end_char": [16, 31, 19],
+        "label": ["ORG", "GPE", "GPE"],
+        "text": ["City Council", "Springfield", "Springfield"],
+    }
+
+
+def test_write_entities_skips_empty_batches(analyzer, tmp_path):
+    docs = [("a", "Nothing."), ("b", "Still nothing."), ("c", "Springfield")]
+    batches = list(analyzer.analyze_many(docs, flush_docs=1))
+    assert [batch.num_rows for batch in batches] == [1]
+
+    path = str(tmp_path / "entities.parquet")
+    assert analyzer.write_entities(docs, path, flush_docs=1) == 1
+    assert pq.ParquetFile(path).metadata.num_row_groups == 1
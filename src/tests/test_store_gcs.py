@@ -0,0 +1,65 @@
+import hashlib
+import io
+
+import pytest
+
+from store_gcs import GCS_BUCKET, StreamReader
+
+
+class Pipe(io.RawIOBase):
+    """
+    A stream that can only be read forwards, like a subprocess's stdout.
+    """
+
+    def __init__(self, data: bytes):
+        self.data = io.BytesIO(data)
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        return self.data.readinto(buffer)
+
+
+def test_upload_pipe_verifies_the_checksum(store):
+    data = b"audio" * 1000
+    path = store.upload_pipe(Pipe(data), "audio.flac")
+    assert path == f"gs://{GCS_BUCKET}/audio.flac"
+    assert store.bucket().objects["audio.flac"] == data
+
+
+def test_upload_pipe_deletes_a_corrupted_upload(store):
+    bucket = store.bucket()
+    bucket.corrupt = True
+    with pytest.raises(IOError, match="Checksum mismatch"):
+        store.upload_pipe(Pipe(b"audio"), "audio.flac")
+    assert "audio.flac" not in bucket.objects
+
+
+def test_upload_chunks_joins_the_chunks(store):
+    store.upload_chunks(iter([b"a" * 10, b"", b"b" * 5]), "chunks.bin")
+    assert store.bucket().objects["chunks.bin"] == b"a" * 10 + b"b" * 5
+
+
+def test_stream_reader_resends_the_last_chunk():
+    reader = StreamReader(Pipe(b"0123456789"))
+    assert reader.read(4) == b"0123"
+    assert reader.read(4) == b"4567"
+
+    assert reader.seek(4) == 4
+    assert reader.read(2) == b"45"
+    assert reader.read(2) == b"67"
+    assert reader.seek(4) == 4
+    assert reader.read(4) == b"4567"
+    assert reader.read(4) == b"89"
+    assert reader.tell() == 10
+    # Resent bytes are only hashed once.
+    assert reader.md5.digest() == hashlib.md5(b"0123456789").digest()
+
+
+def test_stream_reader_cannot_seek_before_the_last_chunk():
+    reader = StreamReader(Pipe(b"0123456789"))
+    reader.read(4)
+    reader.read(4)
+    with pytest.raises(io.UnsupportedOperation):
+        reader.seek(0)
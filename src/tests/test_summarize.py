@@ -0,0 +1,126 @@
+import asyncio
+
+import pytest
+import tiktoken
+
+import summarize
+from response_cache import ResponseCache
+from summarize import MAP_PROMPT, REDUCE_PROMPT, MeetingSummarizer, split_tokens
+
+# One token per byte, so that no encoding has to be downloaded.
+BYTE_ENCODING = tiktoken.Encoding(
+    name="bytes",
+    pat_str=r"\S+|\s+",
+    mergeable_ranks={bytes([i]): i for i in range(256)},
+    special_tokens={},
+)
+
+
+@pytest.fixture(autouse=True)
+def byte_encoding(monkeypatch):
+    monkeypatch.setattr(
+        summarize.tiktoken, "encoding_for_model", lambda model: BYTE_ENCODING
+    )
+
+
+class FakeClient:
+    """
+    Answers every prompt with a numbered six-byte summary, and records the
+    map and reduce prompts it was sent.
+    """
+
+    concurrency = 2
+    cache = None
+
+    def __init__(self):
+        self.map_prompts = []
+        self.reduce_prompts = []
+
+    async def achat(self, prompt: str) -> str:
+        await asyncio.sleep(0)
+        if prompt.startswith(MAP_PROMPT):
+            self.map_prompts.append(prompt)
+        else:
+            self.reduce_prompts.append(prompt)
+        return f"sum{len(self.map_prompts) + len(self.reduce_prompts):03d}"
+
+
+def _summarizer(client, tmp_path, **kwargs) -> MeetingSummarizer:
+    kwargs = {"chunk_tokens": 10, "overlap_tokens": 0, "reduce_tokens": 12, **kwargs}
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+    return MeetingSummarizer(client, cache=cache, **kwargs)
+
+
+async def _stream(summarizer, text):
+    return [stage async for stage in summarizer.astream(text)]
+
+
+def test_split_tokens_overlaps_chunks():
+    chunks = split_tokens("abcdefghij", chunk_tokens=4, overlap_tokens=1)
+    assert chunks == ["abcd", "defg", "ghij"]
+
+
+def test_split_tokens_short_text_is_one_chunk():
+    assert split_tokens("abcd", chunk_tokens=4, overlap_tokens=1) == ["abcd"]
+    assert split_tokens("ab", chunk_tokens=4, overlap_tokens=1) == ["ab"]
+
+
+@pytest.mark.parametrize("text", ["", "  \n\t "])
+def test_split_tokens_blank_text_has_no_chunks(text):
+    assert split_tokens(text, chunk_tokens=4, overlap_tokens=1) == []
+
+
+def test_split_tokens_rejects_overlap_of_whole_chunks():
+    with pytest.raises(ValueError):
+        split_tokens("abcdefghij", chunk_tokens=4, overlap_tokens=4)
+
+
+def test_summarize_maps_chunks_and_reduces_in_groups(tmp_path):
+    client = FakeClient()
+    summarizer = _summarizer(client, tmp_path)
+    stages = asyncio.run(_stream(summarizer, "a" * 10 + "b" * 10 + "c" * 10))
+
+    assert len(client.map_prompts) == 3
+    assert sorted(index for stage, index, _ in stages if stage == "map") == [0, 1, 2]
+    # Two six-byte summaries fit in 12 tokens: (0, 1), 2 and then the rest.
+    assert [(stage, index) for stage, index, _ in stages[3:]] == [
+        ("reduce", 1),
+        ("reduce", 1),
+        ("reduce", 2),
+        ("final", 0),
+    ]
+    assert len(client.reduce_prompts) == 2
+    assert stages[-1][2] == stages[-2][2] == "sum005"
+
+
+def test_summarize_new_reduce_prompt_reuses_chunk_summaries(tmp_path):
+    client = FakeClient()
+    text = "a" * 10 + "b" * 10
+    _summarizer(client, tmp_path).summarize(text)
+    assert len(client.map_prompts) == 2
+    assert len(client.reduce_prompts) == 1
+
+    summarizer = _summarizer(client, tmp_path, reduce_prompt="Combine briefly.")
+    summarizer.summarize(text)
+    assert len(client.map_prompts) == 2
+    assert len(client.reduce_prompts) == 2
+    assert client.reduce_prompts[-1].startswith("Combine briefly.")
+    assert not client.reduce_prompts[0].startswith("Combine briefly.")
+    assert client.reduce_prompts[0].startswith(REDUCE_PROMPT)
+
+
+def test_summarize_blank_transcript_calls_nothing(tmp_path):
+    client = FakeClient()
+    assert _summarizer(client, tmp_path).summarize(" \n") == ""
+    assert client.map_prompts == client.reduce_prompts == []
+
+
+def test_summarize_inside_running_loop(tmp_path):
+    client = FakeClient()
+    summarizer = _summarizer(client, tmp_path)
+
+    # As in a Jupyter notebook, where the kernel's event loop is running.
+    async def notebook_cell():
+        return summarizer.summarize("a" * 5)
+
+    assert asyncio.run(notebook_cell()) == "sum001"
@@ -0,0 +1,198 @@
+import asyncio
+import threading
+import time
+
+import numpy as np
+import pytest
+
+import transcribe_long
+from transcribe_long import (
+    DONE,
+    FAILED,
+    Checkpoint,
+    FakeSpeechBackend,
+    QuotaLimiter,
+    TranscriptionError,
+    TranscriptionOrchestrator,
+    split_at_silence,
+)
+
+SAMPLE_RATE = 1000
+
+
+def _audio(pattern) -> np.ndarray:
+    """
+    Concatenate (seconds, loud) pieces of a tone and of silence.
+    """
+    pieces = []
+    for seconds, loud in pattern:
+        n = int(seconds * SAMPLE_RATE)
+        tone = 10000 * np.sin(np.arange(n) * 0.3) if loud else np.zeros(n)
+        pieces.append(tone.astype(np.int16))
+    return np.concatenate(pieces)
+
+
+class TrackingBackend(FakeSpeechBackend):
+    """
+    FakeSpeechBackend that records the most operations in flight at once.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._count_lock = threading.Lock()
+
+    def submit(self, content, sample_rate):
+        with self._count_lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        return super().submit(content, sample_rate)
+
+    def poll(self, handle):
+        try:
+            results = super().poll(handle)
+        except Exception:
+            self._finish()
+            raise
+        if results is not None:
+            self._finish()
+        return results
+
+    def _finish(self):
+        with self._count_lock:
+            self.in_flight -= 1
+
+
+def _orchestrator(tmp_path, backend, **kwargs) -> TranscriptionOrchestrator:
+    kwargs = {
+        "sample_rate": SAMPLE_RATE,
+        "requests_per_minute": 60_000,
+        "poll_interval": 0.0,
+        "max_segment_seconds": 10,
+        **kwargs,
+    }
+    checkpoint = Checkpoint(str(tmp_path / "checkpoint.sqlite"))
+    return TranscriptionOrchestrator(backend=backend, checkpoint=checkpoint, **kwargs)
+
+
+def test_split_at_silence_cuts_in_silences():
+    samples = _audio([(7, True), (1, False), (6, True), (1, False), (3, True)])
+    segments = split_at_silence(
+        samples, SAMPLE_RATE, max_seconds=10, min_seconds=2, min_silence=0.3
+    )
+    assert [start for start, _ in segments][0] == 0
+    assert segments[-1][1] == len(samples)
+    assert all(end == start for (_, end), (start, _) in zip(segments, segments[1:]))
+    assert all(end - start <= 10 * SAMPLE_RATE for start, end in segments)
+    # Both cuts fall inside a silence, not at the 10 s limit.
+    cuts = [end for _, end in segments[:-1]]
+    assert len(cuts) == 2
+    assert 7 * SAMPLE_RATE <= cuts[0] <= 8 * SAMPLE_RATE
+    assert 14 * SAMPLE_RATE <= cuts[1] <= 15 * SAMPLE_RATE
+
+
+def test_split_at_silence_cuts_at_max_without_silence():
+    samples = _audio([(25, True)])
+    segments = split_at_silence(samples, SAMPLE_RATE, max_seconds=10, min_seconds=2)
+    assert segments == [(0, 10_000), (10_000, 20_000), (20_000, 25_000)]
+
+
+def test_split_at_silence_ignores_short_and_early_silences():
+    # The 0.1 s pause is too short and the pause at 1 s leaves too short a
+    # segment, so the only usable cut is in the pause at 9 s.
+    samples = _audio(
+        [(1, True), (0.5, False), (4, True), (0.1, False), (3.4, True), (1, False)]
+        + [(5, True)]
+    )
+    segments = split_at_silence(
+        samples, SAMPLE_RATE, max_seconds=10, min_seconds=2, min_silence=0.3
+    )
+    assert len(segments) == 2
+    assert 9 * SAMPLE_RATE <= segments[0][1] <= 10 * SAMPLE_RATE
+
+
+def test_quota_limiter_spaces_submits():
+    async def run():
+        limiter = QuotaLimiter(max_concurrent=4, requests_per_minute=1200)
+        times = []
+        for _ in range(5):
+            await limiter.wait_turn()
+            times.append(time.monotonic())
+        return times
+
+    times = asyncio.run(run())
+    gaps = np.diff(times)
+    assert np.all(gaps >= 0.05 - 0.005)
+
+
+@pytest.mark.parametrize("max_concurrent", [1, 3])
+def test_orchestrator_caps_operations_in_flight(tmp_path, max_concurrent):
+    samples = _audio([(55, True)])
+    backend = TrackingBackend(polls=10)
+    orchestrator = _orchestrator(
+        tmp_path, backend, max_concurrent=max_concurrent, poll_interval=0.01
+    )
+    asyncio.run(orchestrator.atranscribe("audio", samples))
+    assert backend.submitted == 6
+    assert backend.max_in_flight == max_concurrent
+
+
+def test_orchestrator_stitches_segments_in_order(tmp_path):
+    samples = _audio([(7, True), (1, False), (6, True), (1, False), (3, True)])
+    backend = FakeSpeechBackend(polls=2)
+    orchestrator = _orchestrator(tmp_path, backend)
+    transcript = asyncio.run(orchestrator.atranscribe("audio", samples))
+
+    segments = orchestrator.checkpoint.segments("audio")
+    assert len(segments) == 2
+    assert [status for *_, status in segments] == [DONE] * 2
+    results = transcript["results"]
+    assert [r["start"] for r in results] == [
+        start / SAMPLE_RATE for _, start, _, _ in segments
+    ]
+    assert [r["end"] for r in results] == [
+        end / SAMPLE_RATE for _, _, end, _ in segments
+    ]
+    assert transcript["text"] == " ".join(r["transcript"] for r in results)
+
+
+def test_orchestrator_retries_failed_operations(tmp_path):
+    samples = _audio([(25, True)])
+    # The first operations of segments 0 and 1 fail; their retries succeed.
+    backend = FakeSpeechBackend(fail=(0, 1))
+    orchestrator = _orchestrator(tmp_path, backend, max_attempts=2)
+    transcript = asyncio.run(orchestrator.atranscribe("audio", samples))
+    assert backend.submitted == 5
+    assert len(transcript["results"]) == 3
+    assert transcript["results"][-1]["end"] == 25.0
+
+
+def test_orchestrator_resumes_from_checkpoint(tmp_path):
+    samples = _audio([(25, True)])
+    # Segment 1 fails every attempt.
+    backend = FakeSpeechBackend(fail=(1, 3))
+    orchestrator = _orchestrator(tmp_path, backend, max_attempts=2, max_concurrent=1)
+    with pytest.raises(TranscriptionError):
+        asyncio.run(orchestrator.atranscribe("audio", samples))
+    statuses = [status for *_, status in orchestrator.checkpoint.segments("audio")]
+    assert statuses == [DONE, FAILED, DONE]
+
+    # A rerun only submits the failed segment.
+    backend = FakeSpeechBackend()
+    orchestrator = _orchestrator(tmp_path, backend)
+    transcript = asyncio.run(orchestrator.atranscribe("audio", samples))
+    assert backend.submitted == 1
+    assert [r["start"] for r in transcript["results"]] == [0.0, 10.0, 20.0]
+
+
+def test_transcribe_inside_running_loop(monkeypatch, tmp_path):
+    samples = _audio([(15, True)])
+    monkeypatch.setattr(transcribe_long, "read_audio", lambda source, rate: samples)
+    orchestrator = _orchestrator(tmp_path, FakeSpeechBackend())
+
+    async def notebook_cell():
+        return orchestrator.transcribe("meeting.flac")
+
+    transcript = asyncio.run(notebook_cell())
+    assert [r["start"] for r in transcript["results"]] == [0.0, 10.0]
@@ -0,0 +1,131 @@
+import subprocess
+
+import pytest
+
+import video_extract
+from video_extract import GCS_BUCKET, VidExtract
+
+
+class FakeStreams:
+    """
+    Stands in for pytube's StreamQuery: every query returns one audio stream.
+    """
+
+    url = "https://example.com/audio"
+    abr = "48kbps"
+
+    def filter(self, **kwargs):
+        return self
+
+    def order_by(self, attribute):
+        return self
+
+    def asc(self):
+        return self
+
+    def first(self):
+        return self
+
+
+class FakeYouTube:
+    def __init__(self, url):
+        self.title = "Regular Council Meeting"
+        self.streams = FakeStreams()
+
+
+@pytest.fixture
+def extractor(monkeypatch, store, tmp_path):
+    monkeypatch.setattr(video_extract, "YouTube", FakeYouTube)
+    monkeypatch.setattr(video_extract, "get_store", lambda: store)
+    return VidExtract("https://example.com/watch", GCS_BUCKET, str(tmp_path))
+
+
+def _transcoder(monkeypatch, command):
+    """
+    Replace ffmpeg with a shell command that copies stdin to stdout.
+    """
+    popen = subprocess.Popen
+
+    def fake_popen(args, **kwargs):
+        return popen(command, **kwargs)
+
+    monkeypatch.setattr(video_extract.subprocess, "Popen", fake_popen)
+
+
+def _download(chunks, error=None):
+    def stream(url):
+        yield from chunks
+        if error is not None:
+            raise error
+
+    return stream
+
+
+def _objects(store):
+    return store.bucket(GCS_BUCKET).objects
+
+
+def test_extract_audio_only_uploads_transcoded_audio(monkeypatch, extractor, store):
+    _transcoder(monkeypatch, ["cat"])
+    monkeypatch.setattr(video_extract.request, "stream", _download([b"a" * 10, b"b"]))
+    gcs_path = extractor.extract_audio_only()
+    assert gcs_path == f"gs://{GCS_BUCKET}/localnet/regular_council_meeting_aud.flac"
+    assert _objects(store) == {
+        "localnet/regular_council_meeting_aud.flac": b"a" * 10 + b"b"
+    }
+
+
+def test_extract_audio_only_raises_when_the_download_fails(
+    monkeypatch, extractor, store
+):
+    _transcoder(monkeypatch, ["cat"])
+    error = ConnectionResetError("connection lost")
+    monkeypatch.setattr(
+        video_extract.request, "stream", _download([b"a" * 10], error)
+    )
+    with pytest.raises(ConnectionResetError):
+        extractor.extract_audio_only()
+    assert _objects(store) == {}
+
+
+def test_extract_audio_only_raises_on_any_download_error(
+    monkeypatch, extractor, store
+):
+    _transcoder(monkeypatch, ["cat"])
+    monkeypatch.setattr(
+        video_extract.request, "stream", _download([b"a"], RuntimeError("retries"))
+    )
+    with pytest.raises(RuntimeError, match="retries"):
+        extractor.extract_audio_only()
+    assert _objects(store) == {}
+
+
+def test_extract_audio_only_raises_when_the_transcoder_fails(
+    monkeypatch, extractor, store
+):
+    _transcoder(monkeypatch, ["sh", "-c", "cat; exit 1"])
+    monkeypatch.setattr(video_extract.request, "stream", _download([b"a" * 10]))
+    with pytest.raises(RuntimeError, match="exit code 1"):
+        extractor.extract_audio_only()
+    assert _objects(store) == {}
+
+
+def test_extract_audio_only_names_the_upload(monkeypatch, extractor, store):
+    _transcoder(monkeypatch, ["cat"])
+    monkeypatch.setattr(video_extract.request, "stream", _download([b"a"]))
+    # Both videos are titled "Regular Council Meeting".
+    first = extractor.extract_audio_only(name="vid1")
+    second = extractor.extract_audio_only(name="vid2")
+    assert first == f"gs://{GCS_BUCKET}/localnet/vid1_aud.flac"
+    assert second == f"gs://{GCS_BUCKET}/localnet/vid2_aud.flac"
+    assert len(_objects(store)) == 2
+
+
+def test_extract_audio_only_keeps_slashes_out_of_titles(
+    monkeypatch, extractor, store
+):
+    _transcoder(monkeypatch, ["cat"])
+    monkeypatch.setattr(video_extract.request, "stream", _download([b"a"]))
+    extractor.yt.title = "Council Meeting 1/2"
+    gcs_path = extractor.extract_audio_only()
+    assert gcs_path == f"gs://{GCS_BUCKET}/localnet/council_meeting_1_2_aud.flac"
@@ -0,0 +1,108 @@
+"""
+This script benchmarks matching files against many patterns with
+:class:`pathspec.compiled.CompiledPatterns` versus the per-pattern loop.
+
+Run it from the project root::
+
+	python dev/benchmark_match.py --patterns 300 --files 20000
+"""
+
+import argparse
+import random
+import timeit
+from functools import (
+	partial)
+
+from pathspec import (
+	GitIgnoreSpec,
+	PathSpec)
+from pathspec.util import (
+	_filter_patterns,
+	normalize_file)
+
+_NAMES = ['src', 'lib', 'build', 'dist', 'node_modules', 'cache', 'docs', 'test']
+_EXTS = ['py', 'pyc', 'txt', 'json', 'log', 'tmp', 'o', 'so', 'md', 'csv']
+
+
+def make_lines(count: int, rand: random.Random) -> list:
+	"""
+	Generate *count* ignore rules in the style of large real-world
+	*.gitignore* files.
+	"""
+	lines = []
+	for i in range(count):
+		kind = rand.randrange(6)
+		name = f"{rand.choice(_NAMES)}{i}"
+		ext = f"{rand.choice(_EXTS)}{i}"
+		if kind == 0:
+			lines.append(f"*.{ext}")
+		elif kind == 1:
+			lines.append(f"{name}/")
+		elif kind == 2:
+			lines.append(f"/{name}/**/*.{ext}")
+		elif kind == 3:
+			lines.append(f"**/{name}/cache")
+		elif kind == 4:
+			lines.append(f"!{name}/keep.{ext}")
+		else:
+			lines.append(f"{name}-*.{ext}")
+	return lines
+
+
+def make_files(count: int, pattern_count: int, rand: random.Random) -> list:
+	"""
+	Generate *count* file paths, some of which hit the generated rules.
+	"""
+	files = []
+	for _ in range(count):
+		depth = rand.randint(1, 5)
+		parts = [
+			f"{rand.choice(_NAMES)}{rand.randrange(pattern_count)}"
+			for _ in range(depth)
+		]
+		ext = f"{rand.choice(_EXTS)}{rand.randrange(pattern_count)}"
+		files.append("/".join(parts) + f"/file.{ext}")
+	return files
+
+
+def bench(spec: PathSpec, files: list, repeat: int) -> None:
+	"""
+	Time the per-pattern loop and the compiled matcher on *spec*.
+	"""
+	norm_files = [normalize_file(file) for file in files]
+	use_patterns = _filter_patterns(spec.patterns)
+	loop = partial(spec._match_file, use_patterns)
+	compiled = spec._make_matcher(spec.patterns)
+
+	loop_results = [loop(file) for file in norm_files]
+	compiled_results = [compiled(file) for file in norm_files]
+	assert [bool(r) for r in loop_results] == compiled_results, "Results differ."
+
+	loop_time = min(timeit.repeat(lambda: [loop(f) for f in norm_files], number=1, repeat=repeat))
+	compiled_time = min(timeit.repeat(lambda: [compiled(f) for f in norm_files], number=1, repeat=repeat))
+	build_time = min(timeit.repeat(lambda: spec._make_matcher(spec.patterns), number=1, repeat=repeat))
+
+	name = type(spec).__name__
+	print(f"{name}: {len(use_patterns)} patterns, {len(files)} files, {sum(compiled_results)} matched")
+	print(f"  loop:     {loop_time:.3f}s")
+	print(f"  compiled: {compiled_time:.3f}s ({loop_time / compiled_time:.1f}x), build {build_time * 1000:.1f}ms")
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+	parser.add_argument('--patterns', type=int, default=300)
+	parser.add_argument('--files', type=int, default=20000)
+	parser.add_argument('--repeat', type=int, default=3)
+	parser.add_argument('--seed', type=int, default=0)
+	args = parser.parse_args()
+
+	rand = random.Random(args.seed)
+	lines = make_lines(args.patterns, rand)
+	files = make_files(args.files, args.patterns, rand)
+
+	bench(PathSpec.from_lines('gitwildmatch', lines), files, args.repeat)
+	bench(GitIgnoreSpec.from_lines(lines), files, args.repeat)
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,451 @@
+"""
+This module provides :class:`CompiledPatterns` which matches files
+against many regex patterns by first finding the few patterns that can
+possibly match, instead of running every pattern's regular expression.
+"""
+
+import re
+from typing import (
+	Any,
+	Dict,
+	List,
+	Optional,
+	Sequence,
+	Tuple)
+
+from .pattern import (
+	Pattern,
+	RegexPattern)
+from .patterns.gitwildmatch import (
+	GitWildMatchPattern,
+	_DIR_MARK)
+from .util import (
+	_filter_patterns)
+
+MIN_LITERAL_LENGTH = 2
+"""
+*MIN_LITERAL_LENGTH* (:class:`int`) is the length below which a required
+literal is not worth indexing.
+"""
+
+_DIR_TAILS = (
+	f'(?P<{_DIR_MARK}>/).*$',
+	f'(?:(?P<{_DIR_MARK}>/).*)?$',
+)
+"""
+*_DIR_TAILS* (:class:`tuple` of :class:`str`) contains the endings of
+:class:`.GitWildMatchPattern` regular expressions that match everything
+below a matched directory.
+"""
+
+_META_CHARS = frozenset('.^$*+?{}[]()|\\')
+"""
+*_META_CHARS* (:class:`frozenset` of :class:`str`) contains the regular
+expression characters that end a literal prefix.
+"""
+
+_HEX_ESCAPES = {'x': 2, 'u': 4, 'U': 8}
+"""
+*_HEX_ESCAPES* (:class:`dict`) maps the escapes of code points to the
+number of hexadecimal digits that follow them.
+"""
+
+
+def required_literal(regex: str) -> Optional[str]:
+	"""
+	Find a literal string that every match of the regular expression must
+	contain.
+
+	Only literal characters outside of any group are considered, and a
+	character followed by a quantifier is dropped. The result is therefore
+	conservative: it may be shorter than the longest required literal, but
+	any string the regular expression matches contains it.
+
+	*regex* (:class:`str`) is the uncompiled regular expression.
+
+	Returns the longest literal found (:class:`str`), or :data:`None` if
+	there is none.
+	"""
+	runs = []
+	run = []
+	depth = 0
+	i = 0
+	end = len(regex)
+	while i < end:
+		char = regex[i]
+		if char == '\\' and i + 1 < end:
+			escaped = regex[i + 1]
+			if escaped.isalnum():
+				# Character class, anchor, code point or backreference escape
+				# (e.g., "\d", "\Z", "\x41", "\1"). It ends the run, and its
+				# operand is not literal.
+				runs.append(''.join(run))
+				run = []
+				i = _skip_escape_operand(regex, i + 2, escaped)
+				continue
+			elif depth == 0:
+				run.append(escaped)
+			i += 2
+
+		elif char == '[':
+			# Skip the character class.
+			runs.append(''.join(run))
+			run = []
+			i += 1
+			if i < end and regex[i] == '^':
+				i += 1
+			if i < end and regex[i] == ']':
+				i += 1
+			while i < end and regex[i] != ']':
+				i += 2 if regex[i] == '\\' else 1
+			i += 1
+
+		elif char == '(':
+			runs.append(''.join(run))
+			run = []
+			depth += 1
+			i += 1
+
+		elif char == ')':
+			depth -= 1
+			i += 1
+
+		elif char == '|':
+			if depth == 0:
+				# Top-level alternation: no literal is required.
+				return None
+			i += 1
+
+		elif char in '?*+{':
+			# The quantified character is optional.
+			if depth == 0 and run:
+				run.pop()
+			runs.append(''.join(run))
+			run = []
+			if char == '{':
+				# Skip the repetition count.
+				while i < end and regex[i] != '}':
+					i += 1
+			i += 1
+
+		elif char in '.^$':
+			runs.append(''.join(run))
+			run = []
+			i += 1
+
+		else:
+			if depth == 0:
+				run.append(char)
+			i += 1
+
+	runs.append(''.join(run))
+	literal = max(runs, key=len)
+	return literal or None
+
+
+def _skip_escape_operand(regex: str, i: int, escaped: str) -> int:
+	"""
+	Skip the operand of an alphanumeric escape.
+
+	*regex* (:class:`str`) is the uncompiled regular expression.
+
+	*i* (:class:`int`) is the index right after the escaped character.
+
+	*escaped* (:class:`str`) is the escaped character.
+
+	Returns the index after the operand (:class:`int`).
+	"""
+	end = len(regex)
+	if escaped in _HEX_ESCAPES:
+		return min(i + _HEX_ESCAPES[escaped], end)
+
+	if escaped == 'N':
+		# Named character (e.g., "\N{DIGIT ONE}").
+		close = regex.find('}', i)
+		return end if close == -1 else close + 1
+
+	if escaped.isdigit():
+		# Octal escape (e.g., "\012") or backreference (e.g., "\12").
+		stop = i + 2
+		while i < min(stop, end) and regex[i].isdigit():
+			i += 1
+
+	return i
+
+
+def _has_top_level_alternation(regex: str) -> bool:
+	"""
+	Get whether the regular expression has a :data:`"|"` outside of any
+	group or character class.
+
+	*regex* (:class:`str`) is the uncompiled regular expression.
+
+	Returns whether it has a top-level alternation (:class:`bool`).
+	"""
+	depth = 0
+	i = 0
+	end = len(regex)
+	while i < end:
+		char = regex[i]
+		if char == '\\':
+			i += 2
+
+		elif char == '[':
+			# Skip the character class.
+			i += 1
+			if i < end and regex[i] == '^':
+				i += 1
+			if i < end and regex[i] == ']':
+				i += 1
+			while i < end and regex[i] != ']':
+				i += 2 if regex[i] == '\\' else 1
+			i += 1
+
+		else:
+			if char == '(':
+				depth += 1
+			elif char == ')':
+				depth -= 1
+			elif char == '|' and depth == 0:
+				return True
+			i += 1
+
+	return False
+
+
+def anchored_prefix(regex: str) -> Optional[str]:
+	"""
+	Find the literal prefix of an anchored regular expression.
+
+	*regex* (:class:`str`) is the uncompiled regular expression.
+
+	Returns the literal every match starts with (:class:`str`), or
+	:data:`None` if the regular expression is not anchored with
+	:data:`"^"` or has a top-level alternation.
+	"""
+	if not regex.startswith('^') or _has_top_level_alternation(regex):
+		return None
+
+	prefix = []
+	i = 1
+	end = len(regex)
+	while i < end:
+		char = regex[i]
+		if char == '\\' and i + 1 < end and not regex[i + 1].isalnum():
+			prefix.append(regex[i + 1])
+			i += 2
+		elif char in _META_CHARS:
+			if char in '?*{' and prefix:
+				# The quantified character is optional.
+				prefix.pop()
+			break
+		else:
+			prefix.append(char)
+			i += 1
+
+	return ''.join(prefix)
+
+
+def covers_dir(pattern: Pattern, dir: str) -> bool:
+	"""
+	Get whether the pattern matches every path below the directory.
+
+	This is only known for :class:`.GitWildMatchPattern` patterns which
+	end by matching anything after a directory, when their match of the
+	directory path with a trailing slash puts the directory marker at the
+	directory or one of its ancestors.
+
+	*pattern* (:class:`.Pattern`) is the pattern.
+
+	*dir* (:class:`str`) is the normalized directory path.
+
+	Returns whether *pattern* matches every descendant of *dir*
+	(:class:`bool`).
+	"""
+	if not isinstance(pattern, GitWildMatchPattern) or not _indexable(pattern):
+		return False
+
+	if not pattern.regex.pattern.endswith(_DIR_TAILS):
+		return False
+
+	# The directory marker may match at an ancestor of the directory (e.g.,
+	# "build/**" for "build/x"), which covers it as well.
+	match = pattern.regex.match(f'{dir}/')
+	return match is not None and 0 <= match.start(_DIR_MARK) <= len(dir)
+
+
+def may_match_in_dir(pattern: Pattern, dir: str) -> bool:
+	"""
+	Get whether the pattern can match any path below the directory. This is
+	conservative: :data:`True` only means the pattern could not be ruled
+	out by its anchored literal prefix.
+
+	*pattern* (:class:`.Pattern`) is the pattern.
+
+	*dir* (:class:`str`) is the normalized directory path.
+
+	Returns whether *pattern* may match a descendant of *dir*
+	(:class:`bool`).
+	"""
+	if not _indexable(pattern):
+		return True
+
+	prefix = anchored_prefix(pattern.regex.pattern)
+	if prefix is None:
+		return True
+
+	dir_prefix = f'{dir}/'
+	return prefix.startswith(dir_prefix) or dir_prefix.startswith(prefix)
+
+
+def _indexable(pattern: Pattern) -> bool:
+	"""
+	Get whether a required literal can be taken from the pattern's regular
+	expression.
+
+	*pattern* (:class:`.Pattern`) is the pattern.
+
+	Returns whether *pattern* can be indexed (:class:`bool`).
+	"""
+	if not isinstance(pattern, RegexPattern):
+		return False
+
+	if type(pattern).match_file is not RegexPattern.match_file:
+		# A custom match implementation may not use the regex.
+		return False
+
+	regex = pattern.regex
+	if not isinstance(regex, re.Pattern) or not isinstance(regex.pattern, str):
+		return False
+
+	# Flags such as IGNORECASE or VERBOSE change what a literal means.
+	return regex.flags == re.UNICODE
+
+
+class CompiledPatterns(object):
+	"""
+	The :class:`CompiledPatterns` class matches files against a list of
+	patterns with last-match-wins semantics.
+
+	A literal string required by each pattern's regular expression is
+	indexed (e.g., :data:`".txt"` for :data:`"*.txt"`, or
+	:data:`"node_modules"` for :data:`"node_modules/"`). A single scan of
+	a file path with one combined regular expression finds every indexed
+	literal it contains, which gives the candidate patterns. Only the
+	candidates, and the patterns without a usable literal, are then run
+	from last to first until one matches.
+	"""
+
+	def __init__(self, patterns: Sequence[Pattern]) -> None:
+		"""
+		Initializes the :class:`CompiledPatterns` instance.
+
+		*patterns* (:class:`~collections.abc.Sequence` of :class:`.Pattern`)
+		contains the patterns. Null-operation patterns are dropped.
+		"""
+
+		self.patterns: List[Pattern] = _filter_patterns(patterns)
+		"""
+		*patterns* (:class:`list` of :class:`.Pattern`) contains the
+		non-null patterns.
+		"""
+
+		always = []
+		by_literal: Dict[str, List[int]] = {}
+		for index, pattern in enumerate(self.patterns):
+			literal = required_literal(pattern.regex.pattern) if _indexable(pattern) else None
+			if literal is None or len(literal) < MIN_LITERAL_LENGTH:
+				always.append(index)
+			else:
+				by_literal.setdefault(literal, []).append(index)
+
+		self._always: Tuple[int, ...] = tuple(always)
+		"""
+		*_always* (:class:`tuple` of :class:`int`) contains the indices of
+		the patterns that are always candidates.
+		"""
+
+		# Longest first, so that at each position the scan reports the
+		# longest literal. Shorter literals it contains are then added from
+		# its closure below.
+		literals = sorted(by_literal, key=len, reverse=True)
+
+		self._candidates: Dict[str, Tuple[int, ...]] = {
+			lit: tuple(sorted({
+				index
+				for sub in literals
+				if sub in lit
+				for index in by_literal[sub]
+			}))
+			for lit in literals
+		}
+		"""
+		*_candidates* (:class:`dict`) maps each indexed literal (:class:`str`)
+		to the indices of the patterns whose literal it contains.
+		"""
+
+		self._scan: Optional['re.Pattern'] = None
+		"""
+		*_scan* (:class:`re.Pattern` or :data:`None`) finds the longest indexed
+		literal at each position of a file path.
+		"""
+		if literals:
+			self._scan = re.compile('(?=({}))'.format('|'.join(map(re.escape, literals))))
+
+	def candidates(self, file: str) -> List[int]:
+		"""
+		Get the patterns that can possibly match the file.
+
+		*file* (:class:`str`) is the normalized file path.
+
+		Returns the pattern indices (:class:`list` of :class:`int`) in
+		descending order.
+		"""
+		found = set(self._always)
+		if self._scan is not None:
+			for literal in set(self._scan.findall(file)):
+				found.update(self._candidates[literal])
+
+		return sorted(found, reverse=True)
+
+	def last_match(
+		self,
+		file: str,
+		stop: Optional[int] = None,
+	) -> Optional[Tuple[int, Any]]:
+		"""
+		Finds the last pattern that matches the file.
+
+		*file* (:class:`str`) is the normalized file path.
+
+		*stop* (:class:`int` or :data:`None`) optionally limits the search to
+		the patterns before this index. Default is :data:`None` for all
+		patterns.
+
+		Returns the index of the pattern (:class:`int`) and the result of its
+		:meth:`.Pattern.match_file`, or :data:`None` if no pattern matched.
+		"""
+		for index in self.candidates(file):
+			if stop is not None and index >= stop:
+				continue
+
+			result = self.patterns[index].match_file(file)
+			if result is not None:
+				return index, result
+
+		return None
+
+	def match_file(self, file: str) -> bool:
+		"""
+		Matches the file to the patterns. This gives the same result as
+		:func:`pathspec.util.match_file`.
+
+		*file* (:class:`str`) is the normalized file path.
+
+		Returns :data:`True` if *file* matched; otherwise, :data:`False`.
+		"""
+		found = self.last_match(file)
+		if found is None:
+			return False
+
+		return bool(self.patterns[found[0]].include)
@@ -3,24 +3,33 @@ This module provides :class:`.GitIgnoreSpec` which replicates
 *.gitignore* behavior.
 """
 
+from functools import (
+	partial)
 from typing import (
 	AnyStr,
 	Callable,
 	Collection,
 	Iterable,
+	Optional,
 	Type,
 	TypeVar,
 	Union)
 
+from .compiled import (
+	CompiledPatterns,
+	covers_dir,
+	may_match_in_dir)
 from .pathspec import (
 	PathSpec)
 from .pattern import (
-	Pattern)
+	Pattern,
+	RegexMatchResult)
 from .patterns.gitwildmatch import (
 	GitWildMatchPattern,
 	GitWildMatchPatternError,
 	_DIR_MARK)
 from .util import (
+	_filter_patterns,
 	_is_iterable)
 
 Self = TypeVar("Self", bound="GitIgnoreSpec")
@@ -81,6 +90,108 @@ class GitIgnoreSpec(PathSpec):
 		self = super().from_lines(pattern_factory, lines)
 		return self  # type: ignore
 
+	@staticmethod
+	def _get_dir_mark(
+		pattern: GitWildMatchPattern,
+		file: str,
+		match: RegexMatchResult,
+	) -> bool:
+		"""
+		Get whether the pattern matched the file by a directory.
+
+		*pattern* (:class:`.GitWildMatchPattern`) is the matched pattern.
+
+		*file* (:class:`str`) is the normalized file path.
+
+		*match* (:class:`.RegexMatchResult`) is the match result.
+
+		Returns whether the directory marker matched (:class:`bool`).
+		"""
+		try:
+			dir_mark = match.match.group(_DIR_MARK)
+		except IndexError as e:
+			# NOTICE: The exact content of this error message is subject
+			# to change.
+			raise GitWildMatchPatternError((
+				f"Invalid git pattern: directory marker regex group is missing. "
+				f"Debug: file={file!r} regex={pattern.regex!r} "
+				f"group={_DIR_MARK!r} match={match.match!r}."
+			)) from e
+
+		return bool(dir_mark)
+
+	def _make_matcher(
+		self,
+		patterns: Collection[Pattern],
+	) -> Callable[[str], bool]:
+		"""
+		Build the matcher for the patterns. See :meth:`.PathSpec._make_matcher`.
+		"""
+		if self._match_file is GitIgnoreSpec._match_file:
+			return partial(self._match_compiled, CompiledPatterns(patterns))
+
+		return super()._make_matcher(patterns)
+
+	@classmethod
+	def _match_compiled(cls, compiled: CompiledPatterns, file: str) -> bool:
+		"""
+		Matches the file to the compiled patterns. This gives the same result
+		as :meth:`._match_file` while only looking at the last matches.
+
+		The last matching pattern decides, except that an exclude matched by
+		a directory does not override a file match before it. So after a run
+		of directory excludes, the last other match decides: only a file
+		include wins.
+
+		*compiled* (:class:`.CompiledPatterns`) contains the patterns.
+
+		*file* (:class:`str`) is the normalized file path.
+
+		Returns :data:`True` if *file* matched; otherwise, :data:`False`.
+		"""
+		stop = None
+		while True:
+			found = compiled.last_match(file, stop)
+			if found is None:
+				return False
+
+			index, match = found
+			pattern = compiled.patterns[index]
+			dir_mark = cls._get_dir_mark(pattern, file, match)
+			if pattern.include:
+				# An include after directory excludes only wins by file.
+				return stop is None or not dir_mark
+
+			elif not dir_mark:
+				# Pattern matched by an exclude file pattern.
+				return False
+
+			stop = index
+
+	def _match_subtree(self, dir: str) -> Optional[bool]:
+		"""
+		Get the match result shared by every path below the directory. See
+		:meth:`.PathSpec._match_subtree`.
+
+		Because an exclude matched by a directory does not override earlier
+		file matches, a covering exclude is not enough to decide the result.
+		The paths below are known to match when a covering include is
+		followed only by includes, and known not to match when no include
+		pattern can match below the directory.
+		"""
+		if self._match_file is not GitIgnoreSpec._match_file:
+			return None
+
+		later = set()
+		for pattern in reversed(_filter_patterns(self.patterns)):
+			if pattern.include and later <= {True} and covers_dir(pattern, dir):
+				return True
+
+			if may_match_in_dir(pattern, dir):
+				later.add(bool(pattern.include))
+
+		return None if True in later else False
+
 	@staticmethod
 	def _match_file(
 		patterns: Collection[GitWildMatchPattern],
@@ -110,16 +221,7 @@ class GitIgnoreSpec(PathSpec):
 					# Pattern matched.
 
 					# Check for directory marker.
-					try:
-						dir_mark = match.match.group(_DIR_MARK)
-					except IndexError as e:
-						# NOTICE: The exact content of this error message is subject
-						# to change.
-						raise GitWildMatchPatternError((
-							f"Invalid git pattern: directory marker regex group is missing. "
-							f"Debug: file={file!r} regex={pattern.regex!r} "
-							f"group={_DIR_MARK!r} match={match.match!r}."
-						)) from e
+					dir_mark = GitIgnoreSpec._get_dir_mark(pattern, file, match)
 
 					if dir_mark:
 						# Pattern matched by a directory pattern.
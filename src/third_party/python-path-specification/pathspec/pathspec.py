@@ -3,9 +3,14 @@ This module provides an object oriented interface for pattern matching
 of files.
 """
 
+import concurrent.futures
+import json
+import re
 import sys
 from collections.abc import (
 	Collection as CollectionType)
+from functools import (
+	partial)
 from itertools import (
 	zip_longest)
 from os import (
@@ -17,20 +22,45 @@ from typing import (
 	Iterable,
 	Iterator,
 	Optional,
+	Tuple,
 	Type,
 	TypeVar,
 	Union)
 
 from . import util
+from .compiled import (
+	CompiledPatterns,
+	covers_dir,
+	may_match_in_dir)
 from .pattern import (
-	Pattern)
+	Pattern,
+	RegexPattern)
 from .util import (
 	StrPath,
 	TreeEntry,
 	_filter_patterns,
 	_is_iterable,
 	match_file,
-	normalize_file)
+	normalize_file,
+	normalize_file_list)
+
+BULK_CHUNK_SIZE = 10000
+"""
+*BULK_CHUNK_SIZE* (:class:`int`) is the default number of files matched
+per task by :meth:`PathSpec.match_files_bulk` when using an executor.
+"""
+
+DUMP_VERSION = 1
+"""
+*DUMP_VERSION* (:class:`int`) is the version of the file format written by
+:meth:`PathSpec.dump`.
+"""
+
+_NEGATE_TABLE = bytes.maketrans(b'\x00\x01', b'\x01\x00')
+"""
+*_NEGATE_TABLE* (:class:`bytes`) is the translation table which flips
+the match results in a byte mask.
+"""
 
 Self = TypeVar("Self", bound="PathSpec")
 """
@@ -59,6 +89,12 @@ class PathSpec(object):
 		contains the compiled patterns.
 		"""
 
+		self._matcher_cache: Optional[Tuple[Tuple[int, ...], Tuple[Pattern, ...], Callable[[str], bool]]] = None
+		"""
+		*_matcher_cache* (:class:`tuple` or :data:`None`) holds the pattern
+		ids and patterns the cached matcher was built for, and the matcher.
+		"""
+
 	def __eq__(self, other: object) -> bool:
 		"""
 		Tests the equality of this path-spec with *other* (:class:`PathSpec`)
@@ -131,10 +167,58 @@ class PathSpec(object):
 		patterns = [pattern_factory(line) for line in lines if line]
 		return cls(patterns)
 
+	@classmethod
+	def load(cls: Type[Self], file: StrPath) -> Self:
+		"""
+		Loads the compiled patterns saved by :meth:`.dump`. The regular
+		expressions are compiled again, but the pattern lines are not
+		converted.
+
+		.. WARNING:: The pattern classes are looked up by their registered
+		   names (see :func:`~pathspec.util.lookup_pattern`), so the file must
+		   come from a trusted source, as with :mod:`pickle`.
+
+		*file* (:class:`str` or :class:`os.PathLike[str]`) is the path of the
+		file to read.
+
+		Returns the :class:`PathSpec` instance.
+		"""
+		with open(file, 'r', encoding='utf8') as fh:
+			data = json.load(fh)
+
+		version = data.get('version')
+		if version != DUMP_VERSION:
+			raise ValueError((
+				f"file:{file!r} has version {version!r} but {DUMP_VERSION!r} is "
+				f"supported."
+			))
+
+		patterns = [_load_pattern(__data) for __data in data['patterns']]
+		return cls(patterns)
+
+	def dump(self, file: StrPath) -> None:
+		"""
+		Saves the compiled patterns so that :meth:`.load` can rebuild this
+		path-spec without converting the pattern lines again.
+
+		Only :class:`.RegexPattern` itself and the registered pattern classes
+		(see :func:`~pathspec.util.register_pattern`) can be saved.
+
+		*file* (:class:`str` or :class:`os.PathLike[str]`) is the path of the
+		file to write.
+		"""
+		data = {
+			'version': DUMP_VERSION,
+			'patterns': [_dump_pattern(__pattern) for __pattern in self.patterns],
+		}
+		with open(file, 'w', encoding='utf8') as fh:
+			json.dump(data, fh, indent='\t')
+
 	def match_entries(
 		self,
 		entries: Iterable[TreeEntry],
 		separators: Optional[Collection[str]] = None,
+		negate: Optional[bool] = None,
 	) -> Iterator[TreeEntry]:
 		"""
 		Matches the entries to this path-spec.
@@ -147,18 +231,57 @@ class PathSpec(object):
 		normalize. See :func:`~pathspec.util.normalize_file` for more
 		information.
 
+		*negate* (:class:`bool` or :data:`None`) is whether to negate the
+		match results of the patterns, i.e., return the entries that did not
+		match. Default is :data:`None` for :data:`False`.
+
 		Returns the matched entries (:class:`~collections.abc.Iterator` of
 		:class:`~util.TreeEntry`).
 		"""
 		if not _is_iterable(entries):
 			raise TypeError(f"entries:{entries!r} is not an iterable.")
 
-		use_patterns = _filter_patterns(self.patterns)
+		negate = bool(negate)
+		match = self._get_matcher()
 		for entry in entries:
 			norm_file = normalize_file(entry.path, separators)
-			if self._match_file(use_patterns, norm_file):
+			if bool(match(norm_file)) != negate:
 				yield entry
 
+	def _get_matcher(self) -> Callable[[str], bool]:
+		"""
+		Get the matcher for :attr:`self.patterns <PathSpec.patterns>`. It is
+		built once and rebuilt only when the patterns change.
+
+		Returns the matcher (:class:`~collections.abc.Callable`) which takes a
+		normalized file path and returns whether it matched.
+		"""
+		key = tuple(map(id, self.patterns))
+		if self._matcher_cache is None or self._matcher_cache[0] != key:
+			# NOTE: Keep the patterns alive so their ids cannot be reused.
+			patterns = tuple(self.patterns)
+			self._matcher_cache = (key, patterns, self._make_matcher(patterns))
+
+		return self._matcher_cache[2]
+
+	def _make_matcher(self, patterns: Collection[Pattern]) -> Callable[[str], bool]:
+		"""
+		Build the matcher for the patterns.
+
+		.. NOTE:: Subclasses that override :meth:`._match_file` get a matcher
+		   calling it; otherwise the patterns are combined by
+		   :class:`.CompiledPatterns`.
+
+		*patterns* (:class:`~collections.abc.Collection` of :class:`.Pattern`)
+		contains the patterns to use.
+
+		Returns the matcher (:class:`~collections.abc.Callable`).
+		"""
+		if self._match_file is match_file:
+			return CompiledPatterns(patterns).match_file
+
+		return partial(self._match_file, _filter_patterns(patterns))
+
 	# Match files using the `match_file()` utility function. Subclasses
 	# may override this method as an instance method. It does not have to
 	# be a static method.
@@ -182,12 +305,13 @@ class PathSpec(object):
 		Returns :data:`True` if *file* matched; otherwise, :data:`False`.
 		"""
 		norm_file = util.normalize_file(file, separators=separators)
-		return self._match_file(self.patterns, norm_file)
+		return self._get_matcher()(norm_file)
 
 	def match_files(
 		self,
 		files: Iterable[StrPath],
 		separators: Optional[Collection[str]] = None,
+		negate: Optional[bool] = None,
 	) -> Iterator[StrPath]:
 		"""
 		Matches the files to this path-spec.
@@ -201,28 +325,166 @@ class PathSpec(object):
 		normalize. See :func:`~pathspec.util.normalize_file` for more
 		information.
 
+		*negate* (:class:`bool` or :data:`None`) is whether to negate the
+		match results of the patterns, i.e., return the files that did not
+		match. Default is :data:`None` for :data:`False`.
+
 		Returns the matched files (:class:`~collections.abc.Iterator` of
 		:class:`str` or :class:`os.PathLike[str]`).
 		"""
 		if not _is_iterable(files):
 			raise TypeError(f"files:{files!r} is not an iterable.")
 
-		use_patterns = _filter_patterns(self.patterns)
+		negate = bool(negate)
+		match = self._get_matcher()
 		for orig_file in files:
 			norm_file = normalize_file(orig_file, separators)
-			if self._match_file(use_patterns, norm_file):
+			if bool(match(norm_file)) != negate:
 				yield orig_file
 
+	def match_files_bulk(
+		self,
+		files: Iterable[StrPath],
+		separators: Optional[Collection[str]] = None,
+		negate: Optional[bool] = None,
+		out: Optional[bytearray] = None,
+		executor: Optional[concurrent.futures.Executor] = None,
+		chunk_size: int = BULK_CHUNK_SIZE,
+	) -> bytearray:
+		"""
+		Matches many files to this path-spec at once. This gives the same
+		results as :meth:`.match_files` as a byte mask instead of yielding
+		the matched files, and normalizes the files with
+		:func:`~pathspec.util.normalize_file_list`.
+
+		*files* (:class:`~collections.abc.Iterable` of :class:`str` or
+		:class:`os.PathLike[str]`) contains the file paths to be matched against
+		:attr:`self.patterns <PathSpec.patterns>`.
+
+		*separators* (:class:`~collections.abc.Collection` of :class:`str`;
+		or :data:`None`) optionally contains the path separators to
+		normalize. See :func:`~pathspec.util.normalize_file` for more
+		information.
+
+		*negate* (:class:`bool` or :data:`None`) is whether to negate the
+		match results of the patterns. Default is :data:`None` for
+		:data:`False`.
+
+		*out* (:class:`bytearray` or :data:`None`) optionally is the buffer to
+		write the results to, so it can be reused between calls. It must be at
+		least as long as *files*. Default is :data:`None` to allocate a new
+		one.
+
+		*executor* (:class:`concurrent.futures.Executor` or :data:`None`)
+		optionally matches chunks of *files* concurrently. A
+		:class:`~concurrent.futures.ProcessPoolExecutor` requires the patterns
+		to be picklable. Default is :data:`None` to match in the calling
+		thread.
+
+		*chunk_size* (:class:`int`) is the number of files per task submitted
+		to *executor*. Default is :data:`BULK_CHUNK_SIZE`.
+
+		Returns the result buffer (:class:`bytearray`). The byte at the index
+		of each file is :data:`1` if it matched, or :data:`0` if it did not.
+		"""
+		if not _is_iterable(files):
+			raise TypeError(f"files:{files!r} is not an iterable.")
+
+		if not isinstance(files, CollectionType):
+			files = list(files)
+
+		if out is None:
+			out = bytearray(len(files))
+		elif len(out) < len(files):
+			raise ValueError(f"out:{len(out)} is shorter than files:{len(files)}.")
+
+		negate = bool(negate)
+		match = self._get_matcher()
+		if executor is None:
+			out[:len(files)] = _match_chunk(match, files, separators, negate)
+			return out
+
+		if chunk_size < 1:
+			raise ValueError(f"chunk_size:{chunk_size!r} is not positive.")
+
+		if not isinstance(files, list):
+			files = list(files)
+
+		futures = [
+			(__start, executor.submit(
+				_match_chunk, match, files[__start:__start + chunk_size], separators, negate,
+			))
+			for __start in range(0, len(files), chunk_size)
+		]
+		try:
+			for start, future in futures:
+				result = future.result()
+				out[start:start + len(result)] = result
+		finally:
+			for _start, future in futures:
+				future.cancel()
+
+		return out
+
+	def _match_subtree(self, dir: str) -> Optional[bool]:
+		"""
+		Get the match result shared by every path below the directory.
+
+		This holds when the last pattern covering the whole directory (see
+		:func:`~pathspec.compiled.covers_dir`) is followed only by patterns
+		that cannot match below it or have the same include, or when no
+		include pattern can match below it at all.
+
+		*dir* (:class:`str`) is the normalized directory path.
+
+		Returns the shared result (:class:`bool`), or :data:`None` if the
+		paths below *dir* may match differently.
+		"""
+		if self._match_file is not match_file:
+			return None
+
+		later = set()
+		for pattern in reversed(_filter_patterns(self.patterns)):
+			if covers_dir(pattern, dir):
+				include = bool(pattern.include)
+				return include if later <= {include} else None
+
+			if may_match_in_dir(pattern, dir):
+				later.add(bool(pattern.include))
+				if len(later) > 1:
+					return None
+
+		return False if later <= {False} else None
+
+	def _make_pruner(self, negate: bool) -> Callable[[str], bool]:
+		"""
+		Build the directory pruner for a tree walk.
+
+		*negate* (:class:`bool`) is whether the match results are negated.
+
+		Returns the pruner (:class:`~collections.abc.Callable`) which takes a
+		directory path and returns whether no path below it can be yielded.
+		"""
+		def prune(dir: str) -> bool:
+			result = self._match_subtree(normalize_file(dir))
+			return result is not None and result == negate
+
+		return prune
+
 	def match_tree_entries(
 		self,
 		root: StrPath,
 		on_error: Optional[Callable] = None,
 		follow_links: Optional[bool] = None,
+		negate: Optional[bool] = None,
+		executor: Optional[concurrent.futures.Executor] = None,
 	) -> Iterator[TreeEntry]:
 		"""
 		Walks the specified root path for all files and matches them to this
 		path-spec.
 
+		Directories whose descendants can never be matched are not walked.
+
 		*root* (:class:`str` or :class:`os.PathLike[str]`) is the root directory
 		to search.
 
@@ -234,22 +496,41 @@ class PathSpec(object):
 		to walk symbolic links that resolve to directories. See
 		:func:`~pathspec.util.iter_tree_files` for more information.
 
+		*negate* (:class:`bool` or :data:`None`) is whether to negate the
+		match results of the patterns. Default is :data:`None` for
+		:data:`False`.
+
+		*executor* (:class:`concurrent.futures.Executor` or :data:`None`)
+		optionally scans directories concurrently. See
+		:func:`~pathspec.util.iter_tree_entries` for more information.
+
 		Returns the matched files (:class:`~collections.abc.Iterator` of
 		:class:`.TreeEntry`).
 		"""
-		entries = util.iter_tree_entries(root, on_error=on_error, follow_links=follow_links)
-		yield from self.match_entries(entries)
+		negate = bool(negate)
+		entries = util.iter_tree_entries(
+			root,
+			on_error=on_error,
+			follow_links=follow_links,
+			prune=self._make_pruner(negate),
+			executor=executor,
+		)
+		yield from self.match_entries(entries, negate=negate)
 
 	def match_tree_files(
 		self,
 		root: StrPath,
 		on_error: Optional[Callable] = None,
 		follow_links: Optional[bool] = None,
+		negate: Optional[bool] = None,
+		executor: Optional[concurrent.futures.Executor] = None,
 	) -> Iterator[str]:
 		"""
 		Walks the specified root path for all files and matches them to this
 		path-spec.
 
+		Directories whose descendants can never be matched are not walked.
+
 		*root* (:class:`str` or :class:`os.PathLike[str]`) is the root directory
 		to search for files.
 
@@ -261,12 +542,120 @@ class PathSpec(object):
 		to walk symbolic links that resolve to directories. See
 		:func:`~pathspec.util.iter_tree_files` for more information.
 
+		*negate* (:class:`bool` or :data:`None`) is whether to negate the
+		match results of the patterns. Default is :data:`None` for
+		:data:`False`.
+
+		*executor* (:class:`concurrent.futures.Executor` or :data:`None`)
+		optionally scans directories concurrently. See
+		:func:`~pathspec.util.iter_tree_entries` for more information.
+
 		Returns the matched files (:class:`~collections.abc.Iterable` of
 		:class:`str`).
 		"""
-		files = util.iter_tree_files(root, on_error=on_error, follow_links=follow_links)
-		yield from self.match_files(files)
+		negate = bool(negate)
+		files = util.iter_tree_files(
+			root,
+			on_error=on_error,
+			follow_links=follow_links,
+			prune=self._make_pruner(negate),
+			executor=executor,
+		)
+		yield from self.match_files(files, negate=negate)
 
 	# Alias `match_tree_files()` as `match_tree()` for backward
 	# compatibility before v0.3.2.
 	match_tree = match_tree_files
+
+
+def _match_chunk(
+	match: Callable[[str], bool],
+	files: Iterable[StrPath],
+	separators: Optional[Collection[str]],
+	negate: bool,
+) -> bytes:
+	"""
+	Normalizes and matches a chunk of files for
+	:meth:`PathSpec.match_files_bulk`.
+
+	*match* (:class:`~collections.abc.Callable`) is the matcher from
+	:meth:`PathSpec._get_matcher`.
+
+	*files* (:class:`~collections.abc.Iterable` of :class:`str` or
+	:class:`os.PathLike[str]`) contains the file paths.
+
+	*separators* (:class:`~collections.abc.Collection` of :class:`str`; or
+	:data:`None`) optionally contains the path separators to normalize.
+
+	*negate* (:class:`bool`) is whether to negate the match results.
+
+	Returns the results (:class:`bytes`), one byte per file.
+	"""
+	norm_files = normalize_file_list(files, separators)
+	result = bytes(map(bool, map(match, norm_files)))
+	if negate:
+		result = result.translate(_NEGATE_TABLE)
+
+	return result
+
+
+def _dump_pattern(pattern: Pattern) -> dict:
+	"""
+	Converts the pattern for :meth:`PathSpec.dump`.
+
+	*pattern* (:class:`.Pattern`) is the pattern.
+
+	Returns the JSON data (:class:`dict`).
+	"""
+	pattern_type = type(pattern)
+	if not isinstance(pattern, RegexPattern):
+		raise TypeError(f"pattern:{pattern!r} is not a RegexPattern.")
+
+	if pattern_type is RegexPattern:
+		name = None
+	else:
+		name = next((
+			__name
+			for __name, __factory in util._registered_patterns.items()
+			if __factory is pattern_type
+		), None)
+		if name is None:
+			raise TypeError(f"pattern:{pattern!r} class is not registered.")
+
+	regex = pattern.regex
+	source = regex.pattern if regex is not None else None
+	is_bytes = isinstance(source, bytes)
+	if is_bytes:
+		source = source.decode('latin1')
+
+	return {
+		'type': name,
+		'regex': source,
+		'flags': regex.flags if regex is not None else 0,
+		'bytes': is_bytes,
+		'include': pattern.include,
+	}
+
+
+def _load_pattern(data: dict) -> RegexPattern:
+	"""
+	Rebuilds a pattern saved by :func:`._dump_pattern`.
+
+	*data* (:class:`dict`) is the JSON data.
+
+	Returns the pattern (:class:`.RegexPattern`).
+	"""
+	name = data['type']
+	pattern_type = RegexPattern if name is None else util.lookup_pattern(name)
+	if not (isinstance(pattern_type, type) and issubclass(pattern_type, RegexPattern)):
+		raise TypeError(f"pattern type:{name!r} is not a RegexPattern.")
+
+	source = data['regex']
+	if source is None:
+		return pattern_type(None)
+
+	if data['bytes']:
+		source = source.encode('latin1')
+
+	return pattern_type(re.compile(source, data['flags']), data['include'])
+
@@ -130,6 +130,7 @@ class RegexPattern(Pattern):
 			assert include is None, (
 				"include:{!r} must be null when pattern:{!r} is null."
 			).format(include, pattern)
+			regex = None
 
 		else:
 			raise TypeError("pattern:{!r} is not a string, re.Pattern, or None.".format(pattern))
@@ -4,12 +4,15 @@ derived from Rsync's wildmatch. Git uses wildmatch for its ".gitignore"
 files.
 """
 
+import functools
 import re
 import warnings
 from typing import (
 	AnyStr,
 	Optional,
-	Tuple)
+	Pattern as PatternHint,
+	Tuple,
+	Union)
 
 from .. import util
 from ..pattern import RegexPattern
@@ -25,6 +28,12 @@ The regex group name for the directory marker. This is only used by
 :class:`GitIgnoreSpec`.
 """
 
+CACHE_SIZE = 4096
+"""
+*CACHE_SIZE* (:class:`int`) is the default number of compiled patterns
+kept by the process-wide cache. See :func:`set_cache_size`.
+"""
+
 
 class GitWildMatchPatternError(ValueError):
 	"""
@@ -43,6 +52,28 @@ class GitWildMatchPattern(RegexPattern):
 	# Keep the dict-less class hierarchy.
 	__slots__ = ()
 
+	def __init__(
+		self,
+		pattern: Union[AnyStr, PatternHint, None],
+		include: Optional[bool] = None,
+	) -> None:
+		"""
+		Initializes the :class:`GitWildMatchPattern` instance. See
+		:class:`.RegexPattern`.
+
+		A pattern string is converted and compiled through a process-wide LRU
+		cache (see :func:`set_cache_size`), so the same line is only
+		translated once. Subclasses overriding :meth:`.pattern_to_regex` are
+		not cached.
+		"""
+		if isinstance(pattern, (str, bytes)) and _uses_cache(type(self)):
+			assert include is None, (
+				"include:{!r} must be null when pattern:{!r} is a string."
+			).format(include, pattern)
+			pattern, include = _compile_cached(pattern)
+
+		super(GitWildMatchPattern, self).__init__(pattern, include)
+
 	@classmethod
 	def pattern_to_regex(
 		cls,
@@ -385,6 +416,73 @@ class GitWildMatchPattern(RegexPattern):
 util.register_pattern('gitwildmatch', GitWildMatchPattern)
 
 
+def _compile(pattern: AnyStr) -> Tuple[Optional[PatternHint], Optional[bool]]:
+	"""
+	Convert and compile the pattern with :meth:`GitWildMatchPattern.pattern_to_regex`.
+
+	*pattern* (:class:`str` or :class:`bytes`) is the pattern.
+
+	Returns the compiled regular expression (:class:`re.Pattern` or
+	:data:`None`), and whether matched files should be included
+	(:data:`True`), excluded (:data:`False`), or if it is a
+	null-operation (:data:`None`).
+	"""
+	regex, include = GitWildMatchPattern.pattern_to_regex(pattern)
+	if include is not None:
+		regex = re.compile(regex)
+
+	return regex, include
+
+
+_compile_cached = functools.lru_cache(maxsize=CACHE_SIZE)(_compile)
+"""
+*_compile_cached* (:class:`~collections.abc.Callable`) is :func:`._compile`
+with the process-wide LRU cache.
+"""
+
+
+def _uses_cache(cls: type) -> bool:
+	"""
+	Get whether the pattern class converts patterns the same way as
+	:class:`GitWildMatchPattern`, so it can share the cache.
+
+	*cls* (:class:`type`) is the pattern class.
+
+	Returns whether *cls* uses the cache (:class:`bool`).
+	"""
+	return cls.pattern_to_regex.__func__ is GitWildMatchPattern.pattern_to_regex.__func__
+
+
+def cache_info() -> 'functools._CacheInfo':
+	"""
+	Get the statistics of the process-wide pattern cache.
+
+	Returns the hits, misses, maximum size and current size
+	(:func:`~collections.namedtuple`), see :func:`functools.lru_cache`.
+	"""
+	return _compile_cached.cache_info()
+
+
+def clear_cache() -> None:
+	"""
+	Empty the process-wide pattern cache.
+	"""
+	_compile_cached.cache_clear()
+
+
+def set_cache_size(maxsize: Optional[int]) -> None:
+	"""
+	Set the size of the process-wide pattern cache. This empties the cache.
+
+	*maxsize* (:class:`int` or :data:`None`) is the number of compiled
+	patterns to keep, least recently used first to go. Use :data:`0` to
+	disable the cache, or :data:`None` for no bound. The initial size is
+	:data:`CACHE_SIZE`.
+	"""
+	global _compile_cached
+	_compile_cached = functools.lru_cache(maxsize=maxsize)(_compile)
+
+
 class GitIgnorePattern(GitWildMatchPattern):
 	"""
 	The :class:`GitIgnorePattern` class is deprecated by :class:`GitWildMatchPattern`.
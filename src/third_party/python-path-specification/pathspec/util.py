@@ -2,6 +2,7 @@
 This module provides utility methods for dealing with path-specs.
 """
 
+import concurrent.futures
 import os
 import os.path
 import pathlib
@@ -9,6 +10,8 @@ import posixpath
 import stat
 import sys
 import warnings
+from collections import (
+	deque)
 from collections.abc import (
 	Collection as CollectionType,
 	Iterable as IterableType)
@@ -26,6 +29,7 @@ from typing import (
 	Optional,
 	Sequence,
 	Set,
+	Tuple,
 	Union)
 
 from .pattern import (
@@ -150,6 +154,8 @@ def iter_tree_entries(
 	root: StrPath,
 	on_error: Optional[Callable] = None,
 	follow_links: Optional[bool] = None,
+	prune: Optional[Callable[[str], bool]] = None,
+	executor: Optional[concurrent.futures.Executor] = None,
 ) -> Iterator['TreeEntry']:
 	"""
 	Walks the specified directory for all files and directories.
@@ -167,6 +173,19 @@ def iter_tree_entries(
 	to walk symbolic links that resolve to directories. Default is
 	:data:`None` for :data:`True`.
 
+	*prune* (:class:`~collections.abc.Callable` or :data:`None`)
+	optionally is called with the relative path of each directory
+	(:class:`str`) before it is scanned. If it returns :data:`True`, the
+	descendants of the directory are skipped. The directory entry itself is
+	still yielded. Default is :data:`None` to walk every directory.
+
+	*executor* (:class:`concurrent.futures.Executor` or :data:`None`)
+	optionally scans directories concurrently, which helps on network
+	file-systems where each directory listing and stat is a round trip.
+	Entries are then yielded a directory at a time in breadth-first order,
+	and *on_error* may be called from the executor's workers. Default is
+	:data:`None` to scan one directory at a time, depth-first.
+
 	Raises :exc:`RecursionError` if recursion is detected.
 
 	Returns an :class:`~collections.abc.Iterator` yielding each file or
@@ -175,10 +194,16 @@ def iter_tree_entries(
 	if on_error is not None and not callable(on_error):
 		raise TypeError(f"on_error:{on_error!r} is not callable.")
 
+	if prune is not None and not callable(prune):
+		raise TypeError(f"prune:{prune!r} is not callable.")
+
 	if follow_links is None:
 		follow_links = True
 
-	yield from _iter_tree_entries_next(os.path.abspath(root), '', {}, on_error, follow_links)
+	if executor is not None:
+		yield from _iter_tree_entries_pool(os.path.abspath(root), on_error, follow_links, prune, executor)
+	else:
+		yield from _iter_tree_entries_next(os.path.abspath(root), '', {}, on_error, follow_links, prune)
 
 
 def _iter_tree_entries_next(
@@ -187,6 +212,7 @@ def _iter_tree_entries_next(
 	memo: Dict[str, str],
 	on_error: Callable,
 	follow_links: bool,
+	prune: Optional[Callable[[str], bool]] = None,
 ) -> Iterator['TreeEntry']:
 	"""
 	Scan the directory for all descendant files.
@@ -206,6 +232,9 @@ def _iter_tree_entries_next(
 	*follow_links* (:class:`bool`) is whether to walk symbolic links that
 	resolve to directories.
 
+	*prune* (:class:`~collections.abc.Callable` or :data:`None`)
+	optionally is whether to skip the descendants of a directory.
+
 	Yields each entry (:class:`.TreeEntry`).
 	"""
 	dir_full = os.path.join(root_full, dir_rel)
@@ -219,6 +248,126 @@ def _iter_tree_entries_next(
 	else:
 		raise RecursionError(real_path=dir_real, first_path=memo[dir_real], second_path=dir_rel)
 
+	for node_entry, is_dir in _scan_dir_entries(dir_full, dir_rel, on_error, follow_links):
+		yield node_entry
+
+		if is_dir and (prune is None or not prune(node_entry.path)):
+			# Child node is a directory, recurse into it and yield its
+			# descendant files.
+			yield from _iter_tree_entries_next(root_full, node_entry.path, memo, on_error, follow_links, prune)
+
+	# NOTE: Make sure to remove the canonical (real) path of the directory
+	# from the ancestors memo once we are done with it. This allows the
+	# same directory to appear multiple times. If this is not done, the
+	# second occurrence of the directory will be incorrectly interpreted
+	# as a recursion. See <https://github.com/cpburnz/python-path-specification/pull/7>.
+	del memo[dir_real]
+
+
+def _iter_tree_entries_pool(
+	root_full: str,
+	on_error: Callable,
+	follow_links: bool,
+	prune: Optional[Callable[[str], bool]],
+	executor: concurrent.futures.Executor,
+) -> Iterator['TreeEntry']:
+	"""
+	Scan the directories under the root concurrently.
+
+	*root_full* (:class:`str`) the absolute path to the root directory.
+
+	*on_error* (:class:`~collections.abc.Callable` or :data:`None`)
+	optionally is the error handler for file-system exceptions.
+
+	*follow_links* (:class:`bool`) is whether to walk symbolic links that
+	resolve to directories.
+
+	*prune* (:class:`~collections.abc.Callable` or :data:`None`)
+	optionally is whether to skip the descendants of a directory.
+
+	*executor* (:class:`concurrent.futures.Executor`) runs the scans.
+
+	Yields each entry (:class:`.TreeEntry`).
+	"""
+	# Each pending scan keeps the real paths of its ancestors to detect
+	# recursion, as there is no single depth-first path to remember.
+	pending = deque([(executor.submit(_scan_dir, root_full, '', on_error, follow_links), '', {})])
+	try:
+		while pending:
+			future, dir_rel, ancestors = pending.popleft()
+			dir_real, dir_entries = future.result()
+			if dir_real in ancestors:
+				raise RecursionError(real_path=dir_real, first_path=ancestors[dir_real], second_path=dir_rel)
+
+			ancestors = {**ancestors, dir_real: dir_rel}
+			for node_entry, is_dir in dir_entries:
+				if is_dir and (prune is None or not prune(node_entry.path)):
+					future = executor.submit(_scan_dir, root_full, node_entry.path, on_error, follow_links)
+					pending.append((future, node_entry.path, ancestors))
+
+			for node_entry, _ in dir_entries:
+				yield node_entry
+
+	finally:
+		for future, _, _ in pending:
+			future.cancel()
+
+
+def _scan_dir(
+	root_full: str,
+	dir_rel: str,
+	on_error: Optional[Callable] = None,
+	follow_links: bool = True,
+) -> Tuple[str, List[Tuple['TreeEntry', bool]]]:
+	"""
+	Scan one directory in full.
+
+	*root_full* (:class:`str`) the absolute path to the root directory.
+
+	*dir_rel* (:class:`str`) the path to the directory to scan relative to
+	*root_full*.
+
+	*on_error* (:class:`~collections.abc.Callable` or :data:`None`)
+	optionally is the error handler for file-system exceptions.
+
+	*follow_links* (:class:`bool`) is whether to walk symbolic links that
+	resolve to directories.
+
+	Returns the real path of the directory (:class:`str`), and its entries
+	(:class:`list` of :class:`tuple`), see :func:`._scan_dir_entries`.
+	"""
+	dir_full = os.path.join(root_full, dir_rel)
+	dir_real = os.path.realpath(dir_full)
+	return dir_real, list(_scan_dir_entries(dir_full, dir_rel, on_error, follow_links))
+
+
+def _scan_dir_entries(
+	dir_full: str,
+	dir_rel: str,
+	on_error: Optional[Callable],
+	follow_links: bool,
+) -> Iterator[Tuple['TreeEntry', bool]]:
+	"""
+	Scan the direct children of the directory.
+
+	The stat results come from the :class:`os.DirEntry` instances, which
+	cache them and, on most platforms, know the entry type without a stat
+	call.
+
+	*dir_full* (:class:`str`) is the absolute path to the directory.
+
+	*dir_rel* (:class:`str`) is the path to the directory relative to the
+	root.
+
+	*on_error* (:class:`~collections.abc.Callable` or :data:`None`)
+	optionally is the error handler for file-system exceptions.
+
+	*follow_links* (:class:`bool`) is whether to walk symbolic links that
+	resolve to directories.
+
+	Yields each entry (:class:`.TreeEntry`) and whether it is a directory
+	to descend into (:class:`bool`).
+	"""
 	with os.scandir(dir_full) as scan_iter:
 		node_ent: os.DirEntry
 		for node_ent in scan_iter:
@@ -244,28 +393,20 @@ def _iter_tree_entries_next(
 				node_stat = node_lstat
 
 			if node_ent.is_dir(follow_symlinks=follow_links):
-				# Child node is a directory, recurse into it and yield its
-				# descendant files.
-				yield TreeEntry(node_ent.name, node_rel, node_lstat, node_stat)
-
-				yield from _iter_tree_entries_next(root_full, node_rel, memo, on_error, follow_links)
+				# Child node is a directory.
+				yield TreeEntry(node_ent.name, node_rel, node_lstat, node_stat), True
 
 			elif node_ent.is_file() or node_ent.is_symlink():
 				# Child node is either a file or an unfollowed link, yield it.
-				yield TreeEntry(node_ent.name, node_rel, node_lstat, node_stat)
-
-	# NOTE: Make sure to remove the canonical (real) path of the directory
-	# from the ancestors memo once we are done with it. This allows the
-	# same directory to appear multiple times. If this is not done, the
-	# second occurrence of the directory will be incorrectly interpreted
-	# as a recursion. See <https://github.com/cpburnz/python-path-specification/pull/7>.
-	del memo[dir_real]
+				yield TreeEntry(node_ent.name, node_rel, node_lstat, node_stat), False
 
 
 def iter_tree_files(
 	root: StrPath,
 	on_error: Optional[Callable] = None,
 	follow_links: Optional[bool] = None,
+	prune: Optional[Callable[[str], bool]] = None,
+	executor: Optional[concurrent.futures.Executor] = None,
 ) -> Iterator[str]:
 	"""
 	Walks the specified directory for all files.
@@ -283,12 +424,27 @@ def iter_tree_files(
 	to walk symbolic links that resolve to directories. Default is
 	:data:`None` for :data:`True`.
 
+	*prune* (:class:`~collections.abc.Callable` or :data:`None`)
+	optionally is whether to skip the descendants of a directory. See
+	:func:`.iter_tree_entries` for more information.
+
+	*executor* (:class:`concurrent.futures.Executor` or :data:`None`)
+	optionally scans directories concurrently. See :func:`.iter_tree_entries`
+	for more information.
+
 	Raises :exc:`RecursionError` if recursion is detected.
 
 	Returns an :class:`~collections.abc.Iterator` yielding the path to
 	each file (:class:`str`) relative to *root*.
 	"""
-	for entry in iter_tree_entries(root, on_error=on_error, follow_links=follow_links):
+	entries = iter_tree_entries(
+		root,
+		on_error=on_error,
+		follow_links=follow_links,
+		prune=prune,
+		executor=executor,
+	)
+	for entry in entries:
 		if not entry.is_dir(follow_links):
 			yield entry.path
 
@@ -410,6 +566,50 @@ def normalize_file(
 	return norm_file
 
 
+def normalize_file_list(
+	files: Iterable[StrPath],
+	separators: Optional[Collection[str]] = None,
+) -> List[str]:
+	"""
+	Normalizes the file paths the same way as :func:`normalize_file`, but
+	replaces the path separators across the whole batch at once.
+
+	*files* (:class:`~collections.abc.Iterable` of :class:`str` or
+	:class:`os.PathLike[str]`) contains the file paths to be normalized.
+
+	*separators* (:class:`~collections.abc.Collection` of :class:`str`; or
+	:data:`None`) optionally contains the path separators to normalize.
+	See :func:`normalize_file` for more information.
+
+	Returns the normalized file paths (:class:`list` of :class:`str`) in the
+	order of *files*.
+	"""
+	if separators is None:
+		separators = NORMALIZE_PATH_SEPS
+
+	norm_files: List[str] = list(map(os.fspath, files))
+	separators = [__sep for __sep in separators if __sep != posixpath.sep]
+	if separators and norm_files:
+		# Join the paths with NUL, which cannot occur in a path, so each
+		# separator is replaced with a single call. Fall back to per-path
+		# replacement if a path or separator contains it anyway.
+		joined = '\0'.join(norm_files)
+		if joined.count('\0') == len(norm_files) - 1 and not any('\0' in __sep for __sep in separators):
+			for sep in separators:
+				joined = joined.replace(sep, posixpath.sep)
+			norm_files = joined.split('\0')
+		else:
+			for sep in separators:
+				norm_files = [__file.replace(sep, posixpath.sep) for __file in norm_files]
+
+	return [
+		__file[1:] if __file.startswith('/') else
+		__file[2:] if __file.startswith('./') else
+		__file
+		for __file in norm_files
+	]
+
+
 def normalize_files(
 	files: Iterable[StrPath],
 	separators: Optional[Collection[str]] = None,
@@ -0,0 +1,267 @@
+"""
+This script tests :class:`.CompiledPatterns`.
+"""
+
+import itertools
+import re
+import unittest
+
+from pathspec import (
+	GitIgnoreSpec,
+	PathSpec)
+from pathspec.compiled import (
+	CompiledPatterns,
+	anchored_prefix,
+	covers_dir,
+	required_literal)
+from pathspec.pattern import (
+	RegexPattern)
+from pathspec.util import (
+	match_file)
+
+LINES = [
+	'*.txt',
+	'!keep.txt',
+	'build/',
+	'!build/keep/',
+	'/dist',
+	'**/cache',
+	'node_modules/',
+	'!**/node_modules/pkg/*.txt',
+	'a?c',
+	'[ab]*.py',
+	'docs/**/*.md',
+	'!docs/index.md',
+	'*',
+	'!*/',
+]
+
+FILES = [
+	'a.txt',
+	'abc',
+	'b.py',
+	'build/a.txt',
+	'build/keep/a.txt',
+	'build/keep/b.bin',
+	'c.py',
+	'dist',
+	'dist/a.bin',
+	'docs/a/b.md',
+	'docs/index.md',
+	'keep.txt',
+	'node_modules/pkg/a.txt',
+	'node_modules/pkg/b.js',
+	'src/cache',
+	'src/cache/a.bin',
+	'src/dist/a.bin',
+	'src/keep.txt',
+]
+
+DIRS = sorted({
+	file.rsplit('/', depth)[0]
+	for file in FILES
+	for depth in range(1, file.count('/') + 1)
+})
+
+
+class CompiledPatternsTest(unittest.TestCase):
+	"""
+	The :class:`CompiledPatternsTest` class tests the :class:`.CompiledPatterns`
+	class.
+	"""
+
+	def test_01_required_literal(self):
+		"""
+		Test finding the literal required by a regular expression.
+		"""
+		self.assertEqual(required_literal(r'^(?:.+/)?[^/]*\.txt(?:(?P<ps_d>/).*)?$'), '.txt')
+		self.assertEqual(required_literal(r'^(?:.+/)?node_modules(?P<ps_d>/).*$'), 'node_modules')
+		self.assertEqual(required_literal(r'abc(?:d|e)fg'), 'abc')
+		self.assertEqual(required_literal(r'x?yz'), 'yz')
+		self.assertEqual(required_literal(r'ab{1,3}cd'), 'cd')
+		self.assertEqual(required_literal(r'\d+abc'), 'abc')
+		self.assertIsNone(required_literal(r'abc|def'))
+		self.assertIsNone(required_literal(r'.*'))
+
+	def test_01_required_literal_escapes(self):
+		"""
+		Test that the operands of alphanumeric escapes are not taken as
+		literals.
+		"""
+		self.assertEqual(required_literal(r'^\x41bc'), 'bc')
+		self.assertEqual(required_literal(r'^\u0041bc'), 'bc')
+		self.assertEqual(required_literal(r'^\U00000041bc'), 'bc')
+		self.assertEqual(required_literal(r'^\N{LATIN CAPITAL LETTER A}bc'), 'bc')
+		self.assertEqual(required_literal(r'^\101bc'), 'bc')
+		self.assertEqual(required_literal(r'^(a)x\1yz'), 'yz')
+
+		for regex, file in [
+			(r'^\x41bc', 'Abc'),
+			(r'^\u0041bc', 'Abc'),
+			(r'^\N{LATIN CAPITAL LETTER A}bc', 'Abc'),
+			(r'^\101bc', 'Abc'),
+			(r'^(ab)\1cd', 'ababcd'),
+		]:
+			with self.subTest(regex=regex):
+				patterns = [RegexPattern(regex)]
+				self.assertTrue(CompiledPatterns(patterns).match_file(file))
+				self.assertTrue(PathSpec(patterns).match_file(file))
+
+	def test_01_anchored_prefix(self):
+		"""
+		Test finding the literal prefix of an anchored regular expression.
+		"""
+		self.assertEqual(anchored_prefix(r'^foo/bar'), 'foo/bar')
+		self.assertEqual(anchored_prefix(r'^foo/b?ar'), 'foo/')
+		self.assertEqual(anchored_prefix(r'^(?:a|b)c'), '')
+		self.assertEqual(anchored_prefix(r'^foo[|]'), 'foo')
+		self.assertIsNone(anchored_prefix(r'foo'))
+		self.assertIsNone(anchored_prefix(r'^foo|^bar/'))
+		self.assertIsNone(anchored_prefix(r'^foo(?:x)|bar'))
+
+	def test_02_path_spec(self):
+		"""
+		Test that every subset of the patterns gives the same results as the
+		per-pattern loop.
+		"""
+		for size in (1, 2, 3, len(LINES)):
+			for lines in itertools.combinations(LINES, size):
+				spec = PathSpec.from_lines('gitwildmatch', lines)
+				compiled = CompiledPatterns(spec.patterns)
+				for file in FILES:
+					with self.subTest(lines=lines, file=file):
+						self.assertEqual(
+							compiled.match_file(file),
+							bool(match_file(spec.patterns, file)),
+						)
+
+	def test_02_git_ignore_spec(self):
+		"""
+		Test that the compiled matcher keeps the directory priority of
+		:class:`.GitIgnoreSpec`.
+		"""
+		for size in (1, 2, 3, len(LINES)):
+			for lines in itertools.combinations(LINES, size):
+				spec = GitIgnoreSpec.from_lines(lines)
+				compiled = CompiledPatterns(spec.patterns)
+				for file in FILES:
+					with self.subTest(lines=lines, file=file):
+						self.assertEqual(
+							GitIgnoreSpec._match_compiled(compiled, file),
+							bool(GitIgnoreSpec._match_file(spec.patterns, file)),
+						)
+
+	def test_03_unindexable_patterns(self):
+		"""
+		Test that patterns without a usable literal are always tried.
+		"""
+		patterns = [
+			RegexPattern(re.compile('ABC', re.IGNORECASE), include=True),
+			RegexPattern(re.compile('x|y'), include=True),
+			RegexPattern('^foo'),
+			RegexPattern(re.compile('^foo/bar'), include=False),
+		]
+		compiled = CompiledPatterns(patterns)
+		self.assertTrue(compiled.match_file('abc'))
+		self.assertTrue(compiled.match_file('y'))
+		self.assertTrue(compiled.match_file('foo/baz'))
+		self.assertFalse(compiled.match_file('foo/bar'))
+		self.assertFalse(compiled.match_file('zzz'))
+
+	def test_04_last_match_stop(self):
+		"""
+		Test limiting the search to the patterns before an index.
+		"""
+		spec = PathSpec.from_lines('gitwildmatch', ['*.txt', 'a.*', '!a.txt'])
+		compiled = CompiledPatterns(spec.patterns)
+		self.assertEqual(compiled.last_match('a.txt')[0], 2)
+		self.assertEqual(compiled.last_match('a.txt', 2)[0], 1)
+		self.assertEqual(compiled.last_match('a.txt', 1)[0], 0)
+		self.assertIsNone(compiled.last_match('a.txt', 0))
+
+	def test_05_matcher_rebuilt(self):
+		"""
+		Test that the cached matcher of a path-spec follows its patterns.
+		"""
+		spec = PathSpec.from_lines('gitwildmatch', ['*.txt'])
+		self.assertTrue(spec.match_file('a.txt'))
+		self.assertFalse(spec.match_file('a.bin'))
+
+		spec += PathSpec.from_lines('gitwildmatch', ['*.bin', '!a.txt'])
+		self.assertFalse(spec.match_file('a.txt'))
+		self.assertTrue(spec.match_file('a.bin'))
+
+		spec.patterns[-1] = RegexPattern('^a\\.txt$')
+		self.assertTrue(spec.match_file('a.txt'))
+
+	def test_06_custom_match_file(self):
+		"""
+		Test that a subclass overriding `_match_file()` still has it called.
+		"""
+		calls = []
+
+		class CustomSpec(PathSpec):
+			def _match_file(self, patterns, file):
+				calls.append(file)
+				return match_file(patterns, file)
+
+		spec = CustomSpec.from_lines('gitwildmatch', ['*.txt'])
+		self.assertEqual(list(spec.match_files(['a.txt', 'b.bin'])), ['a.txt'])
+		self.assertEqual(calls, ['a.txt', 'b.bin'])
+
+	def test_07_covers_dir(self):
+		"""
+		Test finding the patterns that match everything below a directory.
+		"""
+		def covers(line, dir):
+			return covers_dir(PathSpec.from_lines('gitwildmatch', [line]).patterns[0], dir)
+
+		self.assertTrue(covers('build/', 'build'))
+		self.assertTrue(covers('build/', 'src/build'))
+		self.assertTrue(covers('build/', 'build/x'))
+		self.assertTrue(covers('/build', 'build'))
+		self.assertTrue(covers('build/**', 'build/x'))
+		self.assertFalse(covers('/build', 'src/build'))
+		self.assertFalse(covers('build/', 'builds'))
+		self.assertFalse(covers('*.txt', 'build'))
+		self.assertFalse(covers('build/*.txt', 'build'))
+
+	def test_08_match_subtree(self):
+		"""
+		Test that a directory's subtree result agrees with every file below
+		it.
+		"""
+		for spec_class in (PathSpec, GitIgnoreSpec):
+			for size in (1, 2, 3, len(LINES)):
+				for lines in itertools.combinations(LINES, size):
+					spec = spec_class.from_lines('gitwildmatch', lines)
+					for dir in DIRS:
+						result = spec._match_subtree(dir)
+						if result is None:
+							continue
+
+						for file in FILES:
+							if file.startswith(f'{dir}/'):
+								with self.subTest(cls=spec_class, lines=lines, dir=dir, file=file):
+									self.assertEqual(spec.match_file(file), result)
+
+	def test_08_match_subtree_decided(self):
+		"""
+		Test that common directory patterns decide their subtrees.
+		"""
+		spec = PathSpec.from_lines('gitwildmatch', ['*.txt', 'build/', '!build/keep/'])
+		self.assertTrue(spec._match_subtree('build/keep/x') is False)
+		self.assertIsNone(spec._match_subtree('build'))
+		self.assertIsNone(spec._match_subtree('src'))
+
+		spec = PathSpec.from_lines('gitwildmatch', ['/src/*.py'])
+		self.assertTrue(spec._match_subtree('docs') is False)
+		self.assertIsNone(spec._match_subtree('src'))
+
+		spec = GitIgnoreSpec.from_lines(['node_modules/'])
+		self.assertTrue(spec._match_subtree('node_modules'))
+		self.assertIsNone(spec._match_subtree('src'))
+
+		spec = GitIgnoreSpec.from_lines(['*', '!/src/**'])
+		self.assertTrue(spec._match_subtree('docs'))
+		self.assertIsNone(spec._match_subtree('src'))
@@ -7,10 +7,14 @@ import unittest
 
 import pathspec.patterns.gitwildmatch
 from pathspec.patterns.gitwildmatch import (
+	CACHE_SIZE,
 	GitWildMatchPattern,
 	GitWildMatchPatternError,
 	_BYTES_ENCODING,
-	_DIR_MARK)
+	_DIR_MARK,
+	cache_info,
+	clear_cache,
+	set_cache_size)
 from pathspec.util import (
 	lookup_pattern)
 
@@ -811,3 +815,54 @@ class GitWildMatchTest(unittest.TestCase):
 			"adc",
 		]))
 		self.assertEqual(results, {"abc", "adc"})
+
+	def test_14_cache(self):
+		"""
+		Test that compiled patterns are reused from the cache.
+		"""
+		self.addCleanup(set_cache_size, CACHE_SIZE)
+		set_cache_size(2)
+
+		first = GitWildMatchPattern('*.txt')
+		second = GitWildMatchPattern('*.txt')
+		self.assertIs(first.regex, second.regex)
+		self.assertEqual(first.include, second.include)
+		self.assertEqual(cache_info().hits, 1)
+
+		null = GitWildMatchPattern('# comment')
+		self.assertIsNone(null.include)
+		self.assertIsNone(null.regex)
+
+		# Evict "*.txt" as least recently used.
+		GitWildMatchPattern(b'*.txt')
+		self.assertEqual(cache_info().currsize, 2)
+		misses = cache_info().misses
+		GitWildMatchPattern('*.txt')
+		self.assertEqual(cache_info().misses, misses + 1)
+
+		clear_cache()
+		self.assertEqual(cache_info().currsize, 0)
+
+		set_cache_size(0)
+		GitWildMatchPattern('*.txt')
+		GitWildMatchPattern('*.txt')
+		self.assertEqual(cache_info().hits, 0)
+
+	def test_14_cache_subclass(self):
+		"""
+		Test that subclasses overriding the conversion are not cached.
+		"""
+		calls = []
+
+		class CustomPattern(GitWildMatchPattern):
+			@classmethod
+			def pattern_to_regex(cls, pattern):
+				calls.append(pattern)
+				return super().pattern_to_regex(pattern.upper())
+
+		pattern = CustomPattern('*.txt')
+		CustomPattern('*.txt')
+		self.assertEqual(calls, ['*.txt', '*.txt'])
+		self.assertIsNotNone(pattern.match_file('a.TXT'))
+		self.assertIsNone(GitWildMatchPattern('*.txt').match_file('a.TXT'))
+
@@ -2,9 +2,11 @@
 This script tests :class:`.PathSpec`.
 """
 
+import concurrent.futures
 import os
 import os.path
 import pathlib
+import re
 import shutil
 import tempfile
 import unittest
@@ -12,7 +14,10 @@ from typing import (
 	Iterable)
 
 from pathspec import (
-	PathSpec)
+	GitIgnoreSpec,
+	PathSpec,
+	RegexPattern,
+	util)
 from pathspec.util import (
 	iter_tree_entries)
 from pathspec.patterns.gitwildmatch import GitWildMatchPatternError
@@ -167,6 +172,59 @@ class PathSpecTest(unittest.TestCase):
 		multi_results = set(spec.match_files(test_files))
 		self.assertEqual(single_results, multi_results)
 
+	def test_01_match_files_bulk(self):
+		"""
+		Tests that matching files in bulk gives the same results as matching
+		them one at a time.
+		"""
+		spec = PathSpec.from_lines('gitwildmatch', [
+			'*.txt',
+			'!test1/',
+		])
+		test_files = [
+			'src/test1/a.txt',
+			'src\\test1\\b.txt',
+			'./src/test1/c/c.txt',
+			'src/test2/a.txt',
+			'/src/test2/b.bin',
+			'src\\test2\\c\\c.txt',
+		]
+		separators = ['\\']
+		expected = bytearray(
+			spec.match_file(__file, separators) for __file in test_files
+		)
+		self.assertEqual(spec.match_files_bulk(test_files, separators), expected)
+		self.assertEqual(
+			spec.match_files_bulk(iter(test_files), separators, negate=True),
+			bytearray(1 - __result for __result in expected),
+		)
+
+		out = bytearray(b'\xff' * 10)
+		result = spec.match_files_bulk(test_files, separators, out=out)
+		self.assertIs(result, out)
+		self.assertEqual(out, expected + b'\xff' * 4)
+
+		with self.assertRaises(ValueError):
+			spec.match_files_bulk(test_files, out=bytearray(2))
+
+	def test_01_match_files_bulk_executor(self):
+		"""
+		Tests matching files in bulk with chunks run by an executor.
+		"""
+		spec = PathSpec.from_lines('gitwildmatch', [
+			'*.txt',
+			'!b.txt',
+		])
+		test_files = [f'dir{__i}/{"ab"[__i % 2]}.txt' for __i in range(25)]
+		expected = spec.match_files_bulk(test_files)
+		self.assertEqual(expected.count(1), 13)
+		with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+			for chunk_size in (1, 4, 25, 100):
+				with self.subTest(chunk_size=chunk_size):
+					self.assertEqual(spec.match_files_bulk(
+						test_files, executor=executor, chunk_size=chunk_size,
+					), expected)
+
 	def test_01_windows_current_dir_paths(self):
 		"""
 		Tests that paths referencing the current directory will be properly
@@ -442,6 +500,143 @@ class PathSpecTest(unittest.TestCase):
 			'Y/Z/c.txt',
 		])))
 
+	def test_05_match_tree_pruned(self):
+		"""
+		Test that matching a file tree does not walk directories whose
+		descendants are all excluded, and that the results are unchanged.
+		"""
+		spec = PathSpec.from_lines('gitwildmatch', [
+			'*',
+			'!node_modules/',
+			'!/docs/*.md',
+		])
+		self.make_dirs([
+			'docs',
+			'docs/api',
+			'node_modules',
+			'node_modules/pkg',
+			'src',
+		])
+		self.make_files([
+			'a.txt',
+			'docs/a.md',
+			'docs/api/b.md',
+			'node_modules/pkg/c.js',
+			'src/d.py',
+		])
+		walked = []
+		scan_dir_entries = util._scan_dir_entries
+
+		def record(dir_full, dir_rel, *args):
+			walked.append(dir_rel)
+			return scan_dir_entries(dir_full, dir_rel, *args)
+
+		util._scan_dir_entries = record
+		try:
+			results = set(spec.match_tree_files(self.temp_dir))
+		finally:
+			util._scan_dir_entries = scan_dir_entries
+
+		self.assertEqual(results, set(map(ospath, [
+			'a.txt',
+			'docs/api/b.md',
+			'src/d.py',
+		])))
+		self.assertNotIn(ospath('node_modules'), walked)
+		self.assertNotIn(ospath('node_modules/pkg'), walked)
+
+		results = set(spec.match_tree_files(self.temp_dir, negate=True))
+		self.assertEqual(results, set(map(ospath, [
+			'docs/a.md',
+			'node_modules/pkg/c.js',
+		])))
+
+	def test_05_match_tree_pruned_alternation(self):
+		"""
+		Test that a regular expression with a top-level alternation does not
+		prune the directories matched by its other branches.
+		"""
+		spec = PathSpec([RegexPattern('^foo|^bar/')])
+		self.make_dirs([
+			'bar',
+			'baz',
+			'foo',
+		])
+		self.make_files([
+			'bar/x',
+			'baz/y',
+			'foo/z',
+		])
+		expected = set(spec.match_files(['bar/x', 'baz/y', 'foo/z']))
+		results = set(spec.match_tree_files(self.temp_dir))
+		self.assertEqual(expected, {'bar/x', 'foo/z'})
+		self.assertEqual(results, set(map(ospath, expected)))
+
+	def test_05_match_tree_executor(self):
+		"""
+		Test matching a file tree while scanning directories with an
+		executor.
+		"""
+		spec = PathSpec.from_lines('gitwildmatch', [
+			'*.txt',
+			'!b.txt',
+		])
+		self.make_dirs([
+			'X',
+			'X/Z',
+			'Y',
+		])
+		self.make_files([
+			'X/a.txt',
+			'X/b.txt',
+			'X/Z/c.txt',
+			'Y/a.txt',
+		])
+		with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+			results = set(spec.match_tree_files(self.temp_dir, executor=executor))
+
+		self.assertEqual(results, set(map(ospath, [
+			'X/a.txt',
+			'X/Z/c.txt',
+			'Y/a.txt',
+		])))
+
+	def test_05_dump_load(self):
+		"""
+		Test saving and loading the compiled patterns of a path-spec.
+		"""
+		file = self.temp_dir / 'spec.json'
+		for spec in [
+			PathSpec.from_lines('gitwildmatch', ['# comment', '*.txt', '!b.txt', 'build/']),
+			PathSpec.from_lines('gitwildmatch', [b'*.txt', b'!\xe9.txt']),
+			PathSpec([RegexPattern('^a'), RegexPattern(re.compile('B', re.IGNORECASE), False)]),
+		]:
+			with self.subTest(spec=spec):
+				spec.dump(file)
+				loaded = PathSpec.load(file)
+				self.assertEqual(loaded, spec)
+				self.assertEqual(
+					[type(__pattern) for __pattern in loaded.patterns],
+					[type(__pattern) for __pattern in spec.patterns],
+				)
+
+		spec = GitIgnoreSpec.from_lines(['*', '!/src/'])
+		spec.dump(file)
+		loaded = GitIgnoreSpec.load(file)
+		self.assertIsInstance(loaded, GitIgnoreSpec)
+		self.assertEqual(loaded, spec)
+
+	def test_05_dump_unregistered(self):
+		"""
+		Test that patterns of unregistered classes cannot be saved.
+		"""
+		class CustomPattern(RegexPattern):
+			pass
+
+		spec = PathSpec([CustomPattern('^a')])
+		with self.assertRaises(TypeError):
+			spec.dump(self.temp_dir / 'spec.json')
+
 	def test_06_issue_41_a(self):
 		"""
 		Test including a file and excluding a directory with the same name
@@ -2,6 +2,7 @@
 This script tests utility functions.
 """
 
+import concurrent.futures
 import errno
 import os
 import os.path
@@ -22,7 +23,8 @@ from pathspec.util import (
 	iter_tree_entries,
 	iter_tree_files,
 	match_file,
-	normalize_file)
+	normalize_file,
+	normalize_file_list)
 from tests.util import (
 	make_dirs,
 	make_files,
@@ -402,6 +404,105 @@ class IterTreeTest(unittest.TestCase):
 			'Empty',
 		])))
 
+	def test_3_1_prune(self):
+		"""
+		Tests that pruned directories are yielded but not walked.
+		"""
+		self.make_dirs([
+			'Dir',
+			'Dir/Inner',
+			'Skip',
+			'Skip/Inner',
+		])
+		self.make_files([
+			'a',
+			'Dir/b',
+			'Dir/Inner/c',
+			'Skip/d',
+			'Skip/Inner/e',
+		])
+		pruned = []
+
+		def prune(path):
+			pruned.append(path)
+			return path == 'Skip'
+
+		results = {entry.path for entry in iter_tree_entries(self.temp_dir, prune=prune)}
+		self.assertEqual(results, set(map(ospath, [
+			'a',
+			'Dir',
+			'Dir/b',
+			'Dir/Inner',
+			'Dir/Inner/c',
+			'Skip',
+		])))
+		self.assertEqual(set(pruned), set(map(ospath, [
+			'Dir',
+			'Dir/Inner',
+			'Skip',
+		])))
+
+	def test_3_2_executor(self):
+		"""
+		Tests that scanning directories with an executor finds the same
+		entries.
+		"""
+		self.make_dirs([
+			'Empty',
+			'Dir',
+			'Dir/Inner',
+			'Skip',
+		])
+		self.make_files([
+			'a',
+			'Dir/b',
+			'Dir/Inner/c',
+			'Dir/Inner/d',
+			'Skip/e',
+		])
+		with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+			results = {
+				entry.path
+				for entry in iter_tree_entries(self.temp_dir, executor=executor)
+			}
+			self.assertEqual(results, {
+				entry.path for entry in iter_tree_entries(self.temp_dir)
+			})
+
+			results = set(iter_tree_files(
+				self.temp_dir,
+				prune=lambda path: path == 'Skip',
+				executor=executor,
+			))
+			self.assertEqual(results, set(map(ospath, [
+				'a',
+				'Dir/b',
+				'Dir/Inner/c',
+				'Dir/Inner/d',
+			])))
+
+	def test_3_3_executor_recursive_links(self):
+		"""
+		Tests detection of recursive links when scanning with an executor.
+		"""
+		self.require_symlink()
+		self.require_realpath()
+		self.make_dirs([
+			'Dir',
+		])
+		self.make_files([
+			'Dir/file',
+		])
+		self.make_links([
+			('Dir/Self', 'Dir'),
+		])
+		with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+			with self.assertRaises(RecursionError) as context:
+				set(iter_tree_files(self.temp_dir, executor=executor))
+
+		self.assertEqual(context.exception.first_path, 'Dir')
+		self.assertEqual(context.exception.second_path, ospath('Dir/Self'))
+
 	def test_4_normalizing_pathlib_path(self):
 		"""
 		Tests normalizing a :class:`pathlib.PurePath` as argument.
@@ -409,3 +510,29 @@ class IterTreeTest(unittest.TestCase):
 		first_spec = normalize_file(pathlib.PurePath('a.txt'))
 		second_spec = normalize_file('a.txt')
 		self.assertEqual(first_spec, second_spec)
+
+	def test_4_normalize_file_list(self):
+		"""
+		Tests that normalizing a batch of paths gives the same results as
+		normalizing each path.
+		"""
+		files = [
+			'a.txt',
+			'/a.txt',
+			'./a.txt',
+			'.\\a.txt',
+			'\\dir\\a.txt',
+			'dir\\sub/a.txt',
+			pathlib.PurePath('dir/a.txt'),
+			'',
+		]
+		for separators in (None, (), ['\\'], ['\\', '/'], [':']):
+			with self.subTest(separators=separators):
+				self.assertEqual(normalize_file_list(files, separators), [
+					normalize_file(__file, separators) for __file in files
+				])
+
+		with self.subTest("NUL in path"):
+			files = ['a\0b\\c', 'd\\e']
+			self.assertEqual(normalize_file_list(files, ['\\']), ['a\0b/c', 'd/e'])
+
@@ -7,16 +7,18 @@ from google.cloud import speech
 def transcribe_audio_gcs(
     gcs_uri: str,
     model: str,
+    encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
 ) -> speech.RecognizeResponse:
     """Transcribe the given audio file asynchronously with
-    the selected model."""
+    the selected model. Pass AudioEncoding.FLAC for the files written by
+    VidExtract.extract_audio_only."""
 
     client = speech.SpeechClient()
 
     audio = speech.RecognitionAudio(uri=gcs_uri)
 
     config = speech.RecognitionConfig(
-        encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
+        encoding=encoding,
         sample_rate_hertz=16000,
         language_code="en-US",
         model=model,
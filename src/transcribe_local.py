@@ -0,0 +1,137 @@
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+import numpy as np
+
+from transcribe_long import SAMPLE_RATE, TranscriptionOrchestrator, split_at_silence
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+
+DEEP_SPEECH_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "models", "research", "deep_speech"
+)
+MODEL_DIR = os.environ.get("DEEP_SPEECH_MODEL_DIR", "/tmp/deep_speech_model/")
+PROCESSES = os.cpu_count() or 1
+BATCH_SIZE = 16  # windows per session run
+WINDOW_SECONDS = 15  # DeepSpeech2 is trained on utterances of up to ~20 s
+MIN_WINDOW_SECONDS = 5
+POLL_INTERVAL = 1.0  # seconds
+
+_engine = None
+
+
+def _load_engine(model_dir: str, num_threads: int):
+    """
+    Worker initializer: restore the model once per process.
+    """
+    global _engine
+    sys.path.insert(0, DEEP_SPEECH_DIR)
+    from inference import DeepSpeechInference
+
+    _engine = DeepSpeechInference(model_dir, num_threads=num_threads)
+
+
+def _transcribe(samples: np.ndarray, sample_rate: int, batch_size: int):
+    """
+    Transcribe one segment in a worker process.
+
+    The segment is cut at silences into windows the model handles well and
+    the windows are run in batches.
+
+    Returns:
+        tuple: (results, audio seconds, processing seconds), results as
+            (start, end, transcript) from the start of the segment.
+    """
+    started = time.perf_counter()
+    windows = split_at_silence(
+        samples,
+        sample_rate,
+        max_seconds=WINDOW_SECONDS,
+        min_seconds=MIN_WINDOW_SECONDS,
+    )
+    waveforms = [samples[start:end] / 32768.0 for start, end in windows]
+    transcripts = _engine.predict(waveforms, batch_size=batch_size)
+    results = [
+        (start / sample_rate, end / sample_rate, transcript.strip())
+        for (start, end), transcript in zip(windows, transcripts)
+    ]
+    return results, len(samples) / sample_rate, time.perf_counter() - started
+
+
+class LocalSpeechBackend:
+    """
+    Offline SpeechBackend running the vendored DeepSpeech2 model on CPU.
+
+    Segments are transcribed in a pool of worker processes, each holding
+    its own copy of the model with the CPU threads split between them. The
+    realtime factor (processing time / audio time) of every segment is
+    logged and kept in `stats`.
+    """
+
+    def __init__(
+        self,
+        model_dir: str = MODEL_DIR,
+        processes: int = PROCESSES,
+        batch_size: int = BATCH_SIZE,
+    ):
+        self.batch_size = batch_size
+        self.stats = []
+        threads = max(1, (os.cpu_count() or 1) // processes)
+        self.pool = ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_load_engine,
+            initargs=(model_dir, threads),
+        )
+
+    def submit(self, content: bytes, sample_rate: int):
+        samples = np.frombuffer(content, dtype=np.int16)
+        return self.pool.submit(_transcribe, samples, sample_rate, self.batch_size)
+
+    def poll(self, handle):
+        if not handle.done():
+            return None
+        results, seconds, elapsed = handle.result()
+        rtf = elapsed / seconds if seconds else 0.0
+        self.stats.append({"seconds": seconds, "elapsed": elapsed, "rtf": rtf})
+        logging.info(
+            f"Transcribed {seconds:.1f} s of audio in {elapsed:.1f} s (RTF {rtf:.2f})"
+        )
+        return results
+
+    def close(self):
+        self.pool.shutdown()
+
+
+def transcribe_local(
+    source: str,
+    audio_id: Optional[str] = None,
+    model_dir: str = MODEL_DIR,
+    processes: int = PROCESSES,
+    batch_size: int = BATCH_SIZE,
+) -> dict:
+    """
+    Transcribe a local audio file or gs:// object without the Speech API.
+
+    Uses the checkpointing TranscriptionOrchestrator with no request quota
+    and one segment in flight per worker process.
+    """
+    backend = LocalSpeechBackend(model_dir, processes, batch_size)
+    try:
+        orchestrator = TranscriptionOrchestrator(
+            backend=backend,
+            sample_rate=SAMPLE_RATE,
+            max_concurrent=processes,
+            requests_per_minute=float("inf"),
+            poll_interval=POLL_INTERVAL,
+        )
+        return orchestrator.transcribe(source, audio_id)
+    finally:
+        backend.close()
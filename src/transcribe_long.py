@@ -0,0 +1,414 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import subprocess
+import threading
+import time
+from typing import Optional, Protocol
+
+import numpy as np
+from google.cloud import speech
+
+from async_utils import run_blocking
+from store_gcs import get_store
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+
+SAMPLE_RATE = 16000
+LANGUAGE_CODE = "en-US"
+MODEL = "latest_long"
+
+# Inline audio is limited to 10 MB: 290 s of 16 kHz LINEAR16 is 9.3 MB.
+MAX_SEGMENT_SECONDS = 290
+MIN_SEGMENT_SECONDS = 60
+MIN_SILENCE_SECONDS = 0.3
+SILENCE_DB = -40.0  # frames quieter than this (dBFS) count as silence
+FRAME_SECONDS = 0.03
+
+CHECKPOINT_PATH = "transcribe_checkpoint.sqlite"
+MAX_CONCURRENT = 16  # operations in flight at once
+REQUESTS_PER_MINUTE = 120  # operations submitted per minute
+POLL_INTERVAL = 10.0  # seconds
+SEGMENT_TIMEOUT = 1800.0  # seconds
+MAX_ATTEMPTS = 3
+
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+
+
+class TranscriptionError(Exception):
+    """
+    Raised when segments are still failed after all attempts. Finished
+    segments are checkpointed, so a rerun only redoes the failed ones.
+    """
+
+
+class SpeechBackend(Protocol):
+    def submit(self, content: bytes, sample_rate: int):
+        """
+        Start recognizing one segment of LINEAR16 audio; returns a handle.
+        """
+
+    def poll(self, handle) -> Optional[list[tuple[float, float, str]]]:
+        """
+        None while the operation runs, else its results as
+        (start, end, transcript) in seconds from the start of the segment.
+        Raises if the operation failed.
+        """
+
+
+class GoogleSpeechBackend:
+    """
+    long_running_recognize on inline audio, one operation per segment.
+    """
+
+    def __init__(self, model: str = MODEL, language_code: str = LANGUAGE_CODE):
+        self.client = speech.SpeechClient()
+        self.model = model
+        self.language_code = language_code
+
+    def submit(self, content: bytes, sample_rate: int):
+        config = speech.RecognitionConfig(
+            encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
+            sample_rate_hertz=sample_rate,
+            language_code=self.language_code,
+            model=self.model,
+            enable_word_time_offsets=True,
+        )
+        audio = speech.RecognitionAudio(content=content)
+        return self.client.long_running_recognize(config=config, audio=audio)
+
+    def poll(self, handle):
+        if not handle.done():
+            return None
+        results = []
+        start = 0.0
+        for result in handle.result().results:
+            alternative = result.alternatives[0]
+            end = result.result_end_time.total_seconds()
+            if alternative.words:
+                start = alternative.words[0].start_time.total_seconds()
+            results.append((start, end, alternative.transcript.strip()))
+            start = end
+        return results
+
+
+class FakeSpeechBackend:
+    """
+    Offline stand-in for GoogleSpeechBackend. Each operation finishes after
+    `polls` polls with one result covering the segment; the segments whose
+    submit number is in `fail` raise instead.
+    """
+
+    def __init__(self, polls: int = 1, fail: tuple = ()):
+        self.polls = polls
+        self.fail = set(fail)
+        self.submitted = 0
+        self._lock = threading.Lock()
+
+    def submit(self, content: bytes, sample_rate: int):
+        with self._lock:
+            number = self.submitted
+            self.submitted += 1
+        seconds = len(content) / 2 / sample_rate
+        return {"number": number, "seconds": seconds, "polls": 0}
+
+    def poll(self, handle):
+        handle["polls"] += 1
+        if handle["polls"] < self.polls:
+            return None
+        if handle["number"] in self.fail:
+            raise RuntimeError(f"Fake failure of operation {handle['number']}")
+        seconds = handle["seconds"]
+        return [(0.0, seconds, f"segment of {seconds:.1f} seconds")]
+
+
+def read_audio(source: str, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """
+    Decode a local file or gs:// object to mono int16 samples with ffmpeg.
+    """
+    if source.startswith("gs://"):
+        bucket_name, _, path = source[len("gs://") :].partition("/")
+        data = get_store().bucket(bucket_name).blob(path).download_as_bytes()
+        source = "pipe:0"
+    else:
+        data = None
+    command = ["ffmpeg", "-loglevel", "error", "-i", source, "-ac", "1"]
+    command += ["-ar", str(sample_rate), "-f", "s16le", "pipe:1"]
+    output = subprocess.run(command, input=data, capture_output=True, check=True)
+    return np.frombuffer(output.stdout, dtype=np.int16)
+
+
+def split_at_silence(
+    samples: np.ndarray,
+    sample_rate: int = SAMPLE_RATE,
+    max_seconds: float = MAX_SEGMENT_SECONDS,
+    min_seconds: float = MIN_SEGMENT_SECONDS,
+    min_silence: float = MIN_SILENCE_SECONDS,
+    silence_db: float = SILENCE_DB,
+) -> list[tuple[int, int]]:
+    """
+    Split samples into (start, end) sample ranges of at most max_seconds.
+
+    Each segment ends in the middle of the last silence of at least
+    min_silence seconds that leaves it longer than min_seconds; where
+    there is none, the audio is cut at max_seconds.
+    """
+    frame = int(FRAME_SECONDS * sample_rate)
+    n_frames = len(samples) // frame
+    frames = samples[: n_frames * frame].reshape(n_frames, frame) / 32768.0
+    rms = np.sqrt(np.mean(frames**2, axis=1))
+    silent = 20 * np.log10(np.maximum(rms, 1e-10)) < silence_db
+
+    # Middle of every run of silent frames that is long enough.
+    edges = np.diff(np.concatenate(([0], silent.astype(np.int8), [0])))
+    starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    long_enough = (ends - starts) * FRAME_SECONDS >= min_silence
+    cuts = ((starts + ends) // 2)[long_enough] * frame
+
+    max_len = int(max_seconds * sample_rate)
+    min_len = int(min_seconds * sample_rate)
+    segments, start = [], 0
+    while len(samples) - start > max_len:
+        window = cuts[(cuts > start + min_len) & (cuts <= start + max_len)]
+        end = int(window[-1]) if len(window) else start + max_len
+        segments.append((start, end))
+        start = end
+    if start < len(samples):
+        segments.append((start, len(samples)))
+    return segments
+
+
+class Checkpoint:
+    """
+    SQLite record of the segments of each audio file and their transcripts.
+    """
+
+    def __init__(self, path: str = CHECKPOINT_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS segments ("
+            " audio_id TEXT NOT NULL,"
+            " idx INTEGER NOT NULL,"
+            " start INTEGER NOT NULL,"
+            " end INTEGER NOT NULL,"
+            " status TEXT NOT NULL,"
+            " results TEXT,"
+            " error TEXT,"
+            " updated REAL NOT NULL,"
+            " PRIMARY KEY (audio_id, idx))"
+        )
+        self._conn.commit()
+
+    def segments(self, audio_id: str) -> list[tuple[int, int, int, str]]:
+        """
+        (idx, start, end, status) of every segment of audio_id.
+        """
+        with self._lock:
+            return self._conn.execute(
+                "SELECT idx, start, end, status FROM segments"
+                " WHERE audio_id = ? ORDER BY idx",
+                (audio_id,),
+            ).fetchall()
+
+    def add(self, audio_id: str, segments: list[tuple[int, int]]):
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO segments"
+                " (audio_id, idx, start, end, status, updated)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (audio_id, idx, start, end, PENDING, now)
+                    for idx, (start, end) in enumerate(segments)
+                ],
+            )
+            self._conn.commit()
+
+    def mark_done(self, audio_id: str, idx: int, results: list):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE segments SET status = ?, results = ?, error = NULL,"
+                " updated = ? WHERE audio_id = ? AND idx = ?",
+                (DONE, json.dumps(results), time.time(), audio_id, idx),
+            )
+            self._conn.commit()
+
+    def mark_failed(self, audio_id: str, idx: int, error: str):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE segments SET status = ?, error = ?, updated = ?"
+                " WHERE audio_id = ? AND idx = ?",
+                (FAILED, error, time.time(), audio_id, idx),
+            )
+            self._conn.commit()
+
+    def results(self, audio_id: str) -> list[tuple[int, list]]:
+        """
+        (start sample, results) of every finished segment, in order.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT start, results FROM segments"
+                " WHERE audio_id = ? AND status = ? ORDER BY idx",
+                (audio_id, DONE),
+            ).fetchall()
+        return [(start, json.loads(results)) for start, results in rows]
+
+
+class QuotaLimiter:
+    """
+    Caps operations in flight and spaces submits to requests_per_minute.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = MAX_CONCURRENT,
+        requests_per_minute: float = REQUESTS_PER_MINUTE,
+    ):
+        self.slots = asyncio.Semaphore(max_concurrent)
+        self.interval = 60.0 / requests_per_minute
+        self.next_submit = 0.0
+        self.lock = asyncio.Lock()
+
+    async def wait_turn(self):
+        async with self.lock:
+            now = time.monotonic()
+            if self.next_submit > now:
+                await asyncio.sleep(self.next_submit - now)
+            self.next_submit = max(now, self.next_submit) + self.interval
+
+
+class TranscriptionOrchestrator:
+    """
+    Transcribes long audio as many concurrent operations.
+
+    The audio is split at silences into segments short enough to send
+    inline, the segments are submitted under a quota limiter and polled
+    asynchronously, and their transcripts are stitched back together with
+    each result shifted by the start of its segment. Every finished segment
+    is checkpointed, so after a failure a rerun only redoes the segments
+    that did not finish.
+    """
+
+    def __init__(
+        self,
+        backend: Optional[SpeechBackend] = None,
+        checkpoint: Optional[Checkpoint] = None,
+        sample_rate: int = SAMPLE_RATE,
+        max_concurrent: int = MAX_CONCURRENT,
+        requests_per_minute: float = REQUESTS_PER_MINUTE,
+        poll_interval: float = POLL_INTERVAL,
+        segment_timeout: float = SEGMENT_TIMEOUT,
+        max_attempts: int = MAX_ATTEMPTS,
+        max_segment_seconds: float = MAX_SEGMENT_SECONDS,
+    ):
+        self.backend = backend or GoogleSpeechBackend()
+        self.checkpoint = checkpoint or Checkpoint()
+        self.sample_rate = sample_rate
+        self.max_concurrent = max_concurrent
+        self.requests_per_minute = requests_per_minute
+        self.poll_interval = poll_interval
+        self.segment_timeout = segment_timeout
+        self.max_attempts = max_attempts
+        self.max_segment_seconds = max_segment_seconds
+
+    async def _recognize(self, limiter: QuotaLimiter, content: bytes) -> list:
+        async with limiter.slots:
+            await limiter.wait_turn()
+            handle = await asyncio.to_thread(
+                self.backend.submit, content, self.sample_rate
+            )
+            deadline = time.monotonic() + self.segment_timeout
+            while True:
+                results = await asyncio.to_thread(self.backend.poll, handle)
+                if results is not None:
+                    return results
+                if time.monotonic() > deadline:
+                    raise TimeoutError("Recognition did not finish in time")
+                await asyncio.sleep(self.poll_interval)
+
+    async def _segment(self, limiter, audio_id, idx, samples, start, end) -> bool:
+        content = samples[start:end].tobytes()
+        last_error = ""
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                results = await self._recognize(limiter, content)
+            except Exception as error:
+                logging.warning(
+                    f"Segment {idx} of {audio_id} failed (attempt {attempt}): {error}"
+                )
+                last_error = str(error)
+                continue
+            await asyncio.to_thread(self.checkpoint.mark_done, audio_id, idx, results)
+            return True
+        await asyncio.to_thread(self.checkpoint.mark_failed, audio_id, idx, last_error)
+        return False
+
+    def stitch(self, audio_id: str) -> dict:
+        """
+        Join the checkpointed results of audio_id on one timeline.
+
+        Returns:
+            dict: "text" and "results", a list of
+                {"start", "end", "transcript"} with times in seconds.
+        """
+        stitched = []
+        for offset, results in self.checkpoint.results(audio_id):
+            offset /= self.sample_rate
+            for start, end, transcript in results:
+                stitched.append(
+                    {
+                        "start": offset + start,
+                        "end": offset + end,
+                        "transcript": transcript,
+                    }
+                )
+        text = " ".join(r["transcript"] for r in stitched if r["transcript"])
+        return {"text": text, "results": stitched}
+
+    async def atranscribe(self, audio_id: str, samples: np.ndarray) -> dict:
+        """
+        Transcribe mono int16 samples, resuming from the checkpoint.
+
+        Raises:
+            TranscriptionError: If segments failed after all attempts.
+        """
+        if not self.checkpoint.segments(audio_id):
+            segments = split_at_silence(
+                samples, self.sample_rate, max_seconds=self.max_segment_seconds
+            )
+            self.checkpoint.add(audio_id, segments)
+        todo = [
+            (idx, start, end)
+            for idx, start, end, status in self.checkpoint.segments(audio_id)
+            if status != DONE
+        ]
+        logging.info(f"Transcribing {len(todo)} segments of {audio_id}")
+        limiter = QuotaLimiter(self.max_concurrent, self.requests_per_minute)
+        ok = await asyncio.gather(
+            *[
+                self._segment(limiter, audio_id, idx, samples, start, end)
+                for idx, start, end in todo
+            ]
+        )
+        failed = [idx for (idx, _, _), done in zip(todo, ok) if not done]
+        if failed:
+            raise TranscriptionError(
+                f"{len(failed)} segments of {audio_id} failed: {failed}"
+            )
+        return self.stitch(audio_id)
+
+    def transcribe(self, source: str, audio_id: Optional[str] = None) -> dict:
+        """
+        Transcribe a local audio file or gs:// object; see atranscribe.
+        Also works inside a running event loop, see async_utils.run_blocking.
+        """
+        samples = read_audio(source, self.sample_rate)
+        return run_blocking(self.atranscribe(audio_id or source, samples))
@@ -1,9 +1,13 @@
 import logging
 import os
+import subprocess
 import tempfile
+import threading
 
-from google.cloud import storage
-from pytube import YouTube
+from google.api_core.exceptions import NotFound
+from pytube import YouTube, request
+
+from store_gcs import get_store
 
 # Set up logging
 logging.basicConfig(
@@ -16,6 +20,13 @@ GCS_REGION = None  # no default set
 GCS_BUCKET = "pblc_data"
 GCS_PREFIX = "localnet"
 
+SAMPLE_RATE = 16000  # what transcribe_audio_gcs configures
+# ffmpeg output arguments and content type per audio format.
+AUDIO_FORMATS = {
+    "flac": (["-f", "flac"], "audio/flac"),
+    "wav": (["-f", "wav", "-acodec", "pcm_s16le"], "audio/wav"),  # LINEAR16
+}
+
 
 class VidExtract:
     def __init__(self, video_url: str, gcs_bucket_name: str, temp_dir: str):
@@ -29,7 +40,8 @@ class VidExtract:
         self.video_url = video_url
         self.gcs_bucket_name = gcs_bucket_name
         self.yt = YouTube(self.video_url)
-        self.client = storage.Client(project=GCS_PROJECT)
+        self.store = get_store()
+        self.client = self.store.client
         self.gcs_bucket_name = GCS_BUCKET
         self.gcs_file_prefix = GCS_PREFIX
         self.gcs_region = GCS_REGION
@@ -76,22 +88,110 @@ class VidExtract:
         """
         Extract audio from the downloaded video.
 
+        The audio stream is piped from the download straight into a
+        resumable upload; nothing is written to local disk.
+
         Args:
             video_path (str): The local path to the downloaded video file.
 
         Returns:
-            str: The local path to the extracted audio file.
+            str: The GCS path of the uploaded audio file.
         """
         audio = self.yt.streams.filter(only_audio=True).first()
         audio_filename = video_path.split("/")[-1].replace("_vid.mp4", "_aud.mp3")
         gcs_path = f"{self.gcs_file_prefix}/{audio_filename}"
-        with tempfile.TemporaryDirectory(dir=self.temp_dir) as temp_dir:
-            output_audio_path = os.path.join(temp_dir, audio_filename)
-            audio.download(output_path=temp_dir, filename=audio_filename)
+        logging.info(f"Streaming audio: {gcs_path}")
+        return self.upload_stream_to_gcs(request.stream(audio.url), gcs_path)
+
+    def extract_audio_only(
+        self, audio_format="flac", sample_rate=SAMPLE_RATE, name=None
+    ):
+        """
+        Fetch only the smallest audio stream and transcode it to mono audio
+        for speech recognition, without downloading the video.
+
+        The stream is piped through ffmpeg straight into a chunked resumable
+        upload, so no full-size file is written locally.
+
+        Args:
+            audio_format (str): "flac" or "wav" (LINEAR16).
+            sample_rate (int): Output sample rate in Hz.
+            name (str): Base name of the uploaded file, e.g. the video id.
+                Defaults to the video title, which other videos may share.
+
+        Returns:
+            str: The GCS path of the uploaded audio file.
+        """
+        output_args, content_type = AUDIO_FORMATS[audio_format]
+        audio = self.yt.streams.filter(only_audio=True).order_by("abr").asc().first()
+        if name is None:
+            name = self.yt.title.replace(" ", "_").replace("/", "_").lower()
+        gcs_path = f"{self.gcs_file_prefix}/{name}_aud.{audio_format}"
+
+        process = subprocess.Popen(
+            ["ffmpeg", "-loglevel", "error", "-i", "pipe:0"]
+            + ["-vn", "-ac", "1", "-ar", str(sample_rate)]
+            + output_args
+            + ["pipe:1"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+        )
+
+        stopped = threading.Event()
+        feed_errors = []
 
-            logging.info(f"Extracted audio: {output_audio_path}")
-            gcs_file_path = self.upload_to_gcs(output_audio_path, gcs_path=gcs_path)
-            return gcs_file_path
+        def feed():
+            try:
+                for chunk in request.stream(audio.url):
+                    if stopped.is_set():
+                        break
+                    process.stdin.write(chunk)
+            except BaseException as error:
+                # A failed download only truncates ffmpeg's input, which it
+                # still transcodes without error; keep the error to raise it.
+                if not stopped.is_set():
+                    feed_errors.append(error)
+            finally:
+                try:
+                    process.stdin.close()
+                except OSError:
+                    pass  # ffmpeg is gone, the buffered input is moot
+
+        feeder = threading.Thread(target=feed, daemon=True)
+        feeder.start()
+        logging.info(f"Streaming audio ({audio.abr}) to {gcs_path}")
+        try:
+            gcs_file_path = self.store.upload_pipe(
+                process.stdout,
+                gcs_path,
+                content_type=content_type,
+                bucket_name=self.gcs_bucket_name,
+            )
+        except BaseException:
+            # Nobody reads ffmpeg's output any more: stop it, so that neither
+            # ffmpeg nor the feeder stays blocked on a full pipe.
+            stopped.set()
+            process.kill()
+            process.stdout.close()
+            raise
+        finally:
+            feeder.join()
+            returncode = process.wait()
+        if feed_errors or returncode != 0:
+            # The uploaded audio is cut off: remove it rather than leave a
+            # truncated object behind.
+            self._delete_from_gcs(gcs_path)
+            if feed_errors:
+                raise feed_errors[0]
+            raise RuntimeError(f"ffmpeg failed with exit code {returncode}")
+        return gcs_file_path
+
+    def _delete_from_gcs(self, gcs_path):
+        try:
+            self.store.bucket(self.gcs_bucket_name).blob(gcs_path).delete()
+        except NotFound:
+            pass
+        logging.info(f"Removed incomplete upload: {gcs_path}")
 
     def upload_text_to_gcs(self, text, gcs_path):
         """
@@ -105,13 +205,33 @@ class VidExtract:
             str: The GCS path of the uploaded text file.
         """
         text_content = "\n".join(text)
-        temp_text_file = os.path.join(self.temp_dir, "transcribed_text.txt")
-        with open(temp_text_file, "w") as f:
-            f.write(text_content)
+        return self.store.upload_data(
+            text_content,
+            gcs_path,
+            content_type="text/plain",
+            bucket_name=self.gcs_bucket_name,
+        )
+
+    def upload_stream_to_gcs(self, chunks, gcs_path, content_type=None):
+        """
+        Upload an iterator of byte chunks to Google Cloud Storage.
+
+        Safe to call from many workers at once: no temp files are used and
+        each call gets its own blob and checksum.
 
-        text_gcs_path = self.upload_to_gcs(temp_text_file, gcs_path)
-        os.remove(temp_text_file)
-        logging.info(f"Local file {temp_text_file} removed.")
+        Args:
+            chunks (iterable): Byte chunks, e.g. from pytube.request.stream.
+            gcs_path (str): The destination path in Google Cloud Storage.
+
+        Returns:
+            str: The GCS path of the uploaded file.
+        """
+        return self.store.upload_chunks(
+            chunks,
+            gcs_path,
+            content_type=content_type,
+            bucket_name=self.gcs_bucket_name,
+        )
 
     def upload_to_gcs(self, local_path, gcs_path):
         """
@@ -124,14 +244,11 @@ class VidExtract:
         Returns:
             str: The GCS path of the uploaded file.
         """
-        bucket = self.client.bucket(self.gcs_bucket_name)
-        blob = bucket.blob(gcs_path)
-        blob.upload_from_filename(local_path)
+        gcs_file_path = self.store.upload_file(
+            local_path, gcs_path, bucket_name=self.gcs_bucket_name
+        )
         os.remove(local_path)
         logging.info(f"Local file {local_path} removed.")
-
-        gcs_file_path = f"gs://{self.gcs_bucket_name}/{gcs_path}"
-        logging.info(f"Uploaded to GCS: {gcs_file_path}")
         return gcs_file_path
 
 